@@ -61,8 +61,9 @@ def wrk_different_requests(req_script: str, url: str, each_request_duration: str
             output = output.decode("utf-8")
             print(output)
             
-            # Append the output to the output file.
+            # Append the output to the output file (the command line first: wrk2 does not print the rate)
             with open(output_file, 'a') as f:
+                f.write(f"# command: {' '.join(command)}\n")
                 f.write(output)
                 f.write("\n\n")
             print(f"Finished running command: {' '.join(command)}")
@@ -101,7 +102,8 @@ def run_workload_varing_callGraph(each_wrk2_duration: str):
     # print the time when the test is done
     print("wrk2 workloads tests are done at: ", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
-run_workload_varing_callGraph(each_wrk2_duration='2m') 
+if __name__ == '__main__':
+    run_workload_varing_callGraph(each_wrk2_duration='2m') 
 # time.sleep(60*3) # wait for 3 mins before running the next test
 # run_workload_varing_callGraph(each_wrk2_duration='2m') 
     
@@ -1,66 +1,13 @@
-import os
 import subprocess
 import time
-import random
-import csv
-import paramiko
 from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import Pool
-
-# (1) ############################################## Different Cross-node delays generation #############################################################
-
-def generate_delay_matrix(num_nodes, base_latency, max_additional_latency):
-    delay_matrix = [[0 for _ in range(num_nodes)] for _ in range(num_nodes)]
-    for i in range(num_nodes):
-        for j in range(num_nodes):
-            if i != j:
-                additional_latency = random.uniform(0, max_additional_latency)
-                distance_factor = abs(i - j) / num_nodes
-                simulated_latency = base_latency + additional_latency * distance_factor
-                congestion_factor = random.uniform(0.5, 1.5)
-                delay_matrix[i][j] = int(simulated_latency * congestion_factor)
-    return delay_matrix
-
-def apply_latency_between_nodes(source_node_name, username, key_path, interface, delay_matrix, node_details):
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    client.load_system_host_keys()
-    try:
-        source_node_ip = node_details[source_node_name]['ip']
-        client.connect(source_node_ip, username=username, key_filename=key_path)
-        client.exec_command(f"sudo tc qdisc del dev {interface} root")  # Clear existing rules
-        client.exec_command(f"sudo tc qdisc add dev {interface} root handle 1: htb default 1")
-        client.exec_command(f"sudo tc class add dev {interface} parent 1: classid 1:1 htb rate 100mbps")
-        
-        mark_count = 2  # Start from 2 to reserve 1:1 as default class
-        dst_node_details = exclude_src_node(source_node_name, node_details)
-        source_node_index = list(node_details.keys()).index(source_node_name)
-
-        for dst_node, details in dst_node_details.items():
-            dst_node_index = list(node_details.keys()).index(dst_node)
-            dst_node_ip = details['ip']
-            latency = delay_matrix[source_node_index][dst_node_index]
-
-            client.exec_command(f"sudo tc class add dev {interface} parent 1: classid 1:{mark_count} htb rate 100mbps")
-            client.exec_command(f"sudo tc qdisc add dev {interface} parent 1:{mark_count} handle {mark_count}0: netem delay {latency}ms")
-            client.exec_command(f"sudo tc filter add dev {interface} protocol ip parent 1:0 prio 1 u32 match ip dst {dst_node_ip} flowid 1:{mark_count}")
-            mark_count += 1
-    except Exception as e:
-        print(f"Failed to apply latency for {source_node_name}: {e}")
-    finally:
-        client.close()
-
-def exclude_src_node(src_node_name, node_details):
-    return {name: details for name, details in node_details.items() if name != src_node_name}
-
-def automate_latency_injection(params):
-    source_node_name, delay_matrix, node_details = params
-    username = node_details[source_node_name]['username']
-    key_path = node_details[source_node_name]['key_path']
-    interface = 'eth0'  # Assuming the interface name is eth0
-    apply_latency_between_nodes(source_node_name, username, key_path, interface, delay_matrix, node_details)
-
-# (2) ############################################## Compose-post workload under different delays #############################################################
+from datetime import datetime
+
+from iDynamicsPackagesModules.NetworkingDynamicsManager.tc_sync_switch import SSHNodeRunner
+from iDynamicsPackagesModules.NetworkingDynamicsManager.network_dynamics_scheduler import NetworkDynamicsScheduler
+from iDynamicsPackagesModules.NetworkingDynamicsManager.node_inventory import load_node_inventory
+
+# (1) ############################################## Compose-post workload under different delays #############################################################
 def run_single_workload(url, thread_num, connections, duration, qps, script_path, output_file):
     for q in qps:
         command = [
@@ -77,38 +24,22 @@ def run_single_workload(url, thread_num, connections, duration, qps, script_path
         print(f"Running command: {' '.join(command)}")
         
         with open(output_file, 'a') as f:
+            f.write(f"# command: {' '.join(command)}\n")  # wrk2 does not print the rate
+            f.flush()
             process = subprocess.Popen(command, stdout=f, stderr=subprocess.STDOUT)
             # No wait() here, so the next workload can start while this one runs in parallel
             print(f"Workload started for {url}")
 
 
-# (3) Main function to handle parallel execution of both tasks
+# (2) Main function to handle parallel execution of both tasks
 # Version3: dynamic QPS values
-import os
-import subprocess
-import time
-from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import Pool
-from datetime import datetime
 
-def main():
-    node_details = {
-        'k8s-worker-1': {'ip': '172.26.128.30', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-2': {'ip': '172.26.132.91', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-3': {'ip': '172.26.133.31', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-4': {'ip': '172.26.132.241', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-5': {'ip': '172.26.132.142', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-6': {'ip': '172.26.133.55', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-7': {'ip': '172.26.130.22', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-8': {'ip': '172.26.130.82', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-9': {'ip': '172.26.133.118', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-10': {'ip': '172.26.134.133', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-11': {'ip': '172.26.128.34', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-12': {'ip': '172.26.132.228', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-13': {'ip': '172.26.133.157', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-14': {'ip': '172.26.128.40', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-        'k8s-worker-15': {'ip': '172.26.128.40', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'}
-    }
+def main(inventory=None):
+    # Delays are injected among all nodes of the node inventory (Kubernetes API or $IDYNAMICS_NODE_INVENTORY),
+    # the node set Policy4 places on. To evaluate on a subset (e.g. 5 workers), point $IDYNAMICS_NODE_INVENTORY
+    # at a subset file (NodeInventory.subset(...).save(...)) for both this script and the Policy4 scheduler.
+    inventory = inventory or load_node_inventory()
+    node_details = inventory.node_details()
 
     thread_num = 8
     connections = 64
@@ -132,25 +63,24 @@ def main():
     num_intervals = len(QPS_trend)
     interval_duration = total_duration_seconds // num_intervals  # Duration per QPS
    
-    num_nodes = len(node_details) # generate N*N dealy matrix between all worker nodes
+    # Delay profiles (base_latency, max_additional_latency) cycled through every delay_changing_interval seconds
+    delay_profiles = [(0, 0), (5, 10), (5, 30), (5, 20)]
+    timeline = [
+        {'t': t,
+         'base_latency': delay_profiles[k % len(delay_profiles)][0],
+         'max_additional_latency': delay_profiles[k % len(delay_profiles)][1],
+         'seed': k}  # seeded, so every run injects the same sequence of matrices
+        for k, t in enumerate(range(0, total_duration_seconds, delay_changing_interval))
+    ]
+    timeline_log = output_file.replace('__wrk_result.txt', '__network_timeline.csv')
+
     def latency_task():
-        start_time = time.time()
-        while time.time() - start_time < total_duration_seconds:  # Run for total duration
-            if delay_changing_interval == 0:
-                delay_matrix = generate_delay_matrix(num_nodes, 0, 0)
-            elif delay_changing_interval == 1:
-                delay_matrix = generate_delay_matrix(num_nodes, 5, 10)
-            elif delay_changing_interval == 2:
-                delay_matrix = generate_delay_matrix(num_nodes, 5, 30)
-            else:
-                delay_matrix = generate_delay_matrix(num_nodes, 5, 20)
-
-            # Apply latency injection
-            params_list = [(source_node, delay_matrix, node_details) for source_node in node_details.keys()]
-            with Pool(processes=len(node_details)) as pool:
-                pool.map(automate_latency_injection, params_list)
-
-            time.sleep(interval_duration)  # Wait for the next interval to apply the next delay matrix
+        # Replay the delay timeline with drift-free deadlines; each change is staged on all nodes
+        # and then switched at a common timestamp, and the actual apply times go to timeline_log
+        runner = SSHNodeRunner(node_details)  # keeps SSH connections open across profile switches
+        scheduler = NetworkDynamicsScheduler(runner, node_details, log_path=timeline_log)
+        scheduler.run(timeline)
+        runner.close()
 
     def run_single_workload(url, thread_num, connections, qps, script_path, output_file):
         command = [
@@ -167,6 +97,8 @@ def main():
         print(f"Running workload on {url} with QPS {qps}: {' '.join(command)}")
         
         with open(output_file, 'a') as f:
+            f.write(f"# command: {' '.join(command)}\n")  # wrk2 does not print the rate
+            f.flush()
             subprocess.Popen(command, stdout=f, stderr=subprocess.STDOUT).wait()
 
     def workload_task():
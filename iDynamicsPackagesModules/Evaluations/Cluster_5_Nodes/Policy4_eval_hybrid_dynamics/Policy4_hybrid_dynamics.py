@@ -9,11 +9,16 @@ import multiprocessing as mp
 import time
 import concurrent.futures
 
+from iDynamicsPackagesModules.NetworkingDynamicsManager.node_inventory import load_node_inventory
+
 class Policy4:
-    def __init__(self, prom_url, qos_target, time_window, namespace, response_code='200'):
+    def __init__(self, prom_url, qos_target, time_window, namespace, response_code='200', inventory=None):
         # Kubernetes Config
         config.load_kube_config()
         self.v1 = client.CoreV1Api()
+        # Stable node index <-> name mapping shared with the emulators (matrix indices = placement indices);
+        # the workload injects delays among the same inventory, so placements only use emulated nodes
+        self.inventory = inventory or load_node_inventory()
 
         # Prometheus Config
         self.prom = PrometheusConnect(url=prom_url, disable_ssl=True)
@@ -186,7 +191,7 @@ class Policy4:
         """
         Extract node numbers from the dictionary.
         """
-        return [(int(node.split('-')[-1]) - 1) for node in deployment_node_dict.values()]
+        return [self.inventory.index_of(node) for node in deployment_node_dict.values()]
 
     def measure_http_latency(self, namespace='measure-nodes'):
         """
@@ -220,7 +225,9 @@ class Policy4:
                         print(f"Error executing command in pod {source_pod_name}: {e}")
                         latency_results[source_pod_node_name][target_pod_node_name] = np.inf
 
-        df_latency = pd.DataFrame(latency_results).T
+        # Rows/columns in inventory order, so that matrix indices match get_worker_node_numbers()
+        df_latency = pd.DataFrame(latency_results).T.reindex(index=self.inventory.node_names, columns=self.inventory.node_names)
+        df_latency = df_latency.fillna(np.inf)
         for worker in df_latency.columns:
             df_latency.at[worker, worker] = 0
 
@@ -424,8 +431,9 @@ class Policy4:
     def migrate_and_wait_for_update(self, deployment_name, new_node_index):
         """
         Handles the migration of a single microservice by patching the deployment and waiting for the rolling update.
+        new_node_index is the node's (0-based) inventory index, as used in the placements.
         """
-        new_node_name = f'k8s-worker-{new_node_index}'
+        new_node_name = self.inventory.name_at(new_node_index)
         print(f"Starting migration of {deployment_name} to {new_node_name}")
 
         # Patch the deployment to the new node
@@ -602,7 +610,7 @@ class Policy4:
             with concurrent.futures.ThreadPoolExecutor() as executor:
                 futures = []
                 for microservice, initial, final in filtered_migrations:
-                    future = executor.submit(self.migrate_and_wait_for_update, ready_deployments[microservice], final + 1)
+                    future = executor.submit(self.migrate_and_wait_for_update, ready_deployments[microservice], final)
                     futures.append(future)
 
                 # Wait for all futures to complete
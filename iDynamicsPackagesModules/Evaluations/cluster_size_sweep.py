@@ -0,0 +1,331 @@
+'''Cluster-size sweeps: one scenario against any list of cluster sizes or node subsets.
+
+The scaling study used to be three copies of the evaluation scripts (Cluster_5_Nodes, Cluster_10_Nodes,
+Cluster_15_Nodes) plus taint_nodes.py to keep new pods off the nodes outside the intended cluster. Here a sweep
+takes one orchestrator scenario (experiment_orchestrator.py) and a list of sweep points, each a size (the
+first N workers of the node inventory) or an explicit node subset, and for every point
+
+    1. taints the nodes outside the subset with trial/exclude-<point>=lab:NoSchedule (taint_nodes.py's
+       mechanism, with one key per point so several points can be carved at the same time)
+    2. makes the point's namespaces tolerate the keys of the other concurrent points and restarts their
+       deployments, so the pods are re-placed inside the subset
+    3. runs the orchestrator in its own process with IDYNAMICS_NODE_INVENTORY pointing at the subset, so the
+       network actor and the inventory-based policies (Policy4) only see the subset
+    4. removes the taints
+
+Points run in parallel (in separate namespaces: <namespace>-<point> unless a namespace_map is given) or one
+after the other (in the scenario's namespaces); the sweep does not deploy the applications, it fails before
+tainting anything if a point's namespace is missing or has no deployments. Points running in parallel with network dynamics must use
+disjoint subsets, since each point installs its own tc trees on its nodes. All points share one collection
+step: the wrk2 outputs of every point are parsed into <sweep_dir>/wrk2_runs.parquet with a `point` column, and,
+given a Prometheus URL, the latency series of every namespace go to the compact series store.
+'''
+
+import os
+import re
+import sys
+import copy
+import json
+import time
+import datetime
+import subprocess
+
+from kubernetes import client, config
+
+from iDynamicsPackagesModules.NetworkingDynamicsManager.node_inventory import NodeInventory, load_node_inventory
+from iDynamicsPackagesModules.Evaluations.wrk2_output_parser import find_wrk2_outputs, parse_files
+from iDynamicsPackagesModules.Evaluations.prometheus_bulk_export import QUERY_TEMPLATES, export_queries
+
+TAINT_KEY_PREFIX = "trial/exclude"
+TAINT_VALUE = "lab"
+TAINT_EFFECT = "NoSchedule"
+ORCHESTRATOR_MODULE = 'iDynamicsPackagesModules.Evaluations.experiment_orchestrator'
+PROMETHEUS_QUERY_LATENCY_AVG = QUERY_TEMPLATES['avg_latency']
+
+
+def taint_key(point_name: str) -> str:
+    """Taint key of a sweep point, e.g. '10-nodes' -> 'trial/exclude-10-nodes'."""
+    return f"{TAINT_KEY_PREFIX}-{re.sub(r'[^A-Za-z0-9.-]+', '-', point_name)}"
+
+
+def plan_sweep(inventory: NodeInventory, sizes: list = None, subsets: dict = None) -> dict:
+    """
+    Args:
+        inventory: The full node inventory.
+        sizes: Cluster sizes; point '<n>-nodes' is the first n workers in inventory order.
+        subsets: Explicit points, {point_name: [node names]}.
+
+    Returns:
+        {point_name: [node names]}
+    """
+    plan = {}
+    for size in sizes or []:
+        if not 0 < size <= len(inventory):
+            raise ValueError(f"Cluster size {size}: the node inventory has {len(inventory)} nodes")
+        plan[f"{size}-nodes"] = inventory.node_names[:size]
+    for point_name, node_names in (subsets or {}).items():
+        unknown = [node_name for node_name in node_names if node_name not in inventory]
+        if unknown:
+            raise ValueError(f"Sweep point {point_name}: nodes {unknown} are not in the node inventory")
+        plan[point_name] = list(node_names)
+    return plan
+
+
+def point_scenario(scenario: dict, point_name: str, namespace_map: dict, output_dir: str) -> dict:
+    """The scenario of one sweep point: namespaces renamed with namespace_map, output below output_dir."""
+    scenario = copy.deepcopy(scenario)
+    scenario['name'] = f"{scenario.get('name', 'scenario')}__{point_name}"
+    scenario['output_dir'] = output_dir
+    for spec in scenario.get('namespaces', []):
+        spec['namespace'] = namespace_map.get(spec['namespace'], spec['namespace'])
+    for spec in scenario.get('policies', []):
+        kwargs = spec.get('kwargs', {})
+        if 'namespace' in kwargs:
+            kwargs['namespace'] = namespace_map.get(kwargs['namespace'], kwargs['namespace'])
+    if scenario.get('network'):
+        scenario['network'].pop('num_workers', None)  # the point's inventory holds exactly its nodes
+    return scenario
+
+
+# (1) ############################################## Taints and tolerations #############################################
+
+def _load_kube_config():
+    try:
+        config.load_kube_config()
+    except config.ConfigException:
+        config.load_incluster_config()
+
+
+def set_taints(plan: dict, inventory: NodeInventory) -> None:
+    """Taint every node outside each point's subset with the point's key (replacing an older value)."""
+    core_v1 = client.CoreV1Api()
+    keys = {taint_key(point_name) for point_name in plan}
+    for node_name in inventory:
+        node = core_v1.read_node(node_name)
+        taints = [taint for taint in (node.spec.taints or []) if taint.key not in keys]
+        for point_name, node_names in plan.items():
+            if node_name not in node_names:
+                taints.append(client.V1Taint(key=taint_key(point_name), value=TAINT_VALUE, effect=TAINT_EFFECT))
+        core_v1.patch_node(node_name, {'spec': {'taints': [client.ApiClient().sanitize_for_serialization(taint)
+                                                           for taint in taints]}})
+        print(f"> {node_name}: {[taint.key for taint in taints]}")
+
+
+def remove_taints(plan: dict, inventory: NodeInventory) -> None:
+    """Remove the taints of the given points from every node (other taints are kept)."""
+    core_v1 = client.CoreV1Api()
+    keys = {taint_key(point_name) for point_name in plan}
+    for node_name in inventory:
+        node = core_v1.read_node(node_name)
+        taints = [taint for taint in (node.spec.taints or []) if taint.key not in keys]
+        if len(taints) != len(node.spec.taints or []):
+            core_v1.patch_node(node_name, {'spec': {'taints': [client.ApiClient().sanitize_for_serialization(taint)
+                                                               for taint in taints] or None}})
+
+
+def confine_namespace(namespace: str, own_point: str, concurrent_points: list) -> list:
+    """
+    Let the deployments of a namespace tolerate the taints of the other concurrent points (but not their own),
+    and restart them so their pods are placed inside the point's subset.
+
+    Returns:
+        The names of the patched deployments.
+    """
+    apps_v1 = client.AppsV1Api()
+    tolerations = [{'key': taint_key(point_name), 'operator': 'Exists', 'effect': TAINT_EFFECT}
+                   for point_name in concurrent_points if point_name != own_point]
+    restarted_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    patched = []
+    for deployment in apps_v1.list_namespaced_deployment(namespace).items:
+        existing = [client.ApiClient().sanitize_for_serialization(toleration)
+                    for toleration in (deployment.spec.template.spec.tolerations or [])
+                    if not (toleration.key or '').startswith(TAINT_KEY_PREFIX)]
+        body = {'spec': {'template': {
+            'metadata': {'annotations': {'kubectl.kubernetes.io/restartedAt': restarted_at}},
+            'spec': {'tolerations': existing + tolerations}}}}
+        apps_v1.patch_namespaced_deployment(deployment.metadata.name, namespace, body)
+        patched.append(deployment.metadata.name)
+    return patched
+
+
+def wait_for_rollouts(namespace: str, timeout: float = 600, poll_interval: float = 5) -> bool:
+    """Wait until every deployment of the namespace has rolled out; False on timeout."""
+    apps_v1 = client.AppsV1Api()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pending = []
+        for deployment in apps_v1.list_namespaced_deployment(namespace).items:
+            status, replicas = deployment.status, deployment.spec.replicas or 0
+            if ((status.observed_generation or 0) < deployment.metadata.generation
+                    or (status.updated_replicas or 0) < replicas or (status.available_replicas or 0) < replicas
+                    or (status.replicas or 0) > replicas):
+                pending.append(deployment.metadata.name)
+        if not pending:
+            return True
+        time.sleep(poll_interval)
+    print(f"Rollout in {namespace} not finished after {timeout}s: {pending}")
+    return False
+
+
+# (2) ############################################## Sweep ##############################################################
+
+def check_namespaces(namespaces: list) -> None:
+    """Raise if a namespace does not exist or has no deployments (nothing would be confined or measured)."""
+    core_v1, apps_v1 = client.CoreV1Api(), client.AppsV1Api()
+    problems = []
+    for namespace in namespaces:
+        try:
+            core_v1.read_namespace(namespace)
+        except client.exceptions.ApiException as e:
+            if e.status != 404:
+                raise
+            problems.append(f"{namespace} does not exist")
+            continue
+        if not apps_v1.list_namespaced_deployment(namespace).items:
+            problems.append(f"{namespace} has no deployments")
+    if problems:
+        raise RuntimeError("Sweep namespaces are not deployed: " + "; ".join(problems)
+                           + " (deploy the application into every point's namespace, or pass a namespace_map)")
+
+
+def _check_disjoint(plan: dict) -> None:
+    owner = {}
+    for point_name, node_names in plan.items():
+        for node_name in node_names:
+            if node_name in owner:
+                raise ValueError(f"Points {owner[node_name]} and {point_name} share {node_name}: parallel points "
+                                 f"with network dynamics need disjoint node subsets (or parallel=False)")
+            owner[node_name] = point_name
+
+
+def _start_point(point_name: str, scenario: dict, node_names: list, inventory: NodeInventory, sweep_dir: str):
+    point_dir = os.path.join(sweep_dir, point_name)
+    os.makedirs(point_dir, exist_ok=True)
+    inventory_path = os.path.join(point_dir, 'node_inventory.json')
+    inventory.subset(node_names).save(inventory_path)
+    scenario_path = os.path.join(point_dir, 'scenario.json')
+    with open(scenario_path, 'w') as f:
+        json.dump(scenario, f, indent=2)
+    env = dict(os.environ, IDYNAMICS_NODE_INVENTORY=inventory_path)
+    with open(os.path.join(point_dir, 'orchestrator.log'), 'w') as log:
+        process = subprocess.Popen([sys.executable, '-m', ORCHESTRATOR_MODULE, scenario_path],
+                                   stdout=log, stderr=subprocess.STDOUT, env=env)
+    print(f"Sweep point {point_name} started on {len(node_names)} nodes (pid {process.pid})")
+    return process
+
+
+def run_sweep(scenario: dict, sizes: list = None, subsets: dict = None, parallel: bool = True,
+              namespace_map: dict = None, sweep_dir: str = None, inventory: NodeInventory = None,
+              rollout_timeout: float = 600, prom_url: str = None, query_template: str = PROMETHEUS_QUERY_LATENCY_AVG,
+              step: str = '10s') -> dict:
+    """
+    Run one scenario for every sweep point and collect the results.
+
+    Args:
+        scenario: Orchestrator scenario dict (experiment_orchestrator.load_scenario()).
+        sizes, subsets: Sweep points, see plan_sweep().
+        parallel: Run all points at once (separate namespaces) or one after the other.
+        namespace_map: {point_name: {scenario namespace: namespace of the point}}; defaults to
+            '<namespace>-<point>' when parallel and to the scenario's namespaces otherwise.
+        sweep_dir: Output directory (default: <scenario output_dir>/<timestamp>__<name>__sweep).
+        inventory: Full node inventory (default: load_node_inventory()).
+        rollout_timeout: Seconds to wait for the re-placed deployments of a point.
+        prom_url: Prometheus query_range endpoint; if given, query_template is collected for every namespace.
+
+    Returns:
+        {point_name: {'nodes', 'namespaces', 'returncode', 'run_dir'}} (also written to <sweep_dir>/sweep.json).
+    """
+    _load_kube_config()
+    inventory = inventory or load_node_inventory()
+    plan = plan_sweep(inventory, sizes, subsets)
+    if parallel and scenario.get('network'):
+        _check_disjoint(plan)
+    timestamp = datetime.datetime.now().strftime("%Y_%b_%d_%H%M")
+    sweep_dir = sweep_dir or os.path.join(os.path.expanduser(scenario.get('output_dir', '.')),
+                                          f"{timestamp}__{scenario.get('name', 'scenario')}__sweep")
+    base_namespaces = [spec['namespace'] for spec in scenario.get('namespaces', [])]
+    if namespace_map is None:
+        namespace_map = {point_name: {namespace: f"{namespace}-{point_name}" if parallel else namespace
+                                      for namespace in base_namespaces} for point_name in plan}
+
+    check_namespaces(sorted({namespace_map[point_name].get(namespace, namespace)
+                             for point_name in plan for namespace in base_namespaces}))
+
+    summary = {}
+    batches = [list(plan)] if parallel else [[point_name] for point_name in plan]
+    for batch in batches:
+        batch_plan = {point_name: plan[point_name] for point_name in batch}
+        set_taints(batch_plan, inventory)
+        try:
+            processes = {}
+            for point_name in batch:
+                namespaces = [namespace_map[point_name].get(namespace, namespace) for namespace in base_namespaces]
+                for namespace in namespaces:
+                    confine_namespace(namespace, point_name, batch)
+                for namespace in namespaces:
+                    wait_for_rollouts(namespace, rollout_timeout)
+                scenario_of_point = point_scenario(scenario, point_name, namespace_map[point_name],
+                                                   os.path.join(sweep_dir, point_name))
+                summary[point_name] = {'nodes': plan[point_name], 'namespaces': namespaces,
+                                       'start_timestamp': time.time()}
+                processes[point_name] = _start_point(point_name, scenario_of_point, plan[point_name], inventory, sweep_dir)
+            for point_name, process in processes.items():
+                summary[point_name]['returncode'] = process.wait()
+                summary[point_name]['end_timestamp'] = time.time()
+                print(f"Sweep point {point_name} finished with exit code {summary[point_name]['returncode']}")
+        finally:
+            remove_taints(batch_plan, inventory)
+
+    for point_name in summary:
+        point_dir = os.path.join(sweep_dir, point_name)
+        run_dirs = sorted(entry.path for entry in os.scandir(point_dir) if entry.is_dir())
+        summary[point_name]['run_dir'] = run_dirs[-1] if run_dirs else None
+    with open(os.path.join(sweep_dir, 'sweep.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    collect_sweep(sweep_dir, summary, prom_url, query_template, step)
+    return summary
+
+
+def collect_sweep(sweep_dir: str, summary: dict, prom_url: str = None,
+                  query_template: str = PROMETHEUS_QUERY_LATENCY_AVG, step: str = '10s') -> dict:
+    """
+    The collection pipeline shared by all points: wrk2 outputs -> <sweep_dir>/wrk2_runs.parquet and
+    wrk2_spectrum.parquet (with a `point` column), Prometheus series -> <sweep_dir>/<point>/<namespace>_avg_latency.parquet.
+    """
+    paths = find_wrk2_outputs(sweep_dir)
+    runs_df, spectrum_df = parse_files(paths)
+    points = {os.path.abspath(path): os.path.relpath(path, sweep_dir).split(os.sep)[0] for path in paths}
+    for df in (runs_df, spectrum_df):
+        if not df.empty:
+            df.insert(0, 'point', df['file'].map(lambda path: points[os.path.abspath(path)]))
+    runs_df.to_parquet(os.path.join(sweep_dir, 'wrk2_runs.parquet'), index=False)
+    spectrum_df.to_parquet(os.path.join(sweep_dir, 'wrk2_spectrum.parquet'), index=False)
+    collected = {'wrk2_runs': len(runs_df)}
+    if prom_url:
+        for point_name, point in summary.items():
+            queries = {f"{namespace}_avg_latency": query_template.format(namespace=namespace)
+                       for namespace in point['namespaces']}
+            export_queries(prom_url, queries, point['start_timestamp'], point.get('end_timestamp', time.time()), step,
+                           out_dir=os.path.join(sweep_dir, point_name))
+            for name in queries:
+                collected[f"{point_name}/{name[:-len('_avg_latency')]}"] = os.path.join(sweep_dir, point_name, name)
+    print(f"Collected {len(runs_df)} wrk2 runs of {len(summary)} sweep points into {sweep_dir}")
+    return collected
+
+
+if __name__ == '__main__':
+    # python -m iDynamicsPackagesModules.Evaluations.cluster_size_sweep scenario.json 5 10 15 [--parallel]
+    # Points run one after the other unless --parallel is given (which needs the <namespace>-<point>
+    # namespaces deployed and, with network dynamics, disjoint subsets - not the nested first-N sizes).
+    from iDynamicsPackagesModules.Evaluations.experiment_orchestrator import load_scenario
+    args = [arg for arg in sys.argv[1:] if arg != '--parallel']
+    run_sweep(load_scenario(args[0]), sizes=[int(size) for size in args[1:]], parallel='--parallel' in sys.argv[1:])
+
+# Example usage:
+# scenario = load_scenario('scenarios/policy4_hybrid.json')
+# run_sweep(scenario, sizes=[5, 10, 15], parallel=False)                       # one scaling study, one command
+# run_sweep(scenario, subsets={'zone-a': ['k8s-worker-1', 'k8s-worker-2', 'k8s-worker-3'],
+#                              'zone-b': ['k8s-worker-4', 'k8s-worker-5', 'k8s-worker-6']},
+#           prom_url="http://10.105.116.175:9090/api/v1/query_range")          # disjoint subsets side by side
+# runs = pd.read_parquet(os.path.join(sweep_dir, 'wrk2_runs.parquet'))
+# print(runs[runs['complete']].groupby('point')[['p50', 'p99']].median())
@@ -0,0 +1,525 @@
+'''Experiment catalog: one SQLite index over all runs and their artifacts.
+
+Run artifacts are spread over timestamped files (output_result_*.txt, *_wrk_result.txt, *_avg_latency.csv,
+delay_matrix_*.csv, df_exec_graph.csv, logs) and nothing links a run to its policy, cluster size, QPS trend
+or injected delay matrix. The catalog (a single SQLite file, no server) holds:
+
+    runs            one row per run: name, source ('orchestrator' | 'legacy'), path, cluster_size,
+                    start/end (epoch seconds and ISO, UTC), the scenario (JSON)
+    run_policies    (run_id, policy), e.g. 'policy4', 'policy1', 'k8s' (the default scheduler baseline)
+    run_namespaces  (run_id, namespace, qps_trend JSON)
+    run_matrices    every injected delay matrix: t, base_latency, max_additional_latency, seed, min/mean/max
+                    of the off-diagonal delays and matrix_hash (identical matrices share the hash)
+    artifacts       (run_id, kind, path, bytes, mtime)
+
+with indexes on policy, cluster size, namespace, start time, base latency and matrix hash, so a question like
+"all Policy4 runs on 10 nodes with base_latency >= 5 ms" is one indexed query:
+
+    find_runs(CATALOG, policy='policy4', cluster_size=10, min_base_latency=5)
+
+The catalog is filled by the orchestrator at the end of every campaign (register_run() on its run directory:
+run.json, scenario.json, events.csv, delay_matrix_*.csv) when the scenario has a "catalog" path or
+$IDYNAMICS_CATALOG is set, and by scan_tree() for existing folders. For legacy files the run is the
+(experiment folder, timestamp) of the file names, the time range comes from the latency CSV contents (UTC),
+policies from the file prefixes (k8s_, callGraph_, policy4_, ...) or the Policy<N>_eval_* folder,
+namespaces and QPS from the wrk2 commands, and the cluster size from the Cluster_<N>_Nodes folder. Legacy
+delay matrices with a timestamp in their name (e.g. iDelay/Emulator_delay/delay_matrix_2025-03-17_05-32.csv,
+found anywhere below the scanned root) are linked to every legacy run they were in force for: the latest one
+injected at or before the run start (t = 0, assumed still applied since nothing logs clearing the qdiscs) and
+those injected during the run. They carry no generator parameters, so base_latency queries use their smallest
+off-diagonal delay; untimestamped matrices (delay_matrix.csv, delay_matrix_directed.csv, ...) and the
+matrices the legacy workload scripts generated in memory are not linked.
+Re-registering a run replaces its rows.
+'''
+
+import os
+import re
+import ast
+import json
+import glob
+import bisect
+import sqlite3
+import hashlib
+import datetime
+
+import numpy as np
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_key TEXT NOT NULL UNIQUE,
+    name TEXT,
+    source TEXT,
+    path TEXT,
+    cluster_size INTEGER,
+    start_timestamp REAL,
+    end_timestamp REAL,
+    start_time TEXT,
+    end_time TEXT,
+    scenario TEXT,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS run_policies (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    policy TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_namespaces (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    namespace TEXT NOT NULL,
+    qps_trend TEXT
+);
+CREATE TABLE IF NOT EXISTS run_matrices (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    matrix_index INTEGER,
+    t REAL,
+    base_latency REAL,
+    max_additional_latency REAL,
+    seed INTEGER,
+    min_delay REAL,
+    mean_delay REAL,
+    max_delay REAL,
+    matrix_hash TEXT,
+    path TEXT
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_cluster_size ON runs(cluster_size);
+CREATE INDEX IF NOT EXISTS idx_runs_start ON runs(start_timestamp);
+CREATE INDEX IF NOT EXISTS idx_policies_policy ON run_policies(policy, run_id);
+CREATE INDEX IF NOT EXISTS idx_namespaces_namespace ON run_namespaces(namespace, run_id);
+CREATE INDEX IF NOT EXISTS idx_matrices_hash ON run_matrices(matrix_hash, run_id);
+CREATE INDEX IF NOT EXISTS idx_matrices_base_latency ON run_matrices(base_latency, run_id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_run ON artifacts(run_id, kind);
+"""
+
+# (timestamp regex, strptime format) of the artifact file names, most specific first
+TIMESTAMP_PATTERNS = [
+    (re.compile(r'(\d{4}_[A-Z][a-z]{2}_\d{2}_\d{4})'), '%Y_%b_%d_%H%M'),   # 2025_Mar_19_0848
+    (re.compile(r'(\d{4}_\d{2}_\d{2}_\d{2}_\d{2})'), '%Y_%m_%d_%H_%M'),    # output_result_2025_03_18_06_53
+    (re.compile(r'(\d{8}_\d{6})'), '%Y%m%d_%H%M%S'),                       # latency_3replicas_20250715_130955
+    (re.compile(r'(\d{4}-\d{2}-\d{2}_\d{2}-\d{2})'), '%Y-%m-%d_%H-%M'),    # delay_matrix_2025-03-17_05-32
+]
+POLICY_FOLDER = re.compile(r'^Policy(\d+)_eval_')
+CLUSTER_FOLDER = re.compile(r'Cluster_(\d+)_Nodes')
+WRK2_URL_NAMESPACE = re.compile(r'nginx-thrift\.([A-Za-z0-9-]+)\.svc')
+# file-name prefix -> policy ('callGraph' files are the call-graph-aware Policy1 runs)
+PREFIX_POLICIES = {'k8s': 'k8s', 'callgraph': 'policy1'}
+
+
+def open_catalog(catalog_path: str) -> sqlite3.Connection:
+    """Open (and create if needed) the catalog."""
+    os.makedirs(os.path.dirname(os.path.abspath(catalog_path)), exist_ok=True)
+    connection = sqlite3.connect(catalog_path)
+    connection.execute('PRAGMA foreign_keys = ON')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def matrix_hash(matrix) -> str:
+    """Content hash of a delay matrix (shape + float64 values)."""
+    matrix = np.ascontiguousarray(np.asarray(matrix, dtype=np.float64))
+    return hashlib.sha1(repr(matrix.shape).encode() + matrix.tobytes()).hexdigest()[:16]
+
+
+def _matrix_row(matrix_index: int, matrix_path: str, entry: dict = None) -> dict:
+    matrix = np.loadtxt(matrix_path, delimiter=',', ndmin=2)
+    off_diagonal = matrix[~np.eye(len(matrix), dtype=bool)] if matrix.size > 1 else matrix.ravel()
+    entry = entry or {}
+    return {'matrix_index': matrix_index, 't': entry.get('t'), 'base_latency': entry.get('base_latency'),
+            'max_additional_latency': entry.get('max_additional_latency'), 'seed': entry.get('seed'),
+            'min_delay': float(off_diagonal.min()) if off_diagonal.size else None,
+            'mean_delay': float(off_diagonal.mean()) if off_diagonal.size else None,
+            'max_delay': float(off_diagonal.max()) if off_diagonal.size else None,
+            'matrix_hash': matrix_hash(matrix), 'path': os.path.abspath(matrix_path)}
+
+
+def _iso(timestamp: float) -> str:
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds')
+
+
+def _artifact(kind: str, path: str) -> dict:
+    stat = os.stat(path)
+    return {'kind': kind, 'path': os.path.abspath(path), 'bytes': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _cluster_size(path: str):
+    match = CLUSTER_FOLDER.search(os.path.abspath(path))
+    return int(match.group(1)) if match else None
+
+
+def write_run(connection: sqlite3.Connection, run: dict) -> int:
+    """
+    Insert (or replace) one run with its policies, namespaces, matrices and artifacts.
+
+    Args:
+        run: {'run_key', 'name', 'source', 'path', 'cluster_size', 'start_timestamp', 'end_timestamp',
+              'scenario', 'policies': [...], 'namespaces': [{'namespace', 'qps_trend'}], 'matrices': [...],
+              'artifacts': [...]}
+
+    Returns:
+        The run_id.
+    """
+    with connection:
+        connection.execute('DELETE FROM runs WHERE run_key = ?', (run['run_key'],))
+        cursor = connection.execute(
+            'INSERT INTO runs (run_key, name, source, path, cluster_size, start_timestamp, end_timestamp, start_time, '
+            'end_time, scenario, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (run['run_key'], run.get('name'), run.get('source'), run.get('path'), run.get('cluster_size'),
+             run.get('start_timestamp'), run.get('end_timestamp'), _iso(run.get('start_timestamp')),
+             _iso(run.get('end_timestamp')), json.dumps(run['scenario']) if run.get('scenario') else None,
+             datetime.datetime.now().timestamp()))
+        run_id = cursor.lastrowid
+        connection.executemany('INSERT INTO run_policies (run_id, policy) VALUES (?, ?)',
+                               [(run_id, policy) for policy in sorted(set(run.get('policies', [])))])
+        connection.executemany('INSERT INTO run_namespaces (run_id, namespace, qps_trend) VALUES (?, ?, ?)',
+                               [(run_id, spec['namespace'], json.dumps(spec.get('qps_trend')))
+                                for spec in run.get('namespaces', [])])
+        connection.executemany(
+            'INSERT INTO run_matrices (run_id, matrix_index, t, base_latency, max_additional_latency, seed, min_delay, '
+            'mean_delay, max_delay, matrix_hash, path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(run_id, m['matrix_index'], m['t'], m['base_latency'], m['max_additional_latency'], m['seed'],
+              m['min_delay'], m['mean_delay'], m['max_delay'], m['matrix_hash'], m['path'])
+             for m in run.get('matrices', [])])
+        connection.executemany('INSERT INTO artifacts (run_id, kind, path, bytes, mtime) VALUES (?, ?, ?, ?, ?)',
+                               [(run_id, a['kind'], a['path'], a['bytes'], a['mtime']) for a in run.get('artifacts', [])])
+    return run_id
+
+
+# (1) ############################################ Orchestrator run directories ###########################################
+
+def _scenario_timeline(scenario: dict) -> list:
+    timeline = (scenario.get('network') or {}).get('timeline')
+    if isinstance(timeline, list):
+        return sorted(timeline, key=lambda entry: float(entry['t']))
+    if isinstance(timeline, str) and os.path.exists(timeline):
+        from iDynamicsPackagesModules.NetworkingDynamicsManager.network_dynamics_scheduler import load_timeline
+        return load_timeline(timeline)
+    if isinstance(timeline, dict):
+        from iDynamicsPackagesModules.NetworkingDynamicsManager.network_dynamics_scheduler import generate_stochastic_timeline
+        return generate_stochastic_timeline(**timeline['generate'])
+    return []
+
+
+def _policy_name(policy_spec: dict) -> str:
+    return policy_spec.get('name') or policy_spec['class'].split(':')[-1].split('.')[-1].lower()
+
+
+def describe_run_dir(run_dir: str) -> dict:
+    """The catalog row of an orchestrator run directory (run.json, scenario.json, events.csv, delay matrices)."""
+    from iDynamicsPackagesModules.Evaluations.experiment_orchestrator import load_scenario
+    with open(os.path.join(run_dir, 'run.json'), 'r') as f:
+        run_info = json.load(f)
+    scenario_path = os.path.join(run_dir, 'scenario.json')
+    scenario = load_scenario(scenario_path) if os.path.exists(scenario_path) else {}
+    start, end = run_info.get('start_timestamp'), run_info.get('end_timestamp')
+    events_path = os.path.join(run_dir, 'events.csv')
+    if end is None and os.path.exists(events_path) and start is not None:
+        events = pd.read_csv(events_path)
+        if not events.empty:
+            end = start + float(events['actual_stop_t'].max())
+    node_details = run_info.get('node_details')
+    cluster_size = scenario.get('cluster_size') or (len(node_details) if node_details else None) or _cluster_size(run_dir)
+
+    timeline = _scenario_timeline(scenario)
+    matrix_paths = sorted(glob.glob(os.path.join(run_dir, 'delay_matrix_*.csv')),
+                          key=lambda path: int(re.search(r'delay_matrix_(\d+)\.csv$', path).group(1)))
+    matrices = []
+    for path in matrix_paths:
+        index = int(re.search(r'delay_matrix_(\d+)\.csv$', path).group(1))
+        matrices.append(_matrix_row(index, path, timeline[index] if index < len(timeline) else None))
+
+    kinds = {'events.csv': 'events', 'network_timeline.csv': 'network_timeline', 'scenario.json': 'scenario',
+             'run.json': 'run', 'wrk2_runs.parquet': 'wrk2_runs', 'wrk2_spectrum.parquet': 'wrk2_spectrum'}
+    artifacts = []
+    for name in sorted(os.listdir(run_dir)):
+        path = os.path.join(run_dir, name)
+        if name in kinds:
+            artifacts.append(_artifact(kinds[name], path))
+        elif name.endswith('wrk_result.txt'):
+            artifacts.append(_artifact('wrk2', path))
+        elif name.startswith('delay_matrix_'):
+            artifacts.append(_artifact('delay_matrix', path))
+        elif name.endswith('.parquet'):
+            artifacts.append(_artifact('latency_series', path))
+        elif os.path.isdir(path) and name == 'pod_events':
+            artifacts.append(_artifact('pod_events', path))
+        elif name.endswith('.log'):
+            artifacts.append(_artifact('log', path))
+
+    return {'run_key': os.path.abspath(run_dir), 'name': run_info.get('name') or scenario.get('name'),
+            'source': 'orchestrator', 'path': os.path.abspath(run_dir), 'cluster_size': cluster_size,
+            'start_timestamp': start, 'end_timestamp': end, 'scenario': scenario,
+            'policies': [_policy_name(spec) for spec in scenario.get('policies', [])] or [scenario.get('policy', 'k8s')],
+            'namespaces': [{'namespace': spec['namespace'], 'qps_trend': spec.get('qps_trend')
+                            or [phase['qps'] for phase in spec.get('phases', [])]}
+                           for spec in scenario.get('namespaces', [])],
+            'matrices': matrices, 'artifacts': artifacts}
+
+
+def register_run(catalog_path: str, run_dir: str) -> int:
+    """Add (or refresh) an orchestrator run directory in the catalog; returns its run_id."""
+    connection = open_catalog(catalog_path)
+    try:
+        return write_run(connection, describe_run_dir(run_dir))
+    finally:
+        connection.close()
+
+
+# (2) ################################################## Legacy folders ##################################################
+
+def file_timestamp(name: str) -> tuple:
+    """(timestamp text, epoch seconds) of an artifact file name (the names' times are UTC), or (None, None)."""
+    for pattern, time_format in TIMESTAMP_PATTERNS:
+        match = pattern.search(name)
+        if match:
+            return match.group(1), datetime.datetime.strptime(match.group(1), time_format).replace(
+                tzinfo=datetime.timezone.utc).timestamp()
+    return None, None
+
+
+def _experiment_folder(path: str) -> str:
+    """Nearest Policy<N>_eval_* ancestor (the folder a campaign's files belong to), else the file's folder."""
+    directory = os.path.dirname(os.path.abspath(path))
+    candidate = directory
+    while candidate and candidate != os.path.dirname(candidate):
+        if POLICY_FOLDER.match(os.path.basename(candidate)):
+            return candidate
+        candidate = os.path.dirname(candidate)
+    return directory
+
+
+def _folder_policy(folder: str):
+    match = POLICY_FOLDER.match(os.path.basename(folder))
+    return f"policy{match.group(1)}" if match else None
+
+
+def _latency_csv_summary(path: str) -> tuple:
+    """(start, end, namespaces) of a legacy <series>,timestamp,value CSV (header optional, series = label dict or name)."""
+    with open(path, 'r') as f:
+        has_header = not f.readline().startswith(('"', '{'))
+    df = pd.read_csv(path, header=0 if has_header else None, names=['metric', 'timestamp', 'value'], usecols=[0, 1])
+    if df.empty:
+        return None, None, []
+    timestamps = pd.to_datetime(df['timestamp'], format='ISO8601')
+    namespaces = set()
+    for metric in df['metric'].drop_duplicates():
+        if not str(metric).startswith('{'):
+            continue
+        labels = ast.literal_eval(metric)
+        namespace = labels.get('namespace') or labels.get('destination_workload_namespace')
+        if namespace:
+            namespaces.add(namespace)
+    epoch = lambda moment: moment.tz_localize('UTC').timestamp()
+    return epoch(timestamps.min()), epoch(timestamps.max()), sorted(namespaces)
+
+
+def _legacy_run(folder: str, stamp: str, root: str) -> dict:
+    return {'run_key': f"{os.path.abspath(folder)}@{stamp}" if stamp else os.path.abspath(folder),
+            'name': f"{os.path.relpath(folder, root)}@{stamp}" if stamp else os.path.relpath(folder, root),
+            'source': 'legacy', 'path': os.path.abspath(folder), 'cluster_size': _cluster_size(folder),
+            'start_timestamp': None, 'end_timestamp': None, 'policies': set(), 'namespaces': {},
+            'matrices': [], 'artifacts': []}
+
+
+def describe_legacy_tree(root: str) -> list:
+    """Group the timestamped artifacts below root (outside orchestrator run directories) into catalog runs."""
+    from iDynamicsPackagesModules.Evaluations.wrk2_output_parser import parse_files
+
+    runs, wrk2_files, matrix_files = {}, [], []
+    for directory, subdirectories, files in os.walk(root):
+        if 'run.json' in files:
+            subdirectories[:] = []
+            continue
+        subdirectories[:] = [name for name in subdirectories if not name.startswith(('.', '__pycache__'))]
+        for name in files:
+            path = os.path.join(directory, name)
+            folder = _experiment_folder(path)
+            stamp, timestamp = file_timestamp(name)
+            if name.endswith('.txt') and (name.startswith('output_result_') or name.endswith('wrk_result.txt')):
+                wrk2_files.append((path, folder, stamp, timestamp))
+            elif name.startswith('delay_matrix') and name.endswith('.csv'):
+                if timestamp is not None:
+                    matrix_files.append((timestamp, path))
+            elif name.endswith('.csv') and 'latency' in name and stamp:
+                run = runs.setdefault((folder, stamp), _legacy_run(folder, stamp, root))
+                start, end, namespaces = _latency_csv_summary(path)
+                run['start_timestamp'] = min(filter(None, [run['start_timestamp'], start]), default=None)
+                run['end_timestamp'] = max(filter(None, [run['end_timestamp'], end]), default=None)
+                for namespace in namespaces:
+                    run['namespaces'].setdefault(namespace, [])
+                prefix = name[:name.index(stamp)].strip('_').lower()
+                policy = PREFIX_POLICIES.get(prefix) or (prefix if re.fullmatch(r'policy\d+', prefix) else _folder_policy(folder))
+                if policy:
+                    run['policies'].add(policy)
+                run['artifacts'].append(_artifact('latency_series', path))
+            elif name == 'df_exec_graph.csv' or name.endswith('.log'):
+                run = runs.setdefault((folder, None), _legacy_run(folder, None, root))
+                run['artifacts'].append(_artifact('exec_graph' if name.endswith('.csv') else 'log', path))
+                if _folder_policy(folder):
+                    run['policies'].add(_folder_policy(folder))
+
+    # a wrk2 output belongs to the latency run of its experiment folder whose time range contains its start
+    # (the collection notebooks query [first wrk2 start, last wrk2 end]); otherwise it is a run of its own
+    runs_df, _ = parse_files([path for path, _, _, _ in wrk2_files]) if wrk2_files else (pd.DataFrame(), None)
+    for path, folder, stamp, timestamp in wrk2_files:
+        owner = None
+        for (run_folder, _), run in runs.items():
+            if run_folder == folder and timestamp is not None and run['start_timestamp'] is not None \
+                    and run['end_timestamp'] is not None and run['start_timestamp'] - 120 <= timestamp <= run['end_timestamp']:
+                owner = run
+                break
+        if owner is None:
+            owner = runs.setdefault((folder, stamp), _legacy_run(folder, stamp, root))
+            owner['start_timestamp'] = min(filter(None, [owner['start_timestamp'], timestamp]), default=None)
+        file_runs = runs_df[runs_df['file'] == path].copy() if not runs_df.empty else runs_df
+        if len(file_runs):
+            file_runs['namespace'] = file_runs['url'].astype(str).str.extract(WRK2_URL_NAMESPACE, expand=False)
+            if 'rate' not in file_runs:
+                file_runs['rate'] = np.nan
+            # the namespaces of one file ran side by side: the file spans the longest namespace's sequence
+            if timestamp is not None and 'duration_s' in file_runs:
+                span = file_runs.groupby(file_runs['namespace'].fillna(''))['duration_s'].sum().max()
+                owner['end_timestamp'] = max(filter(None, [owner['end_timestamp'], timestamp + span]))
+            for namespace, rate in file_runs[['namespace', 'rate']].dropna(subset=['namespace']).itertuples(index=False):
+                owner['namespaces'].setdefault(namespace, []).append(None if pd.isna(rate) else float(rate))
+        if _folder_policy(folder):
+            owner['policies'].add(_folder_policy(folder))
+        owner['artifacts'].append(_artifact('wrk2', path))
+
+    _link_legacy_matrices(runs.values(), matrix_files)
+
+    described = []
+    for run in runs.values():
+        run['policies'] = sorted(run['policies'])
+        run['namespaces'] = [{'namespace': namespace, 'qps_trend': qps if any(rate is not None for rate in qps) else None}
+                             for namespace, qps in run['namespaces'].items()]
+        described.append(run)
+    return described
+
+
+def _link_legacy_matrices(runs, matrix_files: list) -> None:
+    """Add the timestamped matrices in force during each run (the last one before its start, and later ones)."""
+    matrix_files = sorted(matrix_files)
+    timestamps = [timestamp for timestamp, _ in matrix_files]
+    for run in runs:
+        start = run['start_timestamp']
+        if start is None:
+            continue
+        end = run['end_timestamp'] if run['end_timestamp'] is not None else start
+        first = max(bisect.bisect_right(timestamps, start) - 1, 0)
+        for timestamp, path in matrix_files[first:bisect.bisect_right(timestamps, end)]:
+            entry = {'t': max(timestamp - start, 0.0)}
+            run['matrices'].append(_matrix_row(len(run['matrices']), path, entry))
+            run['artifacts'].append(_artifact('delay_matrix', path))
+
+
+def scan_tree(catalog_path: str, root: str) -> dict:
+    """
+    Index everything below root: orchestrator run directories (with run.json) and legacy artifact files.
+
+    Returns:
+        {'orchestrator': number of run directories, 'legacy': number of legacy runs}
+    """
+    connection = open_catalog(catalog_path)
+    counts = {'orchestrator': 0, 'legacy': 0}
+    try:
+        for run_json in sorted(glob.glob(os.path.join(root, '**', 'run.json'), recursive=True)):
+            write_run(connection, describe_run_dir(os.path.dirname(run_json)))
+            counts['orchestrator'] += 1
+        for run in describe_legacy_tree(root):
+            write_run(connection, run)
+            counts['legacy'] += 1
+    finally:
+        connection.close()
+    print(f"Indexed {counts['orchestrator']} orchestrator runs and {counts['legacy']} legacy runs below {root}")
+    return counts
+
+
+# (3) ##################################################### Queries ######################################################
+
+def find_runs(catalog_path: str, policy: str = None, cluster_size: int = None, namespace: str = None,
+              start=None, end=None, min_base_latency: float = None, max_base_latency: float = None,
+              matrix_hash: str = None, source: str = None) -> pd.DataFrame:
+    """
+    Runs matching all given filters.
+
+    Args:
+        policy: e.g. 'policy4', 'policy1', 'k8s'.
+        cluster_size: Number of worker nodes.
+        namespace: A namespace the run loaded.
+        start, end: The run overlaps [start, end] (naive UTC datetimes or epoch seconds).
+        min_base_latency, max_base_latency: Some injected matrix has base_latency in the range (ms); matrices
+            without a recorded base_latency use their smallest off-diagonal delay.
+        matrix_hash: Some injected matrix has this hash (see matrix_hash()).
+        source: 'orchestrator' or 'legacy'.
+
+    Returns:
+        DataFrame with one row per run (policies / namespaces comma-joined, max_base_latency of its matrices).
+    """
+    to_epoch = lambda moment: (moment.replace(tzinfo=datetime.timezone.utc).timestamp()
+                               if isinstance(moment, datetime.datetime) and moment.tzinfo is None
+                               else moment.timestamp() if isinstance(moment, datetime.datetime) else float(moment))
+    conditions, parameters = [], []
+    if policy is not None:
+        conditions.append('EXISTS (SELECT 1 FROM run_policies p WHERE p.run_id = r.run_id AND p.policy = ?)')
+        parameters.append(policy.lower())
+    if cluster_size is not None:
+        conditions.append('r.cluster_size = ?')
+        parameters.append(int(cluster_size))
+    if namespace is not None:
+        conditions.append('EXISTS (SELECT 1 FROM run_namespaces n WHERE n.run_id = r.run_id AND n.namespace = ?)')
+        parameters.append(namespace)
+    if start is not None:
+        conditions.append('COALESCE(r.end_timestamp, r.start_timestamp) >= ?')
+        parameters.append(to_epoch(start))
+    if end is not None:
+        conditions.append('r.start_timestamp <= ?')
+        parameters.append(to_epoch(end))
+    if min_base_latency is not None or max_base_latency is not None:
+        conditions.append('EXISTS (SELECT 1 FROM run_matrices m WHERE m.run_id = r.run_id'
+                          ' AND COALESCE(m.base_latency, m.min_delay) BETWEEN ? AND ?)')
+        parameters += [min_base_latency if min_base_latency is not None else -np.inf,
+                       max_base_latency if max_base_latency is not None else np.inf]
+    if matrix_hash is not None:
+        conditions.append('EXISTS (SELECT 1 FROM run_matrices m WHERE m.run_id = r.run_id AND m.matrix_hash = ?)')
+        parameters.append(matrix_hash)
+    if source is not None:
+        conditions.append('r.source = ?')
+        parameters.append(source)
+    query = ("SELECT r.run_id, r.name, r.source, r.cluster_size, r.start_time, r.end_time, r.path,"
+             " (SELECT group_concat(policy, ',') FROM run_policies p WHERE p.run_id = r.run_id) AS policies,"
+             " (SELECT group_concat(namespace, ',') FROM run_namespaces n WHERE n.run_id = r.run_id) AS namespaces,"
+             " (SELECT max(COALESCE(base_latency, min_delay)) FROM run_matrices m WHERE m.run_id = r.run_id) AS max_base_latency"
+             " FROM runs r" + (" WHERE " + " AND ".join(conditions) if conditions else "") +
+             " ORDER BY r.start_timestamp")
+    connection = open_catalog(catalog_path)
+    try:
+        return pd.read_sql_query(query, connection, params=parameters)
+    finally:
+        connection.close()
+
+
+def run_artifacts(catalog_path: str, run_id: int, kind: str = None) -> pd.DataFrame:
+    """Artifacts of a run (optionally of one kind: 'wrk2', 'latency_series', 'delay_matrix', 'log', ...)."""
+    connection = open_catalog(catalog_path)
+    try:
+        query = 'SELECT kind, path, bytes, mtime FROM artifacts WHERE run_id = ?' + (' AND kind = ?' if kind else '')
+        return pd.read_sql_query(query + ' ORDER BY kind, path', connection,
+                                 params=[run_id, kind] if kind else [run_id])
+    finally:
+        connection.close()
+
+# Example usage:
+# CATALOG = 'iDynamicsPackagesModules/Evaluations/catalog.sqlite'
+# scan_tree(CATALOG, 'iDynamicsPackagesModules/Evaluations')
+# runs = find_runs(CATALOG, policy='policy4', cluster_size=10, min_base_latency=5)
+# for run_id in runs['run_id']:
+#     print(run_artifacts(CATALOG, run_id, kind='wrk2')['path'].tolist())
@@ -0,0 +1,353 @@
+'''Declarative experiment orchestrator: one scenario file, one monotonic schedule.
+
+Policy4_workload.main() and the Policy1_demo_workloads.py scripts sequence wrk2 runs, QPS trends and delay
+changes with time.sleep(), Popen and nested thread pools, so every phase starts where the previous one
+happened to end and a 40-minute campaign drifts by minutes. Here a scenario file describes the campaign,
+and every actor is driven against absolute offsets from one time.monotonic() start:
+
+    - one workload actor per namespace (a thread each, so independent namespaces run concurrently):
+      its phases (QPS x call-graph script) start at start + t and their wrk2 -d is cut to the phase end,
+      so a slow wrk2 start-up does not shift the following phases
+    - the network actor: the delay timeline, replayed by NetworkDynamicsScheduler (two-phase switch)
+    - one actor per policy under test: policy.run() every `interval` seconds, as the policies' __main__ loops do
+
+The actual start and stop time of every phase / policy round goes to <run_dir>/events.csv, the network
+switches to <run_dir>/network_timeline.csv, and each namespace's wrk2 output to its own
+<run_dir>/<namespace>__wrk_result.txt (with "# command:" markers for wrk2_output_parser.py).
+
+Scenario file (JSON), e.g. the Policy4 hybrid-dynamics campaign:
+    {
+      "name": "policy4_hybrid_10_nodes",
+      "output_dir": "/home/ubuntu/iDynamics/iDynamicsPackagesModules/Evaluations/Policy4_eval_hybrid_dynamics/data",
+      "duration": 2400,
+      "wrk2": {"binary": "/home/ubuntu/DeathStarBench/wrk2/wrk", "threads": 8, "connections": 64},
+      "scripts": {"compose": "/home/ubuntu/DeathStarBench/socialNetwork/wrk2/scripts/social-network/compose-post.lua"},
+      "namespaces": [
+        {"namespace": "social-network2", "path": "/wrk2-api/post/compose", "scripts": ["compose"],
+         "qps_trend": [30, 18, 40, 30, 10, 34, 55, 40, 48, 20], "interval": 240},
+        {"namespace": "social-network4", "path": "/wrk2-api/post/compose", "scripts": ["compose"],
+         "qps_trend": [30, 18, 40, 30, 10, 34, 55, 40, 48, 20], "interval": 240}
+      ],
+      "network": {"num_workers": 9,
+                  "timeline": [{"t": 0, "base_latency": 0, "max_additional_latency": 0, "seed": 0},
+                               {"t": 300, "base_latency": 5, "max_additional_latency": 10, "seed": 1}]},
+      "policies": [{"class": "iDynamicsPackagesModules.Evaluations.Cluster_10_Nodes.Policy4_eval_hybrid_dynamics.Policy4_hybrid_dynamics:Policy4",
+                    "kwargs": {"prom_url": "http://10.105.116.175:9090", "qos_target": 300, "time_window": 1,
+                               "namespace": "social-network4", "response_code": "200"},
+                    "interval": 20}]
+    }
+A namespace either lists explicit "phases" ([{"t", "duration", "qps", "script"}, ...], t relative to its
+"start") or a "qps_trend" whose every QPS value runs each of its "scripts" for "interval" seconds (the
+order of Policy1_demo_workloads.wrk_different_requests). "network.timeline" is a list of entries, a
+timeline file (load_timeline) or {"generate": {...}} (generate_stochastic_timeline arguments).
+An optional "catalog" (or $IDYNAMICS_CATALOG) is the experiment_catalog.py SQLite file the finished run is added to.
+'''
+
+import os
+import csv
+import json
+import time
+import shutil
+import logging
+import datetime
+import importlib
+import threading
+import subprocess
+
+DEFAULT_WRK2 = {'binary': '/home/ubuntu/DeathStarBench/wrk2/wrk', 'threads': 4, 'connections': 100,
+                'distribution': 'exp', 'overhead': 0.0}  # overhead: seconds wrk2 needs beyond -d (start-up, report)
+DEFAULT_URL = "http://nginx-thrift.{namespace}.svc.cluster.local:8080"
+MIN_PHASE_SECONDS = 1
+
+
+def load_scenario(file_path: str) -> dict:
+    """Read a scenario file; relative script / timeline paths are relative to the scenario file."""
+    with open(file_path, 'r') as f:
+        scenario = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(file_path))
+    for name, path in scenario.get('scripts', {}).items():
+        if not os.path.isabs(path):
+            scenario['scripts'][name] = os.path.join(base_dir, path)
+    timeline = scenario.get('network', {}).get('timeline')
+    if isinstance(timeline, str) and not os.path.isabs(timeline):
+        scenario['network']['timeline'] = os.path.join(base_dir, timeline)
+    scenario.setdefault('name', os.path.splitext(os.path.basename(file_path))[0])
+    return scenario
+
+
+def expand_phases(namespace_spec: dict, scripts: dict) -> list:
+    """
+    The phases of one namespace as [{'t', 'duration', 'qps', 'script'}], t in seconds from the campaign start.
+
+    Args:
+        namespace_spec: One entry of scenario['namespaces'].
+        scripts: scenario['scripts'], {name: lua path}; unknown names are taken as paths.
+    """
+    start = float(namespace_spec.get('start', 0))
+    if 'phases' in namespace_spec:
+        phases = [dict(phase) for phase in namespace_spec['phases']]
+    else:
+        interval = float(namespace_spec['interval'])
+        script_names = namespace_spec.get('scripts') or [namespace_spec['script']]
+        phases, t = [], 0.0
+        for _ in range(int(namespace_spec.get('repeat', 1))):
+            for qps in namespace_spec['qps_trend']:
+                for script in script_names:
+                    phases.append({'t': t, 'duration': interval, 'qps': qps, 'script': script})
+                    t += interval + float(namespace_spec.get('pause', 0))
+    for phase in phases:
+        phase['t'] = start + float(phase['t'])
+        phase['duration'] = float(phase['duration'])
+        phase['script'] = scripts.get(phase['script'], phase['script'])
+    return sorted(phases, key=lambda phase: phase['t'])
+
+
+def wrk2_command(wrk2: dict, url: str, script: str, qps: float, duration_s: int) -> list:
+    return [wrk2['binary'], "-D", wrk2['distribution'], f"-t{wrk2['threads']}", f"-c{wrk2['connections']}",
+            f"-d{duration_s}s", "-L", "-s", script, url, f"-R{qps:g}"]
+
+
+def resolve_policy_class(spec: str):
+    """'package.module:ClassName' -> the class."""
+    module_name, class_name = spec.split(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class ExperimentOrchestrator:
+    """
+    Args:
+        scenario: Scenario dict (see load_scenario() and the module docstring).
+        runner: Node runner for the network actor (default: tc_sync_switch.SSHNodeRunner over the inventory).
+        node_details: {node_name: {...}} for the network actor (default: the first network.num_workers nodes
+            of the node inventory).
+        lead_time: Seconds between run() and t=0, so the first network profile can be staged on time.
+    """
+    EVENT_FIELDS = ['actor', 'name', 'index', 'scheduled_t', 'actual_start_t', 'actual_stop_t', 'start_time',
+                    'stop_time', 'lateness_ms', 'returncode', 'detail']
+
+    def __init__(self, scenario: dict, runner=None, node_details: dict = None, lead_time: float = 5.0):
+        self.scenario = scenario
+        self.runner = runner
+        self.node_details = node_details
+        self.lead_time = lead_time
+        self.wrk2 = dict(DEFAULT_WRK2, **scenario.get('wrk2', {}))
+        self.run_dir = None
+        self._stop_event = threading.Event()
+        self._log_lock = threading.Lock()
+        self._processes = set()
+        self._network_scheduler = None
+        self.start_monotonic = None
+        self.start_wall = None
+
+    # ---------------------------------------------------------------- schedule helpers
+    def _wait_until(self, t: float) -> bool:
+        """Wait until offset t of the schedule; False when the campaign was stopped."""
+        remaining = self.start_monotonic + t - time.monotonic()
+        if remaining > 0:
+            return not self._stop_event.wait(remaining)
+        return not self._stop_event.is_set()
+
+    def _now_t(self) -> float:
+        return time.monotonic() - self.start_monotonic
+
+    def _wall(self, t: float) -> str:
+        return datetime.datetime.fromtimestamp(self.start_wall + t).isoformat(timespec='milliseconds')
+
+    def _log_event(self, actor: str, name: str, index: int, scheduled_t: float, actual_start_t: float,
+                   actual_stop_t: float, returncode=None, detail: str = ''):
+        row = {'actor': actor, 'name': name, 'index': index, 'scheduled_t': f"{scheduled_t:.3f}",
+               'actual_start_t': f"{actual_start_t:.3f}", 'actual_stop_t': f"{actual_stop_t:.3f}",
+               'start_time': self._wall(actual_start_t), 'stop_time': self._wall(actual_stop_t),
+               'lateness_ms': f"{(actual_start_t - scheduled_t) * 1000:.1f}",
+               'returncode': '' if returncode is None else returncode, 'detail': detail}
+        path = os.path.join(self.run_dir, 'events.csv')
+        with self._log_lock:
+            new_file = not os.path.exists(path)
+            with open(path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.EVENT_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(row)
+
+    # ---------------------------------------------------------------- actors
+    def _workload_actor(self, namespace_spec: dict):
+        namespace = namespace_spec['namespace']
+        url = namespace_spec.get('url') or DEFAULT_URL.format(namespace=namespace) + namespace_spec.get('path', '')
+        phases = expand_phases(namespace_spec, self.scenario.get('scripts', {}))
+        output_file = os.path.join(self.run_dir, f"{namespace}__wrk_result.txt")
+        for index, phase in enumerate(phases):
+            if not self._wait_until(phase['t']):
+                break
+            start_t = self._now_t()
+            # the phase ends at its scheduled end, whatever time the previous phase overran by
+            duration_s = int(round(phase['t'] + phase['duration'] - start_t - self.wrk2['overhead']))
+            if duration_s < MIN_PHASE_SECONDS:
+                logging.warning(f"[{namespace}] phase {index} skipped, {start_t - phase['t']:.1f}s late")
+                self._log_event('workload', namespace, index, phase['t'], start_t, start_t, detail='skipped')
+                continue
+            command = wrk2_command(self.wrk2, url, phase['script'], phase['qps'], duration_s)
+            print(f"[{namespace}] t={start_t:.1f}s phase {index}: {' '.join(command)}")
+            with open(output_file, 'a') as f:
+                f.write(f"# command: {' '.join(command)}\n")
+                f.flush()
+                process = subprocess.Popen(command, stdout=f, stderr=subprocess.STDOUT)
+                self._processes.add(process)
+                returncode = process.wait()
+                self._processes.discard(process)
+                f.write("\n\n")
+            self._log_event('workload', namespace, index, phase['t'], start_t, self._now_t(), returncode,
+                            f"qps={phase['qps']:g} script={os.path.basename(phase['script'])} duration={duration_s}s")
+
+    def _network_actor(self):
+        from iDynamicsPackagesModules.NetworkingDynamicsManager.network_dynamics_scheduler import (
+            NetworkDynamicsScheduler, load_timeline, generate_stochastic_timeline)
+        from iDynamicsPackagesModules.NetworkingDynamicsManager.tc_sync_switch import SSHNodeRunner
+
+        network = self.scenario['network']
+        timeline = network['timeline']
+        if isinstance(timeline, str):
+            timeline = load_timeline(timeline)
+        elif isinstance(timeline, dict):
+            timeline = generate_stochastic_timeline(**timeline['generate'])
+        runner = self.runner or SSHNodeRunner(self.node_details)
+        scheduler = NetworkDynamicsScheduler(runner, self.node_details, interface=network.get('interface', 'eth0'),
+                                             log_path=os.path.join(self.run_dir, 'network_timeline.csv'),
+                                             matrix_dir=self.run_dir)
+        self._network_scheduler = scheduler
+        try:
+            # the scheduler keeps its own deadlines; its t=0 is the campaign's t=0
+            rows = scheduler.run(timeline, start_delay=max(0.0, -self._now_t()))
+            for row in rows:
+                t = float(row['scheduled_t'])
+                lateness = float(row['lateness_ms'] or 0) / 1000
+                self._log_event('network', 'timeline', row['index'], t, t + lateness, t + lateness,
+                                detail=f"{row['profile']} spread={row['spread_ms']}ms failed=[{row['failed_nodes']}]")
+        finally:
+            if self.runner is None:
+                runner.close()
+
+    def _policy_actor(self, index: int, policy_spec: dict):
+        policy_class = resolve_policy_class(policy_spec['class'])
+        policy = policy_class(**policy_spec.get('kwargs', {}))
+        name = policy_spec.get('name', f"{policy_class.__name__}_{index}")
+        interval = float(policy_spec.get('interval', 20))
+        t = float(policy_spec.get('start', 0))
+        stop_t = float(policy_spec.get('stop', self.scenario.get('duration', float('inf'))))
+        round_index = 0
+        while t < stop_t and self._wait_until(t):
+            start_t = self._now_t()
+            try:
+                policy.run()
+                detail = ''
+            except Exception as e:
+                logging.exception(f"[{name}] round {round_index} failed")
+                detail = f"error: {e}"
+            self._log_event('policy', name, round_index, t, start_t, self._now_t(), detail=detail)
+            round_index += 1
+            # rounds that ran over their slot are dropped instead of queued
+            t += interval
+            while t < self._now_t():
+                t += interval
+
+    # ---------------------------------------------------------------- campaign
+    def stop(self):
+        """Stop all actors: pending phases are not started and running wrk2 processes are terminated."""
+        self._stop_event.set()
+        if self._network_scheduler is not None:
+            self._network_scheduler.stop()
+        for process in list(self._processes):
+            process.terminate()
+
+    def _prepare_run_dir(self, scenario_path: str = None) -> str:
+        timestamp = datetime.datetime.now().strftime("%Y_%b_%d_%H%M")
+        output_dir = os.path.expanduser(self.scenario.get('output_dir', '.'))
+        run_dir = os.path.join(output_dir, f"{timestamp}__{self.scenario['name']}")
+        os.makedirs(run_dir, exist_ok=True)
+        if scenario_path:
+            shutil.copy(scenario_path, os.path.join(run_dir, 'scenario.json'))
+        else:
+            with open(os.path.join(run_dir, 'scenario.json'), 'w') as f:
+                json.dump(self.scenario, f, indent=2)
+        return run_dir
+
+    def run(self, scenario_path: str = None) -> str:
+        """
+        Run the campaign and block until every actor is done.
+
+        Args:
+            scenario_path: The scenario file, copied verbatim into the run directory.
+
+        Returns:
+            The run directory.
+        """
+        self.run_dir = self._prepare_run_dir(scenario_path)
+        actors = [(f"workload-{spec['namespace']}", self._workload_actor, (spec,))
+                  for spec in self.scenario.get('namespaces', [])]
+        if self.scenario.get('network'):
+            if self.node_details is None:
+                from iDynamicsPackagesModules.NetworkingDynamicsManager.node_inventory import load_node_inventory
+                inventory = load_node_inventory()
+                num_workers = self.scenario['network'].get('num_workers')
+                if num_workers is not None and num_workers < len(inventory.node_names):
+                    # the policies (which load the inventory themselves) must place on the same subset
+                    inventory = inventory.subset(inventory.node_names[:num_workers])
+                    inventory_path = os.path.join(self.run_dir, 'node_inventory.json')
+                    inventory.save(inventory_path)
+                    os.environ['IDYNAMICS_NODE_INVENTORY'] = inventory_path
+                self.node_details = inventory.node_details()
+            actors.append(('network', self._network_actor, ()))
+        actors += [(f"policy-{index}", self._policy_actor, (index, spec))
+                   for index, spec in enumerate(self.scenario.get('policies', []))]
+
+        self.start_monotonic = time.monotonic() + self.lead_time
+        self.start_wall = time.time() + self.lead_time
+        with open(os.path.join(self.run_dir, 'run.json'), 'w') as f:
+            json.dump({'name': self.scenario['name'], 'start_time': self._wall(0), 'start_timestamp': self.start_wall,
+                       'node_details': self.node_details}, f, indent=2)
+        print(f"Campaign {self.scenario['name']} starts at {self._wall(0)}, output in {self.run_dir}")
+
+        threads = [threading.Thread(target=target, args=args, name=name, daemon=True) for name, target, args in actors]
+        for thread in threads:
+            thread.start()
+        try:
+            # the policies loop until the scenario duration, the other actors until their schedule is done
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1.0)
+        except KeyboardInterrupt:
+            print("Interrupted, stopping all actors")
+            self.stop()
+            for thread in threads:
+                thread.join(timeout=10.0)
+        print(f"Campaign {self.scenario['name']} done after {self._now_t():.1f}s")
+        self._finish_run()
+        return self.run_dir
+
+    def _finish_run(self):
+        """Record the end time in run.json and index the run in the experiment catalog, if one is configured."""
+        run_json = os.path.join(self.run_dir, 'run.json')
+        with open(run_json, 'r') as f:
+            run_info = json.load(f)
+        run_info['end_timestamp'] = time.time()
+        with open(run_json, 'w') as f:
+            json.dump(run_info, f, indent=2)
+        catalog_path = self.scenario.get('catalog') or os.environ.get('IDYNAMICS_CATALOG')
+        if catalog_path:
+            from iDynamicsPackagesModules.Evaluations.experiment_catalog import register_run
+            try:
+                register_run(os.path.expanduser(catalog_path), self.run_dir)
+            except Exception:
+                logging.exception(f"Could not add {self.run_dir} to the catalog {catalog_path}")
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    ExperimentOrchestrator(load_scenario(sys.argv[1])).run(scenario_path=sys.argv[1])
+
+# Example usage:
+# python -m iDynamicsPackagesModules.Evaluations.experiment_orchestrator scenarios/policy4_hybrid_10_nodes.json
+# or
+# orchestrator = ExperimentOrchestrator(load_scenario('scenarios/policy1_callgraph.json'))
+# run_dir = orchestrator.run(scenario_path='scenarios/policy1_callgraph.json')
+# print(pd.read_csv(os.path.join(run_dir, 'events.csv'))[['actor', 'name', 'scheduled_t', 'lateness_ms']])
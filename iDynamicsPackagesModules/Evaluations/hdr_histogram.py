@@ -0,0 +1,233 @@
+'''HdrHistogram (High Dynamic Range histogram) on NumPy arrays.
+
+Same bucket layout as HdrHistogram / wrk2 (log-linear buckets, `significant_figures` decimal digits of
+precision over [lowest, highest]), so percentiles of a recorded histogram match what wrk2 prints.
+Values are integers in the histogram's unit; the load generator records microseconds, as wrk2 does.
+
+Histograms with the same layout are merged by adding their count arrays, so per-thread, per-process,
+per-interval and per-repeat histograms combine into exact aggregate percentiles (averaging per-run
+percentiles does not give the percentile of the combined distribution).
+'''
+
+import math
+
+import numpy as np
+
+DEFAULT_LOWEST = 1
+DEFAULT_HIGHEST = 3600 * 1000 * 1000  # 1 h in microseconds
+DEFAULT_SIGNIFICANT_FIGURES = 3
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # frexp(x) = (m, e) with x = m * 2**e and 0.5 <= m < 1, so e is the bit length (exact below 2**53)
+    return np.frexp(values.astype(np.float64))[1].astype(np.int64)
+
+
+class HdrHistogram:
+    """
+    Args:
+        lowest: Lowest discernible value (>= 1).
+        highest: Highest trackable value; larger values are clamped to it.
+        significant_figures: Decimal digits of value precision (1..5).
+    """
+    def __init__(self, lowest: int = DEFAULT_LOWEST, highest: int = DEFAULT_HIGHEST,
+                 significant_figures: int = DEFAULT_SIGNIFICANT_FIGURES):
+        self.lowest = int(lowest)
+        self.highest = int(highest)
+        self.significant_figures = int(significant_figures)
+        largest_single_unit = 2 * 10 ** self.significant_figures
+        sub_bucket_count_magnitude = int(math.ceil(math.log2(largest_single_unit)))
+        self.sub_bucket_half_count_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self.unit_magnitude = int(math.floor(math.log2(self.lowest)))
+        self.sub_bucket_count = 1 << (self.sub_bucket_half_count_magnitude + 1)
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_mask = (self.sub_bucket_count - 1) << self.unit_magnitude
+        smallest_untrackable = self.sub_bucket_count << self.unit_magnitude
+        bucket_count = 1
+        while smallest_untrackable <= self.highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self.bucket_count = bucket_count
+        self.counts = np.zeros((bucket_count + 1) * self.sub_bucket_half_count, dtype=np.int64)
+        self.min_value = None
+        self.max_value = None
+
+    # ---------------------------------------------------------------- layout
+    def layout(self) -> tuple:
+        return self.lowest, self.highest, self.significant_figures
+
+    def empty_copy(self):
+        return HdrHistogram(*self.layout())
+
+    def counts_index(self, values) -> np.ndarray:
+        """Bucket index of every value (vectorized)."""
+        values = np.clip(np.asarray(values, dtype=np.int64), 0, self.highest)
+        bucket_index = _bit_length(values | self.sub_bucket_mask) - self.unit_magnitude - self.sub_bucket_half_count_magnitude - 1
+        sub_bucket_index = values >> (bucket_index + self.unit_magnitude)
+        return ((bucket_index + 1) << self.sub_bucket_half_count_magnitude) + (sub_bucket_index - self.sub_bucket_half_count)
+
+    def _bucket_bounds(self, indices) -> tuple:
+        """(lowest equivalent value, size of the equivalent range) of bucket indices."""
+        indices = np.asarray(indices, dtype=np.int64)
+        bucket_index = (indices >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket_index = (indices & (self.sub_bucket_half_count - 1)) + self.sub_bucket_half_count
+        first = bucket_index < 0
+        sub_bucket_index = np.where(first, sub_bucket_index - self.sub_bucket_half_count, sub_bucket_index)
+        bucket_index = np.where(first, 0, bucket_index)
+        shift = bucket_index + self.unit_magnitude
+        return sub_bucket_index << shift, np.int64(1) << shift
+
+    def lowest_equivalent(self, indices) -> np.ndarray:
+        return self._bucket_bounds(indices)[0]
+
+    def highest_equivalent(self, indices) -> np.ndarray:
+        lowest, size = self._bucket_bounds(indices)
+        return lowest + size - 1
+
+    def median_equivalent(self, indices) -> np.ndarray:
+        lowest, size = self._bucket_bounds(indices)
+        return lowest + (size >> 1)
+
+    # ---------------------------------------------------------------- recording
+    def record(self, value: int, count: int = 1) -> None:
+        self.counts[self.counts_index(value)] += count
+        value = min(int(value), self.highest)
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = value if self.max_value is None else max(self.max_value, value)
+
+    def record_values(self, values, counts=None) -> None:
+        """Record an array of values (optionally with a count each)."""
+        values = np.asarray(values, dtype=np.int64)
+        if values.size == 0:
+            return
+        self.counts += np.bincount(self.counts_index(values), weights=counts,
+                                   minlength=len(self.counts)).astype(np.int64)
+        clipped = np.clip(values, 0, self.highest)
+        low, high = int(clipped.min()), int(clipped.max())
+        self.min_value = low if self.min_value is None else min(self.min_value, low)
+        self.max_value = high if self.max_value is None else max(self.max_value, high)
+
+    def record_corrected_values(self, values, expected_interval: int) -> None:
+        """
+        Record values measured by a closed-loop client with coordinated-omission correction: a value v larger
+        than the expected interval between requests also records v - interval, v - 2*interval, ... (>= interval),
+        the latencies of the requests that would have been sent while the client was blocked.
+        """
+        values = np.asarray(values, dtype=np.int64)
+        self.record_values(values)
+        if expected_interval <= 0:
+            return
+        missing = np.maximum((values - expected_interval) // expected_interval, 0)
+        if missing.sum() == 0:
+            return
+        repeated = np.repeat(values, missing)
+        steps = np.arange(len(repeated)) - np.repeat(np.cumsum(missing) - missing, missing) + 1
+        self.record_values(repeated - steps * expected_interval)
+
+    def add(self, other) -> 'HdrHistogram':
+        """Merge another histogram with the same layout into this one (count arrays are added)."""
+        if other.layout() != self.layout():
+            raise ValueError(f"Histogram layouts differ: {self.layout()} vs {other.layout()}")
+        self.counts += other.counts
+        for value in (other.min_value, other.max_value):
+            if value is not None:
+                self.min_value = value if self.min_value is None else min(self.min_value, value)
+                self.max_value = value if self.max_value is None else max(self.max_value, value)
+        return self
+
+    def reset(self) -> None:
+        self.counts[:] = 0
+        self.min_value = self.max_value = None
+
+    # ---------------------------------------------------------------- statistics
+    @property
+    def total_count(self) -> int:
+        return int(self.counts.sum())
+
+    def mean(self) -> float:
+        total = self.total_count
+        if total == 0:
+            return 0.0
+        return float((self.counts * self.median_equivalent(np.arange(len(self.counts)))).sum() / total)
+
+    def stdev(self) -> float:
+        total = self.total_count
+        if total == 0:
+            return 0.0
+        values = self.median_equivalent(np.arange(len(self.counts))).astype(np.float64)
+        return float(np.sqrt((self.counts * (values - self.mean()) ** 2).sum() / total))
+
+    def values_at_percentiles(self, percentiles) -> np.ndarray:
+        """Value at every percentile (0..100), as the highest equivalent value of its bucket (wrk2's convention)."""
+        percentiles = np.asarray(percentiles, dtype=np.float64)
+        total = self.total_count
+        if total == 0:
+            return np.zeros(percentiles.shape, dtype=np.int64)
+        targets = np.maximum(np.ceil(np.minimum(percentiles, 100.0) / 100.0 * total), 1)
+        indices = np.searchsorted(np.cumsum(self.counts), targets)
+        values = self.highest_equivalent(indices)
+        if self.max_value is not None:
+            values = np.minimum(values, self.highest_equivalent(self.counts_index(self.max_value)))
+        return values
+
+    def value_at_percentile(self, percentile: float) -> int:
+        return int(self.values_at_percentiles([percentile])[0])
+
+    def percentile_spectrum(self, ticks_per_half_distance: int = 5) -> list:
+        """
+        [(value, percentile, total_count)] in the layout of wrk2's "Detailed Percentile spectrum"
+        (percentile steps halve the remaining distance to 100 every ticks_per_half_distance rows).
+        """
+        total = self.total_count
+        if total == 0:
+            return []
+        cumulative = np.cumsum(self.counts)
+        rows, percentile, ticks = [], 0.0, ticks_per_half_distance
+        while True:
+            target = max(int(math.ceil(percentile / 100.0 * total)), 1)
+            index = int(np.searchsorted(cumulative, target))
+            value = int(self.highest_equivalent(index))
+            rows.append((value, percentile / 100.0, int(cumulative[index])))
+            if cumulative[index] >= total:
+                if percentile < 100.0:
+                    rows.append((value, 1.0, total))
+                return rows
+            ticks = ticks_per_half_distance * 2 ** (int(math.log2(100.0 / (100.0 - percentile))) + 1)
+            percentile = min(percentile + 100.0 / ticks, 100.0)
+
+    # ---------------------------------------------------------------- serialization
+    def to_dict(self) -> dict:
+        """Sparse, JSON-serializable form (layout + non-zero buckets)."""
+        indices = np.flatnonzero(self.counts)
+        return {'lowest': self.lowest, 'highest': self.highest, 'significant_figures': self.significant_figures,
+                'min_value': self.min_value, 'max_value': self.max_value,
+                'indices': indices.tolist(), 'counts': self.counts[indices].tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'HdrHistogram':
+        histogram = cls(data['lowest'], data['highest'], data['significant_figures'])
+        histogram.counts[np.asarray(data['indices'], dtype=np.int64)] = np.asarray(data['counts'], dtype=np.int64)
+        histogram.min_value, histogram.max_value = data.get('min_value'), data.get('max_value')
+        return histogram
+
+
+def merge_histograms(histograms) -> HdrHistogram:
+    """Sum of histograms with one layout (one vectorized addition of the stacked count arrays)."""
+    histograms = list(histograms)
+    if not histograms:
+        return HdrHistogram()
+    merged = histograms[0].empty_copy()
+    for histogram in histograms:
+        if histogram.layout() != merged.layout():
+            raise ValueError(f"Histogram layouts differ: {merged.layout()} vs {histogram.layout()}")
+    merged.counts = np.sum([histogram.counts for histogram in histograms], axis=0, dtype=np.int64)
+    extremes = [value for histogram in histograms for value in (histogram.min_value, histogram.max_value) if value is not None]
+    if extremes:
+        merged.min_value, merged.max_value = min(extremes), max(extremes)
+    return merged
+
+# Example usage:
+# histogram = HdrHistogram()                      # microseconds, 1 us .. 1 h, 3 significant figures
+# histogram.record_values(latencies_us)
+# total = merge_histograms([histogram, other_thread_histogram])
+# print(total.values_at_percentiles([50, 99, 99.9]) / 1000.0)   # ms
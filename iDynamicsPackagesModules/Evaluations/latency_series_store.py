@@ -0,0 +1,194 @@
+'''Compact storage for Prometheus range-query exports (e.g. the *_avg_latency.csv files).
+
+The respTime_Collection notebooks write one CSV row per sample with the full label dict of the series
+stringified in the first column, e.g.
+    "{'app': 'nginx-thrift', ..., 'source_workload_namespace': 'unknown'}",2025-03-18 06:54:10,11.70
+so ~1.5 KB of repeated labels carry 8 bytes of value, and loading needs ast.literal_eval on every row.
+
+Here a query result is stored as one Parquet file <base>.parquet:
+    columns          one row per sample: series_id (int32), timestamp, value (float64)
+    file metadata    the dictionary table: the label dict of every series_id, stored once (JSON)
+Labels are parsed once per series; samples are plain columns, so loading is a single columnar read and
+filtering by label is a filter on the small series table followed by a series_id filter on the samples.
+(A separate Parquet table for the labels would cost ~20 KB of per-column metadata for a handful of series,
+more than the samples themselves.)
+
+collect_series() queries Prometheus (query_range) straight into this format, convert_legacy_csv() converts
+the existing CSVs (with or without the metric,timestamp,value header), and load_series() returns the
+long DataFrame (timestamp, value + the requested label columns) the plotting code works with.
+'''
+
+import os
+import ast
+import glob
+import json
+import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+SUFFIX = '.parquet'
+SERIES_METADATA_KEY = b'idynamics.series'
+
+
+def _frames_from_series(label_dicts: list, sample_blocks: list) -> tuple:
+    """label_dicts[k] are the labels of series k, sample_blocks[k] = (timestamps_seconds, values) arrays."""
+    series_df = pd.DataFrame(label_dicts)
+    series_df.insert(0, 'series_id', np.arange(len(label_dicts), dtype=np.int32))
+    counts = [len(timestamps) for timestamps, _ in sample_blocks]
+    if sample_blocks:
+        timestamps = np.concatenate([np.asarray(t, dtype=np.float64) for t, _ in sample_blocks])
+        values = np.concatenate([np.asarray(v, dtype=np.float64) for _, v in sample_blocks])
+    else:
+        timestamps, values = np.empty(0), np.empty(0)
+    samples_df = pd.DataFrame({
+        'series_id': np.repeat(np.arange(len(sample_blocks), dtype=np.int32), counts),
+        'timestamp': pd.to_datetime(np.rint(timestamps * 1000).astype(np.int64), unit='ms'),
+        'value': values,
+    })
+    return series_df, samples_df
+
+
+def frames_from_query_range(data: dict, start: datetime.datetime = None, end: datetime.datetime = None) -> tuple:
+    """
+    Convert a Prometheus query_range JSON response into (series_df, samples_df).
+    start/end (naive UTC, as in the notebooks) optionally clip the samples.
+    """
+    label_dicts, sample_blocks = [], []
+    lower = start.replace(tzinfo=datetime.timezone.utc).timestamp() if start else -np.inf
+    upper = end.replace(tzinfo=datetime.timezone.utc).timestamp() if end else np.inf
+    for result in data['data']['result']:
+        values = np.array(result.get('values', []), dtype=object).reshape(-1, 2)
+        timestamps = values[:, 0].astype(np.float64)
+        samples = values[:, 1].astype(np.float64)  # 'NaN' / '+Inf' strings parse as floats
+        keep = (timestamps >= lower) & (timestamps <= upper)
+        label_dicts.append(result['metric'])
+        sample_blocks.append((timestamps[keep], samples[keep]))
+    return _frames_from_series(label_dicts, sample_blocks)
+
+
+def write_series(base_path: str, series_df: pd.DataFrame, samples_df: pd.DataFrame) -> str:
+    """Write <base_path>.parquet (samples as columns, series labels in the file metadata); returns the path."""
+    os.makedirs(os.path.dirname(os.path.abspath(base_path)), exist_ok=True)
+    labels = [{key: value for key, value in row.items() if key != 'series_id' and not pd.isna(value)}
+              for row in series_df.sort_values('series_id').to_dict('records')]
+    table = pa.Table.from_pandas(samples_df, preserve_index=False)
+    table = table.replace_schema_metadata({SERIES_METADATA_KEY: json.dumps(labels, separators=(',', ':')).encode()})
+    path = base_path + SUFFIX
+    pq.write_table(table, path, compression='zstd')
+    return path
+
+
+def _series_frame(labels: list) -> pd.DataFrame:
+    series_df = pd.DataFrame(labels)
+    series_df.insert(0, 'series_id', np.arange(len(labels), dtype=np.int32))
+    return series_df
+
+
+def _series_frame_column(series_df: pd.DataFrame, label: str, positions: np.ndarray) -> np.ndarray:
+    lookup = np.full(int(series_df['series_id'].max()) + 1 if len(series_df) else 0, None, dtype=object)
+    lookup[series_df['series_id'].to_numpy()] = series_df[label].to_numpy()
+    return lookup[positions]
+
+
+def read_series_labels(base_path: str) -> pd.DataFrame:
+    """The dictionary table: series_id + one column per label (read from the file metadata only)."""
+    return _series_frame(json.loads(pq.read_schema(base_path + SUFFIX).metadata[SERIES_METADATA_KEY]))
+
+
+def collect_series(prom_url: str, query: str, start: datetime.datetime, end: datetime.datetime, step: str,
+                   base_path: str) -> tuple:
+    """
+    Run a Prometheus range query and store the result in the compact format.
+
+    Args:
+        prom_url: Prometheus query_range endpoint, e.g. "http://10.105.116.175:9090/api/v1/query_range".
+        query: PromQL query.
+        start, end: Naive UTC datetimes.
+        step: Resolution, e.g. "10s".
+        base_path: Output base path (without suffix), e.g. 'data/k8s_2025_Mar_18_1156_avg_latency'.
+
+    Returns:
+        (series_df, samples_df)
+    """
+    params = {'query': query, 'start': start.replace(tzinfo=datetime.timezone.utc).timestamp(),
+              'end': end.replace(tzinfo=datetime.timezone.utc).timestamp(), 'step': step}
+    response = requests.get(prom_url, params=params)
+    response.raise_for_status()
+    series_df, samples_df = frames_from_query_range(response.json(), start, end)
+    write_series(base_path, series_df, samples_df)
+    print(f"Stored {len(series_df)} series / {len(samples_df)} samples in {base_path}")
+    return series_df, samples_df
+
+
+def load_series(base_path: str, labels: list = None, **label_filter) -> pd.DataFrame:
+    """
+    Load the samples as a long DataFrame.
+
+    Args:
+        base_path: Base path given to write_series() / collect_series().
+        labels: Label columns to attach to every sample (default: the labels that differ between series).
+        label_filter: Keep only series with these label values, e.g. response_code='200'.
+
+    Returns:
+        DataFrame with timestamp, value, series_id and the label columns, sorted by series and time.
+    """
+    table = pq.read_table(base_path + SUFFIX)
+    series_df = _series_frame(json.loads(table.schema.metadata[SERIES_METADATA_KEY]))
+    for key, value in label_filter.items():
+        series_df = series_df[series_df[key] == value]
+    if labels is None:
+        labels = [column for column in series_df.columns
+                  if column != 'series_id' and series_df[column].nunique(dropna=False) > 1]
+    samples_df = table.to_pandas()
+    if label_filter:
+        samples_df = samples_df[samples_df['series_id'].isin(series_df['series_id'].to_numpy())]
+    # series_id is the row position in the dictionary table: attach labels by take(), not by a merge
+    positions = samples_df['series_id'].to_numpy()
+    for label in labels:
+        samples_df[label] = _series_frame_column(series_df, label, positions)
+    return samples_df.sort_values(['series_id', 'timestamp'], kind='stable', ignore_index=True)
+
+
+def convert_legacy_csv(csv_path: str, base_path: str = None) -> str:
+    """
+    Convert a metric,timestamp,value CSV (stringified label dict per row; header optional) into the compact format.
+    Each distinct label string is parsed once.
+
+    Returns:
+        The base path written (default: the CSV path without '.csv').
+    """
+    with open(csv_path, 'r') as f:
+        has_header = f.readline().startswith('metric,')
+    df = pd.read_csv(csv_path, header=0 if has_header else None, names=['metric', 'timestamp', 'value'])
+    codes, unique_metrics = pd.factorize(df['metric'])
+    label_dicts = [ast.literal_eval(metric) for metric in unique_metrics]
+    series_df = pd.DataFrame(label_dicts)
+    series_df.insert(0, 'series_id', np.arange(len(label_dicts), dtype=np.int32))
+    samples_df = pd.DataFrame({'series_id': codes.astype(np.int32),
+                               'timestamp': pd.to_datetime(df['timestamp']).astype('datetime64[ms]'),
+                               'value': pd.to_numeric(df['value'], errors='coerce')})
+    base_path = base_path or os.path.splitext(csv_path)[0]
+    write_series(base_path, series_df, samples_df)
+    return base_path
+
+
+def convert_legacy_tree(root: str, pattern: str = '*_avg_latency.csv') -> list:
+    """Convert every legacy CSV below root; returns [(csv_path, base_path, csv_bytes, parquet_bytes)]."""
+    converted = []
+    for csv_path in sorted(glob.glob(os.path.join(root, '**', pattern), recursive=True)):
+        base_path = convert_legacy_csv(csv_path)
+        parquet_bytes = os.path.getsize(base_path + SUFFIX)
+        converted.append((csv_path, base_path, os.path.getsize(csv_path), parquet_bytes))
+    return converted
+
+# Example usage:
+# collect_series(PROMETHEUS_API_URL, PROMETHEUS_QUERY_latency_avg, k8s_start_time, k8s_end_time, "10s",
+#                f'data/k8s_{timestamp}_avg_latency')
+# df = load_series(f'data/k8s_{timestamp}_avg_latency', labels=['app'], response_code='200')
+# df.groupby('timestamp', as_index=False)['value'].mean()   # as load_trace() in Reproduce_Fig_from_dataset.ipynb
+#
+# convert_legacy_csv('data/k8s_2025_Mar_18_1156_avg_latency.csv')
@@ -0,0 +1,444 @@
+'''Open-loop HTTP load generator with wrk2 semantics, in Python (asyncio + aiohttp).
+
+The workload scripts shell out to /home/ubuntu/DeathStarBench/wrk2/wrk and scrape its text output. This module
+keeps what matters about wrk2 and drops the binary:
+
+    - open loop: requests are sent at intended times with constant (-D fixed) or exponential (-D exp)
+      inter-arrival times, whether or not earlier requests have completed
+    - coordinated-omission correction: latency is measured from a request's intended send time, so time spent
+      queueing for a busy connection or behind a stalled server counts (the uncorrected service time, from the
+      moment the request got a pooled connection, is recorded separately, like wrk2's --u_latency); a request
+      that times out or fails is recorded with the time until its failure (and counted as an error), so
+      overload shows in the corrected tail instead of vanishing from it
+    - a pluggable request mix; the built-in mixes mirror the DeathStarBench social-network Lua scripts
+      (compose-post, read-home-timeline, read-user-timeline, mixed-workload)
+    - latencies in HdrHistograms (hdr_histogram.py, microseconds), total and per interval, mergeable
+      across processes and runs
+    - the QPS can be changed while a run is in progress (set_rate() or a rate schedule), which wrk2 cannot do
+
+One process drives one asyncio event loop with a pooled aiohttp session (at most `connections` open
+connections); MultiProcessLoadGenerator runs one such generator per core, splits the rate between them
+and merges their histograms. format_wrk2_report() writes the result in wrk2's output format, so
+wrk2_output_parser.py and the existing notebooks read it unchanged.
+'''
+
+import os
+import sys
+import time
+import random
+import string
+import asyncio
+import logging
+import threading
+import multiprocessing
+from urllib.parse import urlsplit
+
+import numpy as np
+import aiohttp
+
+from iDynamicsPackagesModules.Evaluations.hdr_histogram import HdrHistogram, merge_histograms
+
+MAX_USER_INDEX = 962  # users of the socfb-Reed98 social graph loaded by DeathStarBench
+DURATION_UNITS_S = {'s': 1, 'm': 60, 'h': 3600}
+SUMMARY_PERCENTILES = [50, 75, 90, 99, 99.9, 99.99, 99.999, 100]
+FLUSH_PERIOD_S = 1.0
+
+_ALPHANUMERIC = string.ascii_letters + string.digits
+
+
+def parse_duration(duration) -> float:
+    """'40m' / '30s' / '1h' / 90 -> seconds."""
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    if duration[-1] in DURATION_UNITS_S:
+        return float(duration[:-1]) * DURATION_UNITS_S[duration[-1]]
+    return float(duration)
+
+
+# (1) ############################################## Request mix (DeathStarBench social-network Lua scripts) #############
+
+def compose_post(rng: random.Random, max_user_index: int = MAX_USER_INDEX) -> tuple:
+    """compose-post.lua: a 256-character text with 1-6 user mentions and 1-6 URLs, 1-5 media, form-encoded."""
+    user_index = rng.randrange(max_user_index)
+    text = ''.join(rng.choices(_ALPHANUMERIC, k=256))
+    for _ in range(rng.randint(0, 5) + 1):
+        mention = rng.randrange(max_user_index - 1)
+        mention += mention >= user_index  # any user but the author
+        text += f" @username_{mention}"
+    for _ in range(rng.randint(0, 5) + 1):
+        text += " http://" + ''.join(rng.choices(_ALPHANUMERIC, k=64))
+    num_media = rng.randint(0, 4) + 1
+    media_ids = "[" + ",".join(f'"{rng.randrange(10 ** 17, 10 ** 18)}"' for _ in range(num_media)) + "]"
+    media_types = "[" + ",".join('"png"' for _ in range(num_media)) + "]"
+    body = (f"username=username_{user_index}&user_id={user_index}&text={text}"
+            f"&media_ids={media_ids}&media_types={media_types}&post_type=0")
+    return 'POST', '/wrk2-api/post/compose', {'Content-Type': 'application/x-www-form-urlencoded'}, body
+
+
+def read_home_timeline(rng: random.Random, max_user_index: int = MAX_USER_INDEX) -> tuple:
+    """read-home-timeline.lua: 10 posts of a random user's home timeline."""
+    start = rng.randint(0, 100)
+    path = f"/wrk2-api/home-timeline/read?user_id={rng.randrange(max_user_index)}&start={start}&stop={start + 10}"
+    return 'GET', path, {'Content-Type': 'application/x-www-form-urlencoded'}, None
+
+
+def read_user_timeline(rng: random.Random, max_user_index: int = MAX_USER_INDEX) -> tuple:
+    """read-user-timeline.lua: 10 posts of a random user's own timeline."""
+    start = rng.randint(0, 100)
+    path = f"/wrk2-api/user-timeline/read?user_id={rng.randrange(max_user_index)}&start={start}&stop={start + 10}"
+    return 'GET', path, {'Content-Type': 'application/x-www-form-urlencoded'}, None
+
+
+REQUEST_MIXES = {
+    'compose-post': [(compose_post, 1.0)],
+    'read-home-timeline': [(read_home_timeline, 1.0)],
+    'read-user-timeline': [(read_user_timeline, 1.0)],
+    # mixed-workload.lua ratios
+    'mixed-workload': [(read_home_timeline, 0.6), (read_user_timeline, 0.3), (compose_post, 0.1)],
+}
+
+
+class RequestMix:
+    """
+    Weighted choice between request builders; a builder is fn(rng, max_user_index) -> (method, path, headers, body).
+
+    Args:
+        builders: [(builder, weight)], or the name of a built-in mix / the path of the matching Lua script.
+        seed: Seed of the mix's random generator (reproducible request sequences).
+    """
+    def __init__(self, builders, seed: int = None, max_user_index: int = MAX_USER_INDEX):
+        if isinstance(builders, str):
+            name = os.path.splitext(os.path.basename(builders))[0]
+            if name not in REQUEST_MIXES:
+                raise ValueError(f"Unknown request mix {builders!r}, known: {sorted(REQUEST_MIXES)}")
+            builders = REQUEST_MIXES[name]
+        self.builders = [builder for builder, _ in builders]
+        self.weights = [weight for _, weight in builders]
+        self.max_user_index = max_user_index
+        self.rng = random.Random(seed)
+
+    def next_request(self) -> tuple:
+        builder = self.builders[0] if len(self.builders) == 1 else self.rng.choices(self.builders, self.weights)[0]
+        return builder(self.rng, self.max_user_index)
+
+
+# (2) ############################################## Open-loop generator (one event loop) ###############################
+
+class OpenLoopGenerator:
+    """
+    Args:
+        url: Target, e.g. "http://nginx-thrift.social-network.svc.cluster.local:8080" (a path is ignored: the
+            request mix sets it, as the Lua scripts do).
+        rate: Requests per second (wrk2's -R); changeable with set_rate().
+        duration: Run length in seconds or as '40m' / '30s'.
+        connections: Size of the connection pool (wrk2's -c).
+        mix: RequestMix, a built-in mix name or a Lua script path (wrk2's -s).
+        distribution: 'exp' (Poisson arrivals, wrk2 -D exp) or 'fixed' (constant inter-arrival time).
+        timeout: Seconds after which a request counts as a timeout error.
+        interval: If set, a histogram is also kept per interval of this many seconds (by completion time).
+        rate_schedule: [(t_seconds, qps)] changes applied at offsets from the start of the run.
+        seed: Seed of the inter-arrival times and of the request mix.
+        rate_source: Callable returning the current rate; polled before every arrival (used by
+            MultiProcessLoadGenerator to change the rate of all worker processes).
+    """
+    def __init__(self, url: str, rate: float, duration, connections: int = 100, mix='compose-post',
+                 distribution: str = 'exp', timeout: float = 10.0, interval: float = None,
+                 rate_schedule: list = None, seed: int = None, rate_source=None):
+        parts = urlsplit(url)
+        self.base_url = f"{parts.scheme}://{parts.netloc}"
+        self.url = url
+        self.rate = float(rate)
+        self.duration = parse_duration(duration)
+        self.connections = connections
+        self.mix = mix if isinstance(mix, RequestMix) else RequestMix(mix, seed=seed)
+        self.mix_name = mix if isinstance(mix, str) else 'custom'
+        self.distribution = distribution
+        self.timeout = timeout
+        self.interval = interval
+        self.rate_schedule = sorted(rate_schedule or [])
+        self.rate_source = rate_source
+        self.arrivals = random.Random(None if seed is None else seed + 1)
+
+        self.histogram = HdrHistogram()
+        self.uncorrected_histogram = HdrHistogram()
+        self.interval_histograms = {}
+        self.requests = 0
+        self.non_2xx = 0
+        self.bytes_read = 0
+        self.errors = {'connect': 0, 'read': 0, 'write': 0, 'timeout': 0}
+        self._latencies, self._service_times, self._completions = [], [], []
+        self._loop = None
+        self._stopped = False
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Stamps the moment a request obtains a connection (new or reused) in its trace_request_ctx."""
+        async def on_connection(session, trace_config_ctx, params):
+            trace_config_ctx.trace_request_ctx['sent'] = self._loop.time()
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_connection)
+        trace_config.on_connection_reuseconn.append(on_connection)
+        return trace_config
+
+    def set_rate(self, rate: float) -> None:
+        """Change the request rate; takes effect from the next arrival (safe to call from another thread)."""
+        self.rate = float(rate)
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def _current_rate(self) -> float:
+        return self.rate_source() if self.rate_source is not None else self.rate
+
+    def _next_gap(self, rate: float) -> float:
+        return self.arrivals.expovariate(rate) if self.distribution == 'exp' else 1.0 / rate
+
+    def _flush(self) -> None:
+        """Move the buffered latencies (seconds) into the histograms (microseconds)."""
+        if not self._latencies:
+            return
+        latencies = np.rint(np.asarray(self._latencies) * 1e6).astype(np.int64)
+        self.histogram.record_values(latencies)
+        service_times = np.asarray(self._service_times, dtype=np.float64)  # NaN: failed before getting a connection
+        self.uncorrected_histogram.record_values(np.rint(service_times[~np.isnan(service_times)] * 1e6).astype(np.int64))
+        if self.interval:
+            slots = (np.asarray(self._completions) // self.interval).astype(np.int64)
+            for slot in np.unique(slots):
+                if slot not in self.interval_histograms:
+                    self.interval_histograms[slot] = HdrHistogram()
+                self.interval_histograms[slot].record_values(latencies[slots == slot])
+        self._latencies, self._service_times, self._completions = [], [], []
+
+    async def _send(self, session: aiohttp.ClientSession, intended: float, start: float):
+        method, path, headers, body = self.mix.next_request()
+        context = {'sent': None}  # set by the trace config once a pooled connection is assigned
+        error = None
+        try:
+            async with session.request(method, self.base_url + path, headers=headers, data=body,
+                                       trace_request_ctx=context) as response:
+                payload = await response.read()
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except aiohttp.ClientConnectorError:
+            error = 'connect'
+        except aiohttp.ClientError:
+            error = 'read'
+        done = self._loop.time()
+        if error:
+            self.errors[error] += 1
+        else:
+            self.requests += 1
+            self.bytes_read += len(payload)
+            if response.status >= 400:
+                self.non_2xx += 1
+        self._latencies.append(done - intended)
+        self._service_times.append(done - context['sent'] if context['sent'] is not None else np.nan)
+        self._completions.append(done - start)
+
+    async def _apply_schedule(self, start: float):
+        for t, rate in self.rate_schedule:
+            await asyncio.sleep(max(0.0, start + t - self._loop.time()))
+            if self._stopped:
+                return
+            self.set_rate(rate)
+            logging.info(f"Rate changed to {rate} req/s at t={self._loop.time() - start:.1f}s")
+
+    async def _periodic_flush(self):
+        while True:
+            await asyncio.sleep(FLUSH_PERIOD_S)
+            self._flush()
+
+    async def run_async(self) -> dict:
+        self._loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=self.connections, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        pending = set()
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         trace_configs=[self._trace_config()]) as session:
+            start = self._loop.time()
+            end = start + self.duration
+            helpers = [asyncio.create_task(self._periodic_flush())]
+            if self.rate_schedule:
+                helpers.append(asyncio.create_task(self._apply_schedule(start)))
+            intended = start
+            while intended < end and not self._stopped:
+                delay = intended - self._loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                rate = self._current_rate()
+                if rate <= 0:
+                    intended += FLUSH_PERIOD_S / 10  # paused; poll the rate again
+                    continue
+                # the request is due at `intended` even if the loop is behind (open loop)
+                task = asyncio.create_task(self._send(session, intended, start))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                intended += self._next_gap(rate)
+            # the send window (the configured duration unless stopped early), not including the drain below
+            send_window = (min(self._loop.time(), end) if self._stopped else end) - start
+            if pending:
+                await asyncio.wait(pending, timeout=self.timeout)
+            for helper in helpers:
+                helper.cancel()
+        self._flush()
+        return self.result(send_window)
+
+    def run(self) -> dict:
+        """Run to completion in a new event loop; returns the result dict (see result())."""
+        return asyncio.run(self.run_async())
+
+    def result(self, send_window: float) -> dict:
+        """
+        Args:
+            send_window: Seconds during which requests were sent (duration_s; requests_per_sec is computed over it).
+
+        Returns:
+            {'url', 'mix', 'duration_s', 'connections', 'requests', 'requests_per_sec', 'bytes_read', 'non_2xx',
+             'errors', 'histogram', 'uncorrected_histogram', 'interval_histograms' ({start_s: HdrHistogram})}
+        """
+        return {'url': self.url, 'mix': self.mix_name, 'duration_s': send_window, 'connections': self.connections,
+                'threads': 1, 'requests': self.requests,
+                'requests_per_sec': self.requests / send_window if send_window else 0.0,
+                'bytes_read': self.bytes_read, 'non_2xx': self.non_2xx, 'errors': dict(self.errors),
+                'histogram': self.histogram, 'uncorrected_histogram': self.uncorrected_histogram,
+                'interval_histograms': {float(slot * self.interval): histogram
+                                        for slot, histogram in sorted(self.interval_histograms.items())}}
+
+
+# (3) ############################################## One generator per core #############################################
+
+def _serialize_result(result: dict) -> dict:
+    result = dict(result)
+    result['histogram'] = result['histogram'].to_dict()
+    result['uncorrected_histogram'] = result['uncorrected_histogram'].to_dict()
+    result['interval_histograms'] = {t: h.to_dict() for t, h in result['interval_histograms'].items()}
+    return result
+
+
+def _worker(process_index: int, processes: int, shared_rate, result_queue, kwargs: dict):
+    seed = kwargs.pop('seed', None)
+    generator = OpenLoopGenerator(rate=shared_rate.value / processes,
+                                  rate_source=lambda: shared_rate.value / processes,
+                                  seed=None if seed is None else seed + 1000 * process_index, **kwargs)
+    result_queue.put(_serialize_result(generator.run()))
+
+
+def merge_results(results: list) -> dict:
+    """Merge the results of several generators (processes, or repeated runs of one scenario)."""
+    merged = {'url': results[0]['url'], 'mix': results[0]['mix'], 'threads': sum(r['threads'] for r in results),
+              'connections': sum(r['connections'] for r in results),
+              'duration_s': max(r['duration_s'] for r in results)}
+    for key in ('requests', 'bytes_read', 'non_2xx'):
+        merged[key] = sum(r[key] for r in results)
+    merged['errors'] = {key: sum(r['errors'][key] for r in results) for key in results[0]['errors']}
+    merged['requests_per_sec'] = merged['requests'] / merged['duration_s'] if merged['duration_s'] else 0.0
+    merged['histogram'] = merge_histograms(r['histogram'] for r in results)
+    merged['uncorrected_histogram'] = merge_histograms(r['uncorrected_histogram'] for r in results)
+    slots = sorted({t for r in results for t in r['interval_histograms']})
+    merged['interval_histograms'] = {t: merge_histograms(r['interval_histograms'][t] for r in results
+                                                         if t in r['interval_histograms']) for t in slots}
+    return merged
+
+
+class MultiProcessLoadGenerator:
+    """
+    OpenLoopGenerator in `processes` worker processes (default: one per core). The rate and the connections are
+    split evenly; set_rate() changes the total rate of all workers through shared memory.
+
+    Args:
+        rate: Total requests per second.
+        processes: Number of worker processes.
+        kwargs: OpenLoopGenerator arguments (url, duration, connections, mix (a name or script path), ...).
+    """
+    def __init__(self, rate: float, processes: int = None, connections: int = 100, rate_schedule: list = None, **kwargs):
+        self.processes = processes or os.cpu_count()
+        self.shared_rate = multiprocessing.Value('d', float(rate))
+        self.connections = max(1, connections // self.processes)
+        self.rate_schedule = sorted(rate_schedule or [])
+        self.kwargs = kwargs
+
+    def set_rate(self, rate: float) -> None:
+        self.shared_rate.value = float(rate)
+
+    def _apply_schedule(self, start: float, done: threading.Event):
+        for t, rate in self.rate_schedule:
+            if done.wait(max(0.0, start + t - time.monotonic())):
+                return
+            self.set_rate(rate)
+
+    def run(self) -> dict:
+        result_queue = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_worker, args=(index, self.processes, self.shared_rate, result_queue,
+                                                                 dict(self.kwargs, connections=self.connections)))
+                   for index in range(self.processes)]
+        done = threading.Event()
+        scheduler = threading.Thread(target=self._apply_schedule, args=(time.monotonic(), done), daemon=True)
+        for worker in workers:
+            worker.start()
+        scheduler.start()
+        results = [result_queue.get() for _ in workers]
+        done.set()
+        for worker in workers:
+            worker.join()
+        for result in results:
+            result['histogram'] = HdrHistogram.from_dict(result['histogram'])
+            result['uncorrected_histogram'] = HdrHistogram.from_dict(result['uncorrected_histogram'])
+            result['interval_histograms'] = {t: HdrHistogram.from_dict(h) for t, h in result['interval_histograms'].items()}
+        return merge_results(results)
+
+
+# (4) ############################################## wrk2-compatible report ##############################################
+
+def format_wrk2_report(result: dict, duration_label: str = None) -> str:
+    """The result as wrk2 prints it (-L), so wrk2_output_parser.parse_file() reads it like a wrk2 run."""
+    histogram = result['histogram']
+    label = duration_label or f"{int(round(result['duration_s']))}s"
+    lines = [f"Running {label} test @ {result['url']}",
+             f"  {result['threads']} threads and {result['connections']} connections",
+             "  Thread Stats   Avg      Stdev     Max   +/- Stdev",
+             f"    Latency   {histogram.mean() / 1000:.2f}ms  {histogram.stdev() / 1000:.2f}ms "
+             f"{(histogram.max_value or 0) / 1000:.2f}ms   0.00%",
+             "  Latency Distribution (HdrHistogram - Recorded Latency)"]
+    for percentile, value in zip(SUMMARY_PERCENTILES, histogram.values_at_percentiles(SUMMARY_PERCENTILES)):
+        lines.append(f" {percentile:7.3f}%  {value / 1000:7.2f}ms")
+    lines += ["", "  Detailed Percentile spectrum:",
+              "       Value   Percentile   TotalCount 1/(1-Percentile)", ""]
+    for value, percentile, count in histogram.percentile_spectrum():
+        inverse = f"{1 / (1 - percentile):12.2f}" if percentile < 1 else "         inf"
+        lines.append(f"{value / 1000:12.3f} {percentile:12.6f} {count:10d} {inverse}")
+    lines += [f"#[Mean    = {histogram.mean() / 1000:12.3f}, StdDeviation   = {histogram.stdev() / 1000:12.3f}]",
+              f"#[Max     = {(histogram.max_value or 0) / 1000:12.3f}, Total count    = {histogram.total_count:12d}]",
+              f"#[Buckets = {histogram.bucket_count:12d}, SubBuckets     = {histogram.sub_bucket_count:12d}]",
+              "----------------------------------------------------------",
+              f"  {result['requests']} requests in {result['duration_s']:.2f}s, {result['bytes_read'] / 1024 ** 2:.2f}MB read"]
+    errors = result['errors']
+    if any(errors.values()):
+        lines.append(f"  Socket errors: connect {errors['connect']}, read {errors['read']}, "
+                     f"write {errors['write']}, timeout {errors['timeout']}")
+    if result['non_2xx']:
+        lines.append(f"  Non-2xx or 3xx responses: {result['non_2xx']}")
+    lines += [f"Requests/sec: {result['requests_per_sec']:10.2f}",
+              f"Transfer/sec: {result['bytes_read'] / max(result['duration_s'], 1e-9) / 1024:10.2f}KB"]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == '__main__':
+    # wrk2-like command line: open_loop_loadgen.py URL RATE DURATION [CONNECTIONS] [MIX] [PROCESSES]
+    logging.basicConfig(level=logging.INFO)
+    url, rate, duration = sys.argv[1], float(sys.argv[2]), sys.argv[3]
+    connections = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+    mix = sys.argv[5] if len(sys.argv) > 5 else 'compose-post'
+    processes = int(sys.argv[6]) if len(sys.argv) > 6 else 1
+    if processes > 1:
+        result = MultiProcessLoadGenerator(rate, processes, connections, url=url, duration=duration, mix=mix).run()
+    else:
+        result = OpenLoopGenerator(url, rate, duration, connections, mix).run()
+    print(format_wrk2_report(result, duration))
+
+# Example usage:
+# generator = OpenLoopGenerator("http://nginx-thrift.social-network.svc.cluster.local:8080", rate=30, duration='40m',
+#                               connections=64, mix='mixed-workload', interval=60,
+#                               rate_schedule=[(240 * k, qps) for k, qps in enumerate([30, 18, 40, 30, 10, 34, 55, 40, 48, 20])])
+# result = generator.run()
+# print(result['histogram'].values_at_percentiles([50, 99, 99.9]) / 1000.0)   # ms, coordinated-omission corrected
+# with open('output_result_loadgen.txt', 'w') as f:
+#     f.write(format_wrk2_report(result))
@@ -0,0 +1,292 @@
+'''Mergeable tail percentiles across wrk2 threads, URLs, QPS intervals and repeats.
+
+Averaging per-run p99 values (as the analysis of the Policy4_workload outputs does) is not the p99 of the
+combined requests: a short run at high QPS and a long run at low QPS weigh the same, and the tail of the
+merged distribution is not a mean of tails. Here every run becomes an HdrHistogram and runs are combined by
+adding their bucket counts:
+
+    - wrk2 runs: the "Detailed Percentile spectrum" (wrk2_output_parser: value_ms, percentile, total_count)
+      is wrk2's own HdrHistogram (1 us .. 24 h, 3 significant figures) read at increasing percentiles, so the
+      histogram has to be reconstructed and is approximate. The count between two consecutive rows is spread
+      over the buckets between the two row values (in proportion to the bucket widths, i.e. uniformly in
+      value). The reconstructed histogram has the same percentiles as wrk2's at every spectrum row; between
+      rows a merged percentile is off by at most the gap between the two rows around it, typically < 1% on
+      lognormal-like latencies (recording every count at the upper row value instead overestimated merged
+      percentiles by up to ~10%, most around p50). wrk2 already merges its threads into one histogram per run.
+    - open_loop_loadgen.py results carry native histograms (per process and per interval); merging them is exact.
+
+aggregate_percentiles() merges all runs of a group (e.g. policy x time window) in one vectorized pass: the
+buckets of every spectrum row are computed at once and np.bincount adds the counts of all rows into a
+(groups x buckets) count matrix; percentiles are read from each row of the matrix. add_run_times() places
+every wrk2 run in time (orchestrator events.csv, or the file name timestamp plus the durations of the
+earlier runs of the same namespace), add_windows() assigns time windows and add_policies() the policy.
+'''
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from iDynamicsPackagesModules.Evaluations.hdr_histogram import HdrHistogram, merge_histograms
+from iDynamicsPackagesModules.Evaluations.experiment_catalog import WRK2_URL_NAMESPACE, file_timestamp, open_catalog
+
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+WRK2_HIGHEST_US = 24 * 3600 * 1000 * 1000  # wrk2 tracks latencies up to 24 h
+
+
+# (1) ############################################ Histograms and merging ##############################################
+
+def _percentile_label(percentile: float) -> str:
+    return 'p' + f"{float(percentile):g}".replace('.', '_') + '_ms'
+
+
+def spectrum_counts(spectrum_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Spectrum rows with value_us, previous_us (the value of the previous row of the run, or value_us for the
+    first one) and the count of each row (the increase of total_count within its run).
+    """
+    spectrum_df = spectrum_df.sort_values(['file', 'run_index', 'total_count', 'percentile'], kind='stable')
+    counts = spectrum_df.groupby(['file', 'run_index'], sort=False)['total_count'].diff()
+    spectrum_df = spectrum_df.assign(value_us=np.rint(spectrum_df['value_ms'].to_numpy() * 1000).astype(np.int64),
+                                     count=counts.fillna(spectrum_df['total_count']).astype(np.int64))
+    spectrum_df = spectrum_df[spectrum_df['count'] > 0]
+    previous = spectrum_df.groupby(['file', 'run_index'], sort=False)['value_us'].shift()
+    return spectrum_df.assign(previous_us=previous.fillna(spectrum_df['value_us']).astype(np.int64))
+
+
+def spread_counts(template: HdrHistogram, previous_us, value_us, counts) -> tuple:
+    """
+    Spread the count of every spectrum row over the buckets after the previous row's bucket up to its own
+    bucket, in proportion to each bucket's overlap with (previous_us, value_us]. A row whose range has no
+    such bucket (e.g. the first row of a run) keeps its count at value_us. The counts up to every row's
+    bucket stay those of the spectrum.
+
+    Returns:
+        (rows, indices, counts): for every (row, bucket) piece, its row position, bucket index and count.
+    """
+    previous_us = np.asarray(previous_us, dtype=np.int64)
+    value_us = np.asarray(value_us, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    last = template.counts_index(value_us)
+    first = np.minimum(template.counts_index(previous_us) + 1, last)
+    spans = last - first + 1
+    starts = np.cumsum(spans) - spans
+    rows = np.repeat(np.arange(len(spans)), spans)
+    indices = np.repeat(first, spans) + np.arange(spans.sum()) - np.repeat(starts, spans)
+
+    overlap = (np.minimum(template.highest_equivalent(indices), value_us[rows])
+               - np.maximum(template.lowest_equivalent(indices), previous_us[rows] + 1) + 1)
+    weights = np.maximum(overlap, 0).astype(np.float64)
+    row_weights = np.bincount(rows, weights=weights, minlength=len(spans))
+    empty = row_weights[rows] == 0
+    weights[empty & (indices == last[rows])] = 1.0
+    row_weights = np.bincount(rows, weights=weights, minlength=len(spans))
+
+    # integer counts: round the cumulative share within the row, so every row keeps its exact total
+    cumulative = np.cumsum(weights)
+    cumulative -= np.repeat(cumulative[starts] - weights[starts], spans)
+    allocated = np.rint(counts[rows] * cumulative / row_weights[rows]).astype(np.int64)
+    pieces = np.diff(allocated, prepend=0)
+    pieces[starts] = allocated[starts]
+    return rows, indices, pieces
+
+
+def histogram_from_spectrum(value_ms, total_count, highest: int = WRK2_HIGHEST_US) -> HdrHistogram:
+    """HdrHistogram (in us) of one wrk2 run from its spectrum columns (value_ms, cumulative total_count)."""
+    total_count = np.asarray(total_count, dtype=np.int64)
+    counts = np.diff(total_count, prepend=0)
+    keep = counts > 0
+    value_us = np.rint(np.asarray(value_ms, dtype=np.float64)[keep] * 1000).astype(np.int64)
+    histogram = HdrHistogram(highest=highest)
+    if not keep.any():
+        return histogram
+    previous_us = np.concatenate((value_us[:1], value_us[:-1]))
+    _, indices, pieces = spread_counts(histogram, previous_us, value_us, counts[keep])
+    histogram.counts += np.bincount(indices, weights=pieces, minlength=len(histogram.counts)).astype(np.int64)
+    histogram.min_value, histogram.max_value = int(value_us.min()), int(value_us.max())
+    return histogram
+
+
+def run_histograms(spectrum_df: pd.DataFrame) -> dict:
+    """{(file, run_index): HdrHistogram} of every run in a spectrum table."""
+    return {key: histogram_from_spectrum(rows['value_ms'], rows['total_count'])
+            for key, rows in spectrum_df.sort_values('total_count', kind='stable').groupby(['file', 'run_index'])}
+
+
+def _group_percentiles(counts: np.ndarray, max_values: np.ndarray, template: HdrHistogram, percentiles) -> list:
+    rows = []
+    for group_counts, max_value in zip(counts, max_values):
+        histogram = template.empty_copy()
+        histogram.counts = group_counts
+        histogram.max_value = int(max_value)
+        rows.append((histogram.total_count, histogram.mean() / 1000.0,
+                     histogram.values_at_percentiles(percentiles) / 1000.0))
+    return rows
+
+
+def aggregate_percentiles(runs_df: pd.DataFrame, spectrum_df: pd.DataFrame, by: list,
+                          percentiles=DEFAULT_PERCENTILES, complete_only: bool = True) -> pd.DataFrame:
+    """
+    Percentiles of the merged latency distribution of every group of runs (from the reconstructed run
+    histograms, see the module docstring for their error).
+
+    Args:
+        runs_df, spectrum_df: wrk2_output_parser.parse_files() output; runs_df carries the grouping columns
+            (see add_policies() / add_windows()).
+        by: Grouping columns of runs_df, e.g. ['policy', 'window'].
+        percentiles: Percentiles (0..100).
+        complete_only: Skip runs whose output was cut off (runs_df['complete'] False).
+
+    Returns:
+        DataFrame: the `by` columns, runs, requests, mean_ms, one <pXX>_ms column per percentile (merged
+        histogram) and, for comparison, run_mean_<pXX>_ms (the average of the per-run values the old analysis used).
+    """
+    by = list(by)
+    runs = runs_df[runs_df['complete']] if complete_only and 'complete' in runs_df else runs_df
+    runs = runs.dropna(subset=by)
+    rows = spectrum_counts(spectrum_df).merge(runs[['file', 'run_index'] + by], on=['file', 'run_index'], how='inner')
+    template = HdrHistogram(highest=WRK2_HIGHEST_US)
+    n_buckets = len(template.counts)
+    grouped = rows.groupby(by, sort=True)
+    group_codes = grouped.ngroup().to_numpy()
+    groups = grouped.size().index
+    pieces_of, indices, pieces = spread_counts(template, rows['previous_us'].to_numpy(), rows['value_us'].to_numpy(),
+                                               rows['count'].to_numpy())
+    counts = np.bincount(group_codes[pieces_of] * n_buckets + indices, weights=pieces,
+                         minlength=len(groups) * n_buckets).reshape(len(groups), n_buckets).astype(np.int64)
+    max_values = pd.Series(rows['value_us'].to_numpy()).groupby(group_codes).max().reindex(range(len(groups))).to_numpy()
+    merged = _group_percentiles(counts, max_values, template, percentiles)
+
+    table = groups.to_frame(index=False)
+    run_codes = group_codes[~rows.duplicated(['file', 'run_index']).to_numpy()]
+    table['runs'] = np.bincount(run_codes, minlength=len(groups))
+    table['requests'] = [total for total, _, _ in merged]
+    table['mean_ms'] = [mean for _, mean, _ in merged]
+    for position, percentile in enumerate(percentiles):
+        table[_percentile_label(percentile)] = [values[position] for _, _, values in merged]
+
+    # the per-run percentiles (as wrk2 printed them), averaged per group: the biased estimate, for comparison
+    run_values = np.array([_spectrum_percentiles(run_rows, percentiles)
+                           for _, run_rows in rows.groupby(['file', 'run_index'], sort=False)]).reshape(-1, len(percentiles))
+    for position, percentile in enumerate(percentiles):
+        means = pd.Series(run_values[:, position]).groupby(run_codes).mean()
+        table['run_mean_' + _percentile_label(percentile)] = means.reindex(range(len(groups))).to_numpy()
+    return table
+
+
+def _spectrum_percentiles(run_rows: pd.DataFrame, percentiles) -> np.ndarray:
+    """Percentiles (ms) of one run read from its spectrum rows (rows sorted by total_count)."""
+    cumulative = run_rows['total_count'].to_numpy()
+    targets = np.maximum(np.ceil(np.asarray(percentiles, dtype=np.float64) / 100.0 * cumulative[-1]), 1)
+    return run_rows['value_ms'].to_numpy()[np.minimum(np.searchsorted(cumulative, targets), len(cumulative) - 1)]
+
+
+def histogram_percentiles(groups: dict, percentiles=DEFAULT_PERCENTILES) -> pd.DataFrame:
+    """
+    Percentiles of natively recorded histograms, e.g. open_loop_loadgen results.
+
+    Args:
+        groups: {label: [HdrHistogram or HdrHistogram.to_dict() ...]} (all with one layout).
+
+    Returns:
+        DataFrame indexed by label: histograms, requests, mean_ms, one <pXX>_ms column per percentile.
+    """
+    rows = {}
+    for label, histograms in groups.items():
+        histograms = [HdrHistogram.from_dict(h) if isinstance(h, dict) else h for h in histograms]
+        merged = merge_histograms(histograms)
+        values = merged.values_at_percentiles(percentiles) / 1000.0
+        rows[label] = {'histograms': len(histograms), 'requests': merged.total_count, 'mean_ms': merged.mean() / 1000.0,
+                       **{_percentile_label(percentile): value for percentile, value in zip(percentiles, values)}}
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def interval_groups(result: dict, window_s: float) -> dict:
+    """{window start (s): [interval histograms]} of a load generator result, for histogram_percentiles()."""
+    groups = {}
+    for start_s, histogram in result['interval_histograms'].items():
+        groups.setdefault(float(start_s) // window_s * window_s, []).append(histogram)
+    return dict(sorted(groups.items()))
+
+
+# (2) ############################################# Run times, windows, policies ###########################################
+
+def add_run_times(runs_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the namespace (from the wrk2 URL) and start_time (naive UTC) of every run.
+
+    Orchestrator outputs (<run_dir>/<namespace>__wrk_result.txt) take the phase start from events.csv and
+    run.json; other files start at their file-name timestamp and the runs of one namespace follow each other.
+    """
+    runs_df = runs_df.copy()
+    runs_df['namespace'] = runs_df['url'].astype(str).str.extract(WRK2_URL_NAMESPACE, expand=False)
+    starts = pd.Series(np.nan, index=runs_df.index)
+    for file, file_runs in runs_df.groupby('file', sort=False):
+        run_dir, name = os.path.split(file)
+        match = re.match(r'^(.+)__wrk_result\.txt$', name)
+        if match and os.path.exists(os.path.join(run_dir, 'events.csv')) and os.path.exists(os.path.join(run_dir, 'run.json')):
+            start_timestamp = pd.read_json(os.path.join(run_dir, 'run.json'), typ='series')['start_timestamp']
+            events = pd.read_csv(os.path.join(run_dir, 'events.csv'))
+            events = events[(events['actor'] == 'workload') & (events['name'] == match.group(1))]
+            phase_starts = events.set_index('index')['actual_start_t']
+            starts[file_runs.index] = start_timestamp + file_runs['run_index'].map(phase_starts).to_numpy()
+            continue
+        _, timestamp = file_timestamp(name)
+        if timestamp is None:
+            continue
+        # the runs of one namespace follow each other; namespaces of one file (Policy4_workload) run side by side
+        ordered = file_runs.sort_values('run_index')
+        earlier = ordered.groupby(ordered['namespace'].fillna(''))['duration_s'].transform(
+            lambda durations: durations.fillna(0).cumsum().shift(fill_value=0))
+        starts[ordered.index] = timestamp + earlier
+    runs_df['start_time'] = pd.to_datetime(starts, unit='s')
+    return runs_df
+
+
+def add_windows(runs_df: pd.DataFrame, window: str = '5min', origin_by: list = None) -> pd.DataFrame:
+    """
+    Add a `window` column: the start_time floored to `window`, or, with origin_by (e.g. ['file'] or
+    ['campaign']), the time since the first run of its origin group floored to `window` (a Timedelta), so
+    windows of different campaigns line up.
+    """
+    runs_df = runs_df.copy()
+    if origin_by:
+        elapsed = runs_df['start_time'] - runs_df.groupby(origin_by)['start_time'].transform('min')
+        runs_df['window'] = elapsed.dt.floor(window)
+    else:
+        runs_df['window'] = runs_df['start_time'].dt.floor(window)
+    return runs_df
+
+
+def add_policies(runs_df: pd.DataFrame, namespace_policies: dict = None, catalog_path: str = None) -> pd.DataFrame:
+    """
+    Add a `policy` column: namespace_policies[namespace] when given (e.g. {'social-network2': 'policy1',
+    'social-network4': 'policy4'} for the Policy4 campaigns), else the policies the experiment catalog
+    lists for the run the file belongs to ('+'-joined if several).
+    """
+    runs_df = runs_df.copy()
+    policies = pd.Series(np.nan, index=runs_df.index, dtype=object)
+    if namespace_policies:
+        policies = runs_df['namespace'].map(namespace_policies)
+    if catalog_path and policies.isna().any():
+        connection = open_catalog(catalog_path)
+        try:
+            by_file = pd.read_sql_query(
+                "SELECT a.path, group_concat(p.policy, '+') AS policy FROM artifacts a"
+                " JOIN run_policies p ON p.run_id = a.run_id WHERE a.kind = 'wrk2' GROUP BY a.path", connection)
+        finally:
+            connection.close()
+        file_policies = runs_df['file'].map(os.path.abspath).map(by_file.set_index('path')['policy'])
+        policies = policies.fillna(file_policies)
+    runs_df['policy'] = policies
+    return runs_df
+
+# Example usage:
+# runs_df, spectrum_df = parse_files(find_wrk2_outputs('Cluster_10_Nodes/Policy4_eval_hybrid_dynamics/data'))
+# runs_df = add_policies(add_run_times(runs_df), namespace_policies={'social-network2': 'policy1', 'social-network4': 'policy4'})
+# runs_df = add_windows(runs_df, '4min', origin_by=['file'])
+# print(aggregate_percentiles(runs_df, spectrum_df, by=['policy', 'window'], percentiles=[99, 99.9]))
+#
+# result = MultiProcessLoadGenerator(...).run()
+# print(histogram_percentiles(interval_groups(result, window_s=60), percentiles=[99, 99.9]))
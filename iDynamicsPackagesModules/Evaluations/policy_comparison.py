@@ -0,0 +1,299 @@
+'''Policy comparison with bootstrap confidence intervals.
+
+The k8s_*_avg_latency.csv vs callGraph_*_avg_latency.csv comparisons were made by eye from the plots of
+Reproduce_Fig_from_dataset.ipynb. This module loads the per-run latency series of several policies (the
+series load_trace() plots: the response_code 200 series averaged per timestamp) and estimates, for every
+policy against a baseline, the difference of the p50 / p95 / p99 latency with bootstrap confidence intervals.
+
+The bootstrap is vectorized: the samples of a policy are sorted once, the resamples are the rows of a
+(n_resamples x n_runs) count matrix, and the percentiles of all resamples are found together by a bisection
+over the sorted samples (log2(n) matrix steps instead of one sort per resample; the per-run cumulative counts
+it needs are kept on a coarser grid when n x runs is large, with an exact search inside the grid interval).
+Two resampling levels:
+    'run'     resample whole runs (cluster bootstrap); samples of one run are autocorrelated time series,
+              so this is the default and the honest choice when there are several runs per policy
+    'sample'  resample individual samples of the pooled runs (iid assumption); the percentile of a resample is
+              an order statistic of the sorted sample, drawn directly through its Beta distribution
+Runs with the same run id (k8s_2025_Mar_18_1156 and callGraph_2025_Mar_18_1156 ran side by side) are
+resampled jointly (paired on the run ids all policies share; a policy's other runs are resampled on their own),
+so the run-to-run variation they share cancels out of the differences.
+Percentiles use the inverted-CDF definition (the smallest sample with cumulative weight >= q).
+'''
+
+import os
+import re
+import ast
+import glob
+
+import numpy as np
+import pandas as pd
+
+from iDynamicsPackagesModules.Evaluations.latency_series_store import SUFFIX, load_series
+
+PERCENTILES = (50, 95, 99)
+RUN_FILE = re.compile(r'^(?P<policy>.+?)_(?P<run>\d{4}_[A-Za-z]{3}_\d{1,2}_\d{4})_avg_latency(\.csv|\.parquet)$')
+MAX_MATRIX_CELLS = 2 * 10 ** 7  # rows of the weight matrix are processed in chunks of at most this many cells
+
+
+# (1) ############################################## Loading runs #######################################################
+
+def load_run(path: str, response_code: str = '200', skip_minutes: float = 0.0) -> np.ndarray:
+    """
+    Latency series of one run (ms per timestamp), as load_trace() in Reproduce_Fig_from_dataset.ipynb builds it:
+    the series with the given response code, averaged per timestamp. Reads legacy CSVs and the compact
+    Parquet files of latency_series_store.py.
+
+    Args:
+        skip_minutes: Drop the first minutes of the run (warm-up).
+    """
+    if path.endswith(SUFFIX):
+        df = load_series(path[:-len(SUFFIX)], labels=[], response_code=response_code)
+    else:
+        with open(path, 'r') as f:
+            has_header = f.readline().startswith('metric,')
+        df = pd.read_csv(path, header=0 if has_header else None, names=['metric', 'timestamp', 'value'])
+        codes, unique_metrics = pd.factorize(df['metric'])
+        keep = np.array([ast.literal_eval(metric).get('response_code') == response_code for metric in unique_metrics],
+                        dtype=bool)
+        df = df[keep[codes]] if len(unique_metrics) else df
+        df = df.assign(timestamp=pd.to_datetime(df['timestamp']), value=pd.to_numeric(df['value'], errors='coerce'))
+    df = df.groupby('timestamp', as_index=False)['value'].mean()
+    if skip_minutes and not df.empty:
+        df = df[df['timestamp'] >= df['timestamp'].min() + pd.Timedelta(minutes=skip_minutes)]
+    values = df['value'].to_numpy(dtype=np.float64)
+    return values[np.isfinite(values)]
+
+
+def discover_runs(root: str, policies: dict = None) -> pd.DataFrame:
+    """
+    Find <policy>_<run>_avg_latency.csv / .parquet files below root (a Parquet file wins over its CSV).
+
+    Args:
+        policies: Optional {file prefix: policy label}, e.g. {'k8s': 'K8s-default', 'callGraph': 'Call-graph-Aware'};
+            prefixes not in it are skipped. By default every prefix is a policy.
+
+    Returns:
+        DataFrame with the columns policy, run, path.
+    """
+    found = {}
+    for path in sorted(glob.glob(os.path.join(root, '**', '*_avg_latency.*'), recursive=True)):
+        match = RUN_FILE.match(os.path.basename(path))
+        if not match:
+            continue
+        prefix = match.group('policy')
+        if policies is not None and prefix not in policies:
+            continue
+        key = (policies[prefix] if policies else prefix, match.group('run'))
+        if key not in found or path.endswith(SUFFIX):
+            found[key] = path
+    return pd.DataFrame([{'policy': policy, 'run': run, 'path': path} for (policy, run), path in found.items()],
+                        columns=['policy', 'run', 'path'])
+
+
+def load_runs(runs_df: pd.DataFrame, **load_params) -> dict:
+    """{policy: {run: samples}} for the rows of discover_runs(); load_params go to load_run()."""
+    runs = {}
+    for row in runs_df.itertuples(index=False):
+        samples = load_run(row.path, **load_params)
+        if len(samples):
+            runs.setdefault(row.policy, {})[row.run] = samples
+    return runs
+
+
+# (2) ############################################## Vectorized bootstrap ###############################################
+
+def weighted_percentiles(sorted_values: np.ndarray, weights: np.ndarray, percentiles) -> np.ndarray:
+    """
+    Inverted-CDF percentiles of every row of weights over the same sorted sample.
+
+    Args:
+        sorted_values: (n,) ascending samples.
+        weights: (rows, n) non-negative weights (resample counts).
+        percentiles: (q,) percentiles in 0..100.
+
+    Returns:
+        (rows, q) array.
+    """
+    cumulative = np.cumsum(weights, axis=1)
+    targets = cumulative[:, -1:] * (np.asarray(percentiles, dtype=np.float64) / 100.0)  # (rows, q)
+    # per row: the first position whose cumulative weight reaches the target
+    positions = np.stack([(cumulative < targets[:, [k]]).sum(axis=1) for k in range(targets.shape[1])], axis=1)
+    return sorted_values[np.minimum(positions, len(sorted_values) - 1)]
+
+
+def run_weighted_percentiles(sorted_values: np.ndarray, run_of_sorted: np.ndarray, run_counts: np.ndarray,
+                             percentiles, max_cells: int = MAX_MATRIX_CELLS) -> np.ndarray:
+    """
+    weighted_percentiles() for run-level resamples without the (rows, n) weight matrix: with
+    C[i, r] = number of samples of run r among the i smallest, the cumulative weight of resample b at position i
+    is run_counts[b] @ C[i], so every (resample, percentile) pair is located by a bisection over i. C is only
+    kept on a grid of every stride-th position (at most max_cells cells); the bisection finds the grid interval
+    and a cumulative sum over its at most stride positions (chunked over the rows) the exact position.
+
+    Args:
+        sorted_values: (n,) ascending samples.
+        run_of_sorted: (n,) run index of every sorted sample.
+        run_counts: (rows, n_runs) resample counts of every run.
+
+    Returns:
+        (rows, q) array.
+    """
+    n, n_runs = len(sorted_values), run_counts.shape[1]
+    stride = max(1, -(-(n + 1) * n_runs // max_cells))
+    grid = np.arange(0, n + stride, stride)
+    grid[-1] = n
+    # C on the grid: sample p (0-based) is among the grid[g] smallest for every g with grid[g] > p
+    first_cell = np.searchsorted(grid, np.arange(n), side='right')
+    dtype = np.uint16 if np.bincount(run_of_sorted).max() < 2 ** 16 else np.int32
+    cumulative_runs = np.bincount(first_cell * n_runs + run_of_sorted, minlength=len(grid) * n_runs)
+    cumulative_runs = np.cumsum(cumulative_runs.reshape(len(grid), n_runs), axis=0).astype(dtype)
+    run_sizes = cumulative_runs[-1].astype(np.int64)
+    targets = ((run_counts @ run_sizes)[:, None] * (np.asarray(percentiles, dtype=np.float64) / 100.0)).ravel()
+    counts = np.repeat(run_counts, len(percentiles), axis=0)  # one row per (resample, percentile)
+
+    # first grid cell g >= 1 whose cumulative weight reaches the target (the last cell holds the total)
+    low, high = np.ones(len(targets), dtype=np.int64), np.full(len(targets), len(grid) - 1, dtype=np.int64)
+    while np.any(low < high):
+        middle = (low + high) // 2
+        reached = np.einsum('ij,ij->i', counts, cumulative_runs[middle], dtype=np.int64) >= targets
+        high = np.where(reached, middle, high)
+        low = np.where(reached, low, middle + 1)
+
+    # within (grid[g - 1], grid[g]]: the first position whose cumulative weight reaches the target
+    block_start = grid[low - 1]
+    base = np.einsum('ij,ij->i', counts, cumulative_runs[low - 1], dtype=np.int64)
+    positions = np.empty(len(targets), dtype=np.int64)
+    chunk = max(1, max_cells // stride)
+    offsets = np.arange(stride)
+    for begin in range(0, len(targets), chunk):
+        rows = slice(begin, begin + chunk)
+        sample = block_start[rows, None] + offsets                              # (chunk, stride)
+        inside = sample < grid[low[rows], None]
+        weights = np.take_along_axis(counts[rows], run_of_sorted[np.minimum(sample, n - 1)], axis=1) * inside
+        cumulative = base[rows, None] + np.cumsum(weights, axis=1)
+        positions[rows] = block_start[rows] + (cumulative < targets[rows, None]).sum(axis=1)
+    return sorted_values[np.minimum(positions, n - 1)].reshape(len(run_counts), len(percentiles))
+
+
+def _run_counts(rng: np.random.Generator, n_resamples: int, n_runs: int) -> np.ndarray:
+    """(n_resamples, n_runs) counts of how often each run is drawn when drawing n_runs runs with replacement."""
+    draws = rng.integers(0, n_runs, size=(n_resamples, n_runs))
+    flat = draws + np.arange(n_resamples)[:, None] * n_runs
+    return np.bincount(flat.ravel(), minlength=n_resamples * n_runs).reshape(n_resamples, n_runs)
+
+
+def bootstrap_percentiles(policy_runs: dict, percentiles=PERCENTILES, n_resamples: int = 2000, level: str = 'run',
+                          run_counts: np.ndarray = None, run_ids: list = None, seed: int = 0) -> tuple:
+    """
+    Bootstrap distribution of the percentiles of one policy's pooled samples.
+
+    Args:
+        policy_runs: {run: samples}.
+        level: 'run' (resample runs) or 'sample' (resample samples).
+        run_counts, run_ids: Shared (n_resamples, len(run_ids)) run counts for paired resampling (level='run');
+            runs of the policy that are not in run_ids are resampled independently.
+
+    Returns:
+        (estimate (q,), replicates (n_resamples, q))
+    """
+    rng = np.random.default_rng(seed)
+    runs = list(policy_runs)
+    values = np.concatenate([policy_runs[run] for run in runs])
+    run_of_sample = np.repeat(np.arange(len(runs)), [len(policy_runs[run]) for run in runs])
+    order = np.argsort(values, kind='stable')
+    sorted_values, run_of_sorted = values[order], run_of_sample[order]
+    estimate = weighted_percentiles(sorted_values, np.ones((1, len(values))), percentiles)[0]
+
+    if level == 'run':
+        if run_counts is None:
+            run_counts = _run_counts(rng, n_resamples, len(runs))
+        else:
+            # the shared runs take the shared counts, the policy's other runs are resampled on their own
+            shared = [run for run in runs if run in run_ids]
+            own = [run for run in runs if run not in run_ids]
+            columns = np.empty((n_resamples, len(runs)), dtype=np.int64)
+            columns[:, [runs.index(run) for run in shared]] = run_counts[:, [run_ids.index(run) for run in shared]]
+            columns[:, [runs.index(run) for run in own]] = _run_counts(rng, n_resamples, len(own))
+            run_counts = columns
+    elif level != 'sample':
+        raise ValueError(f"Unknown bootstrap level {level!r}")
+    if level == 'sample':
+        # the k-th smallest of n draws from the sorted sample is sorted_values[floor(n * U)], U ~ Beta(k, n + 1 - k)
+        # (the k-th order statistic of n uniforms): each percentile's bootstrap distribution is sampled directly
+        n = len(values)
+        ranks = np.maximum(np.ceil(np.asarray(percentiles, dtype=np.float64) / 100.0 * n), 1)
+        uniforms = rng.beta(ranks, n + 1 - ranks, size=(n_resamples, len(percentiles)))
+        return estimate, sorted_values[np.minimum((uniforms * n).astype(np.int64), n - 1)]
+    return estimate, run_weighted_percentiles(sorted_values, run_of_sorted, run_counts, percentiles)
+
+
+def compare_policies(runs: dict, baseline: str = None, percentiles=PERCENTILES, n_resamples: int = 2000,
+                     level: str = 'run', confidence: float = 0.95, paired: bool = True, seed: int = 0) -> pd.DataFrame:
+    """
+    Percentile differences of every policy against the baseline, with bootstrap confidence intervals.
+
+    Args:
+        runs: {policy: {run: samples}} (load_runs()).
+        baseline: Reference policy (default: the first one).
+        level: Bootstrap level, 'run' or 'sample'.
+        confidence: Confidence level of the percentile intervals.
+        paired: Resample the run ids all policies share jointly across policies (level='run'); the runs only
+            some policies have are resampled independently per policy.
+
+    Returns:
+        One row per (policy, percentile): estimate and its CI, difference to the baseline (ms and %) and its CI,
+        whether the CI excludes 0, and the policy's rank for that percentile (1 = lowest latency).
+    """
+    policies = list(runs)
+    baseline = baseline or policies[0]
+    run_ids = sorted(set.intersection(*(set(policy_runs) for policy_runs in runs.values())))
+    shared_counts = None
+    if level == 'run' and paired and run_ids:
+        shared_counts = _run_counts(np.random.default_rng(seed), n_resamples, len(run_ids))
+    results = {}
+    for k, policy in enumerate(policies):
+        results[policy] = bootstrap_percentiles(runs[policy], percentiles, n_resamples, level, shared_counts, run_ids,
+                                                seed=seed + 1 + k)
+    alpha = (1 - confidence) / 2 * 100
+    base_estimate, base_replicates = results[baseline]
+    rows = []
+    for policy in policies:
+        estimate, replicates = results[policy]
+        differences = replicates - base_replicates
+        low, high = np.percentile(replicates, [alpha, 100 - alpha], axis=0)
+        diff_low, diff_high = np.percentile(differences, [alpha, 100 - alpha], axis=0)
+        for j, percentile in enumerate(percentiles):
+            rows.append({'policy': policy, 'metric': f"p{percentile:g}", 'runs': len(runs[policy]),
+                         'samples': int(sum(len(samples) for samples in runs[policy].values())),
+                         'estimate_ms': estimate[j], 'ci_low_ms': low[j], 'ci_high_ms': high[j],
+                         'diff_ms': estimate[j] - base_estimate[j], 'diff_ci_low_ms': diff_low[j],
+                         'diff_ci_high_ms': diff_high[j],
+                         'diff_pct': 100.0 * (estimate[j] - base_estimate[j]) / base_estimate[j] if base_estimate[j] else np.nan,
+                         'significant': policy != baseline and (diff_low[j] > 0 or diff_high[j] < 0)})
+    table = pd.DataFrame(rows)
+    table['rank'] = table.groupby('metric')['estimate_ms'].rank(method='min').astype(int)
+    table = table.sort_values(['metric', 'rank'], key=lambda column: column.str[1:].astype(float)
+                              if column.name == 'metric' else column, ignore_index=True)
+    table.attrs.update({'baseline': baseline, 'level': level, 'n_resamples': n_resamples, 'confidence': confidence,
+                        'paired': shared_counts is not None, 'paired_runs': len(run_ids) if shared_counts is not None else 0})
+    return table
+
+
+def ranked_table(table: pd.DataFrame, metric: str = 'p99') -> pd.DataFrame:
+    """One metric of compare_policies(), best policy first, with 'estimate [low, high]' formatted columns."""
+    rows = table[table['metric'] == metric].sort_values('rank')
+    return pd.DataFrame({
+        'rank': rows['rank'].to_numpy(),
+        'policy': rows['policy'].to_numpy(),
+        metric: [f"{e:.1f} [{l:.1f}, {h:.1f}]" for e, l, h in rows[['estimate_ms', 'ci_low_ms', 'ci_high_ms']].to_numpy()],
+        f"diff vs {table.attrs.get('baseline', 'baseline')}": [
+            f"{d:+.1f} [{l:+.1f}, {h:+.1f}]" + (' *' if s else '')
+            for d, l, h, s in rows[['diff_ms', 'diff_ci_low_ms', 'diff_ci_high_ms', 'significant']].to_numpy()],
+    })
+
+# Example usage:
+# runs_df = discover_runs('Cluster_10_Nodes/Policy1_eval_Graph_dynamics/Policy1_evaluated_data/data',
+#                         policies={'k8s': 'K8s-default', 'callGraph': 'Call-graph-Aware'})
+# runs = load_runs(runs_df, skip_minutes=1)
+# table = compare_policies(runs, baseline='K8s-default', n_resamples=5000)
+# print(ranked_table(table, 'p99'))
@@ -0,0 +1,183 @@
+'''Chunked, concurrent export of experiment metrics from Prometheus into the compact series store.
+
+The respTime_Collection notebooks issue one query_range per query over the whole experiment. Prometheus
+rejects a range with more than 11,000 points per series ("exceeded maximum resolution"), and every query
+is fetched serially. Here:
+
+    1. [start, end] is split into chunks on the step grid (timestamps that are multiples of the step), so
+       every chunk evaluates at the same instants a single query would and no chunk exceeds the limit;
+    2. the chunks of all series groups (one PromQL query per group, e.g. per namespace and metric) are
+       fetched concurrently on a thread pool with one HTTP session; a chunk that is still rejected for its
+       resolution is split in half and retried, transient errors are retried with backoff;
+    3. the chunks of a group are stitched per series (label set), sorted, de-duplicated by timestamp and
+       clipped to [start, end];
+    4. each group is written with latency_series_store.write_series() (<out_dir>/<group>.parquet), so
+       load_series() reads the export directly.
+'''
+
+import os
+import re
+import json
+import math
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from iDynamicsPackagesModules.Evaluations.latency_series_store import _frames_from_series, write_series
+
+MAX_POINTS_PER_SERIES = 11000   # Prometheus' query_range resolution limit
+DEFAULT_CHUNK_POINTS = 1000     # smaller chunks spread one long range over several workers
+QUERY_TEMPLATES = {
+    'avg_latency': ("rate(istio_request_duration_milliseconds_sum{{namespace='{namespace}', response_code='200'}}[1m])"
+                    "/ rate(istio_requests_total{{namespace='{namespace}',response_code='200'}}[1m])"),
+    'throughput': "rate(istio_requests_total{{namespace='{namespace}'}}[1m])",
+}
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+
+
+class ResolutionExceeded(Exception):
+    pass
+
+
+def parse_step(step) -> float:
+    """Prometheus duration ('10s', '1m30s', '500ms') or number of seconds -> seconds."""
+    if isinstance(step, (int, float)):
+        return float(step)
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)', step)
+    if not parts or ''.join(number + unit for number, unit in parts) != step.strip():
+        try:
+            return float(step)
+        except ValueError:
+            raise ValueError(f"Invalid step: {step!r}")
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _utc_seconds(moment) -> float:
+    """Naive UTC datetime (as in the notebooks) or epoch seconds -> epoch seconds."""
+    if isinstance(moment, datetime.datetime):
+        return moment.replace(tzinfo=datetime.timezone.utc).timestamp() if moment.tzinfo is None else moment.timestamp()
+    return float(moment)
+
+
+def plan_chunks(start: float, end: float, step: float, chunk_points: int = DEFAULT_CHUNK_POINTS) -> list:
+    """
+    Step-aligned, non-overlapping chunks covering [start, end].
+
+    Returns:
+        [(chunk_start, chunk_end)] epoch seconds; both ends are multiples of step and each chunk has at most
+        min(chunk_points, MAX_POINTS_PER_SERIES) points.
+    """
+    chunk_points = max(1, min(int(chunk_points), MAX_POINTS_PER_SERIES))
+    first = math.ceil(start / step - 1e-9)
+    last = math.floor(end / step + 1e-9)
+    return [(index * step, min(index + chunk_points - 1, last) * step) for index in range(first, last + 1, chunk_points)]
+
+
+def _fetch_chunk(session, prom_url: str, query: str, chunk_start: float, chunk_end: float, step: float,
+                 timeout: float, retries: int) -> list:
+    """query_range of one chunk -> list of result dicts; splits the chunk if Prometheus rejects its resolution."""
+    params = {'query': query, 'start': chunk_start, 'end': chunk_end, 'step': step}
+    for attempt in range(retries + 1):
+        try:
+            response = session.get(prom_url, params=params, timeout=timeout)
+            if response.status_code in (400, 422) and 'resolution' in response.text:
+                raise ResolutionExceeded(response.text)
+            response.raise_for_status()
+            data = response.json()
+            if data.get('status') != 'success':
+                raise requests.HTTPError(f"Prometheus error: {data.get('error', data)}")
+            return data['data']['result']
+        except ResolutionExceeded:
+            if chunk_end <= chunk_start:
+                raise
+            middle = chunk_start + math.floor((chunk_end - chunk_start) / step / 2) * step
+            return (_fetch_chunk(session, prom_url, query, chunk_start, middle, step, timeout, retries)
+                    + _fetch_chunk(session, prom_url, query, middle + step, chunk_end, step, timeout, retries))
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if attempt == retries or (status is not None and status < 500):
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def stitch_results(chunk_results: list, start: float = -np.inf, end: float = np.inf) -> tuple:
+    """
+    Merge the query_range results of several chunks: one sample block per label set, sorted by timestamp,
+    de-duplicated (first occurrence kept) and clipped to [start, end].
+
+    Returns:
+        (label_dicts, sample_blocks) with sample_blocks[k] = (timestamps_seconds, values)
+    """
+    blocks = {}
+    for results in chunk_results:
+        for result in results:
+            key = json.dumps(result['metric'], sort_keys=True)
+            blocks.setdefault(key, (result['metric'], []))[1].append(result.get('values', []))
+    label_dicts, sample_blocks = [], []
+    for metric, chunks in blocks.values():
+        values = np.array([pair for chunk in chunks for pair in chunk], dtype=object).reshape(-1, 2)
+        timestamps = values[:, 0].astype(np.float64)
+        samples = values[:, 1].astype(np.float64)
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, samples = timestamps[order], samples[order]
+        keep = np.ones(len(timestamps), dtype=bool)
+        keep[1:] = timestamps[1:] != timestamps[:-1]
+        keep &= (timestamps >= start) & (timestamps <= end)
+        label_dicts.append(metric)
+        sample_blocks.append((timestamps[keep], samples[keep]))
+    return label_dicts, sample_blocks
+
+
+def export_queries(prom_url: str, queries: dict, start, end, step, out_dir: str = None,
+                   chunk_points: int = DEFAULT_CHUNK_POINTS, max_workers: int = 8, timeout: float = 60,
+                   retries: int = 3) -> dict:
+    """
+    Export several series groups over one time range.
+
+    Args:
+        prom_url: Prometheus query_range endpoint, e.g. "http://10.105.116.175:9090/api/v1/query_range".
+        queries: {group name: PromQL query}, e.g. from namespace_queries().
+        start, end: Naive UTC datetimes (or epoch seconds).
+        step: Resolution, e.g. "10s".
+        out_dir: If given, every group is written to <out_dir>/<group>.parquet.
+        chunk_points: Points per chunk and series (capped at the 11,000 limit).
+        max_workers: Concurrent requests.
+
+    Returns:
+        {group name: (series_df, samples_df)}
+    """
+    start_s, end_s, step_s = _utc_seconds(start), _utc_seconds(end), parse_step(step)
+    chunks = plan_chunks(start_s, end_s, step_s, chunk_points)
+    began = time.perf_counter()
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {name: [pool.submit(_fetch_chunk, session, prom_url, query, chunk_start, chunk_end, step_s,
+                                      timeout, retries) for chunk_start, chunk_end in chunks]
+                   for name, query in queries.items()}
+        chunk_results = {name: [future.result() for future in group] for name, group in futures.items()}
+    exported = {}
+    for name, results in chunk_results.items():
+        series_df, samples_df = _frames_from_series(*stitch_results(results, start_s, end_s))
+        if out_dir:
+            write_series(os.path.join(out_dir, name), series_df, samples_df)
+        exported[name] = (series_df, samples_df)
+    samples = sum(len(samples_df) for _, samples_df in exported.values())
+    print(f"Exported {len(queries)} series groups x {len(chunks)} chunks ({samples} samples) "
+          f"in {time.perf_counter() - began:.2f} s" + (f" to {out_dir}" if out_dir else ""))
+    return exported
+
+
+def namespace_queries(namespaces: list, templates: dict = None) -> dict:
+    """{'<namespace>_<metric>': query} for every namespace and query template (default: QUERY_TEMPLATES)."""
+    templates = templates or QUERY_TEMPLATES
+    return {f"{namespace}_{metric}": template.format(namespace=namespace)
+            for namespace in namespaces for metric, template in templates.items()}
+
+# Example usage:
+# PROMETHEUS_API_URL = "http://10.105.116.175:9090/api/v1/query_range"
+# queries = namespace_queries(['social-network', 'social-network2', 'social-network3', 'social-network4'])
+# export_queries(PROMETHEUS_API_URL, queries, datetime.datetime(2025, 3, 19, 8, 49), datetime.datetime(2025, 3, 19, 9, 29),
+#                "10s", out_dir=f'data/{timestamp}')
+# df = load_series(f'data/{timestamp}/social-network2_avg_latency', labels=['app'])   # latency_series_store
@@ -0,0 +1,401 @@
+'''Pod lifecycle collector: watch events -> append-only columnar log -> pods-per-node timelines and migrations.
+
+The Policy1_plot_runningPods notebooks reconstruct where pods ran from instant Prometheus queries
+(kube_pod_status_phase * kube_pod_info) at a few evaluation times, so placements between two scrapes and the
+duration of a migration are invisible. PodEventCollector instead subscribes to the pod watch of every
+experiment namespace and records each lifecycle transition of each pod:
+
+    created      the pod object exists (creationTimestamp)
+    scheduled    PodScheduled condition True, with the node
+    started      the first container is running (its startedAt)
+    ready        Ready condition True
+    unready      Ready condition back to False
+    terminating  deletion requested (deletionTimestamp minus the grace period)
+    deleted      the pod object is gone
+
+Each row has the server-side event time (the condition / container timestamp, 1 s resolution), the time the
+collector observed it (ms), node, deployment and phase. Rows are buffered and flushed as Parquet part files
+(<log_dir>/part-*.parquet, written atomically), so the log is append-only, crash-safe and read as one table
+by load_pod_events(). A watch resumes from its last resourceVersion; after a 410 (history expired) the
+namespace is listed again and pods that vanished in between get a 'deleted' row. Other API errors are logged
+and retried with exponential backoff, so a transient apiserver failure does not end the collection.
+
+pods_per_node_timeline() turns the log into exact step functions (pods per node over time), pods_on_nodes_at()
+answers the notebooks' "running pods per node at t" question, and migration_durations() measures every
+deployment move (new pod created on another node -> ready -> old pod deleted).
+'''
+
+import os
+import logging
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from kubernetes import client, config, watch
+
+EVENT_SCHEMA = pa.schema([
+    ('namespace', pa.string()), ('pod', pa.string()), ('uid', pa.string()), ('deployment', pa.string()),
+    ('node', pa.string()), ('event', pa.string()), ('event_time', pa.timestamp('ms')),
+    ('observed_time', pa.timestamp('ms')), ('phase', pa.string()), ('resource_version', pa.string()),
+])
+TRANSITIONS = ['created', 'scheduled', 'started', 'ready', 'unready', 'terminating', 'deleted']
+MAX_WATCH_BACKOFF = 60  # seconds between two attempts of a failing watch
+
+
+def _utc_naive(timestamp):
+    """Kubernetes datetimes are tz-aware UTC; the log stores naive UTC (as the latency series do)."""
+    if timestamp is None:
+        return None
+    return timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None) if timestamp.tzinfo else timestamp
+
+
+def deployment_of(pod) -> str:
+    """Deployment of a pod: its ReplicaSet owner without the pod-template-hash suffix (else the owner / pod name)."""
+    owners = pod.metadata.owner_references or []
+    template_hash = (pod.metadata.labels or {}).get('pod-template-hash')
+    for owner in owners:
+        if owner.kind == 'ReplicaSet':
+            if template_hash and owner.name.endswith('-' + template_hash):
+                return owner.name[:-len(template_hash) - 1]
+            return owner.name
+    return owners[0].name if owners else pod.metadata.name
+
+
+def _condition_time(pod, condition_type: str):
+    """(status, lastTransitionTime) of a pod condition, or (None, None)."""
+    for condition in (pod.status.conditions or []) if pod.status else []:
+        if condition.type == condition_type:
+            return condition.status == 'True', _utc_naive(condition.last_transition_time)
+    return None, None
+
+
+def _started_time(pod):
+    started = [_utc_naive(status.state.running.started_at)
+               for status in ((pod.status.container_statuses or []) if pod.status else [])
+               if status.state and status.state.running and status.state.running.started_at]
+    return min(started) if started else None
+
+
+def pod_transitions(pod, previous: dict, event_type: str, observed_time: datetime.datetime) -> tuple:
+    """
+    Compare a pod object with the pod's previously seen state and return the new transition rows.
+
+    Args:
+        pod: V1Pod from a list or watch event.
+        previous: State returned by the previous call for this pod ({} for a new pod).
+        event_type: 'ADDED', 'MODIFIED', 'DELETED' (or 'LISTED' for a (re-)list).
+        observed_time: Naive UTC time the event was received.
+
+    Returns:
+        (rows, state)
+    """
+    state = dict(previous)
+    node = pod.spec.node_name if pod.spec else None
+    base = {'namespace': pod.metadata.namespace, 'pod': pod.metadata.name, 'uid': pod.metadata.uid,
+            'deployment': deployment_of(pod), 'phase': pod.status.phase if pod.status else None,
+            'resource_version': pod.metadata.resource_version, 'observed_time': observed_time}
+    rows = []
+
+    def emit(event, event_time):
+        rows.append(dict(base, node=node or state.get('node'), event=event, event_time=event_time or observed_time))
+
+    if not state.get('created'):
+        emit('created', _utc_naive(pod.metadata.creation_timestamp))
+        state['created'] = True
+    scheduled, scheduled_time = _condition_time(pod, 'PodScheduled')
+    if scheduled and node and not state.get('scheduled'):
+        emit('scheduled', scheduled_time)
+        state['scheduled'] = True
+    started_time = _started_time(pod)
+    if started_time and not state.get('started'):
+        emit('started', started_time)
+        state['started'] = True
+    ready, ready_time = _condition_time(pod, 'Ready')
+    if ready and not state.get('ready'):
+        emit('ready', ready_time)
+        state['ready'] = True
+    elif ready is False and state.get('ready'):
+        emit('unready', ready_time)
+        state['ready'] = False
+    if pod.metadata.deletion_timestamp and not state.get('terminating'):
+        # deletionTimestamp is the deadline of the graceful shutdown, not the time the deletion was requested
+        grace_period = datetime.timedelta(seconds=pod.metadata.deletion_grace_period_seconds or 0)
+        emit('terminating', _utc_naive(pod.metadata.deletion_timestamp) - grace_period)
+        state['terminating'] = True
+    if event_type == 'DELETED':
+        emit('deleted', observed_time)
+        state['deleted'] = True
+    state.update(node=node or state.get('node'), namespace=base['namespace'], pod=base['pod'],
+                 deployment=base['deployment'])
+    return rows, state
+
+
+# (1) ################################################# Watch collector #################################################
+
+class PodEventCollector:
+    """
+    Args:
+        namespaces: Experiment namespaces to watch.
+        log_dir: Directory of the append-only Parquet log.
+        flush_interval: Seconds between two part files (if there are rows).
+        flush_rows: Flush early when this many rows are buffered.
+        watch_timeout: Server-side timeout of one watch request (the watch is resumed afterwards).
+    """
+    def __init__(self, namespaces: list, log_dir: str, flush_interval: float = 10.0, flush_rows: int = 1000,
+                 watch_timeout: int = 300):
+        self.namespaces = list(namespaces)
+        self.log_dir = log_dir
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.watch_timeout = watch_timeout
+        self._rows = []
+        self._lock = threading.Lock()
+        self._states = {}
+        self._stop_event = threading.Event()
+        self._watches = {}
+        self._threads = []
+        self._part = 0
+        os.makedirs(log_dir, exist_ok=True)
+
+    # ---------------------------------------------------------------- log
+    def _append(self, rows: list):
+        if not rows:
+            return
+        with self._lock:
+            self._rows.extend(rows)
+            flush_now = len(self._rows) >= self.flush_rows
+        if flush_now:
+            self.flush()
+
+    def flush(self) -> str:
+        """Write the buffered rows as a new part file; returns its path (None if nothing was buffered)."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._part += 1
+            part = self._part
+        if not rows:
+            return None
+        table = pa.Table.from_pylist(rows, schema=EVENT_SCHEMA)
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(self.log_dir, f"part-{stamp}-{os.getpid()}-{part:06d}.parquet")
+        pq.write_table(table, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+        return path
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    # ---------------------------------------------------------------- watch
+    def _handle(self, pod, event_type: str):
+        key = pod.metadata.uid
+        observed = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        rows, state = pod_transitions(pod, self._states.get(key, {}), event_type, observed)
+        if state.get('deleted'):
+            self._states.pop(key, None)
+        else:
+            self._states[key] = state
+        self._append(rows)
+
+    def _list(self, core_v1, namespace: str) -> str:
+        """(Re-)list a namespace; pods we knew that are gone get a 'deleted' row. Returns the list's resourceVersion."""
+        pod_list = core_v1.list_namespaced_pod(namespace)
+        seen = set()
+        for pod in pod_list.items:
+            seen.add(pod.metadata.uid)
+            self._handle(pod, 'LISTED')
+        observed = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        for uid, state in list(self._states.items()):
+            if state.get('namespace') == namespace and uid not in seen:
+                self._append([{'namespace': namespace, 'pod': state.get('pod'), 'uid': uid, 'deployment': state.get('deployment'),
+                               'node': state.get('node'), 'event': 'deleted', 'event_time': observed,
+                               'observed_time': observed, 'phase': None, 'resource_version': pod_list.metadata.resource_version}])
+                self._states.pop(uid)
+        return pod_list.metadata.resource_version
+
+    def _watch_namespace(self, namespace: str):
+        core_v1 = client.CoreV1Api()
+        resource_version = None  # None: (re-)list the namespace first
+        backoff = 1
+        while not self._stop_event.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self._list(core_v1, namespace)
+                pod_watch = watch.Watch()
+                self._watches[namespace] = pod_watch
+                for event in pod_watch.stream(core_v1.list_namespaced_pod, namespace, resource_version=resource_version,
+                                              timeout_seconds=self.watch_timeout, allow_watch_bookmarks=True):
+                    pod = event['object']
+                    resource_version = pod.metadata.resource_version
+                    backoff = 1
+                    if event['type'] == 'BOOKMARK':
+                        continue
+                    self._handle(pod, event['type'])
+            except client.exceptions.ApiException as e:
+                if e.status == 410:
+                    logging.info(f"Watch of {namespace} expired (410), listing again")
+                    resource_version = None
+                    continue
+                if self._stop_event.is_set():
+                    break
+                logging.warning(f"Watch of {namespace} failed ({e.status} {e.reason}), retrying in {backoff} s")
+                self._stop_event.wait(backoff)
+                backoff = min(2 * backoff, MAX_WATCH_BACKOFF)
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                logging.warning(f"Watch of {namespace} interrupted ({e}), resuming in {backoff} s")
+                self._stop_event.wait(backoff)
+                backoff = min(2 * backoff, MAX_WATCH_BACKOFF)
+
+    def start(self):
+        """Start one watch thread per namespace and the flush thread."""
+        try:
+            config.load_kube_config()
+        except config.ConfigException:
+            config.load_incluster_config()
+        self._threads = [threading.Thread(target=self._watch_namespace, args=(namespace,), daemon=True,
+                                          name=f"pod-watch-{namespace}") for namespace in self.namespaces]
+        self._threads.append(threading.Thread(target=self._flush_loop, daemon=True, name='pod-log-flush'))
+        for thread in self._threads:
+            thread.start()
+        print(f"Watching pods of {self.namespaces}, log in {self.log_dir}")
+        return self
+
+    def stop(self):
+        """Stop the watches and flush the remaining rows."""
+        self._stop_event.set()
+        for pod_watch in self._watches.values():
+            pod_watch.stop()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        return self.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# (2) ############################################## Reading and analysis ###############################################
+
+def load_pod_events(log_dir: str, namespace: str = None) -> pd.DataFrame:
+    """All rows of the log, ordered by event time (one columnar read over the part files)."""
+    parts = sorted(os.path.join(log_dir, name) for name in os.listdir(log_dir) if name.endswith('.parquet'))
+    if not parts:
+        return EVENT_SCHEMA.empty_table().to_pandas()
+    df = pa.concat_tables([pq.read_table(part, schema=EVENT_SCHEMA) for part in parts]).to_pandas()
+    if namespace is not None:
+        df = df[df['namespace'] == namespace]
+    df['event'] = pd.Categorical(df['event'], categories=TRANSITIONS, ordered=True)
+    return df.sort_values(['event_time', 'event', 'observed_time'], kind='stable', ignore_index=True)
+
+
+def compact_log(log_dir: str) -> str:
+    """Merge the part files into one (e.g. after a campaign); returns the merged file."""
+    parts = sorted(os.path.join(log_dir, name) for name in os.listdir(log_dir) if name.endswith('.parquet'))
+    if len(parts) <= 1:
+        return parts[0] if parts else None
+    table = pa.concat_tables([pq.read_table(part, schema=EVENT_SCHEMA) for part in parts])
+    merged = os.path.join(log_dir, f"part-{os.path.basename(parts[0])[5:-8]}-compacted.parquet")
+    pq.write_table(table, merged + '.tmp', compression='zstd')
+    os.replace(merged + '.tmp', merged)
+    for part in parts:
+        if part != merged:
+            os.remove(part)
+    return merged
+
+
+def pod_intervals(events: pd.DataFrame) -> pd.DataFrame:
+    """One row per pod: namespace, pod, deployment, node and the (first) time of every transition."""
+    first = events.drop_duplicates(['uid', 'event'], keep='first')
+    intervals = first.pivot(index='uid', columns='event', values='event_time')
+    intervals = intervals.reindex(columns=TRANSITIONS)
+    info = events.dropna(subset=['node']).drop_duplicates('uid', keep='last').set_index('uid')[['namespace', 'pod', 'deployment', 'node']]
+    fallback = events.drop_duplicates('uid', keep='last').set_index('uid')[['namespace', 'pod', 'deployment', 'node']]
+    info = info.reindex(fallback.index).fillna(fallback)
+    intervals.columns = intervals.columns.astype(str)
+    return info.join(intervals).reset_index().sort_values('created', ignore_index=True)
+
+
+def pods_per_node_timeline(events: pd.DataFrame, state: str = 'running') -> pd.DataFrame:
+    """
+    Exact step function of the number of pods per node.
+
+    Args:
+        state: 'scheduled' (bound to the node), 'running' (a container started) or 'ready' (Ready condition True);
+            a pod leaves the count when it is terminating or deleted (or, for 'ready', unready).
+
+    Returns:
+        DataFrame indexed by the change times with one column per node (pods on the node from that time on).
+    """
+    enter = {'scheduled': 'scheduled', 'running': 'started', 'ready': 'ready'}[state]
+    leave = {'terminating', 'deleted'} | ({'unready'} if state == 'ready' else set())
+    deltas = []
+    for uid, pod_events in events.groupby('uid', sort=False):
+        inside = False
+        for event, event_time, node in pod_events[['event', 'event_time', 'node']].itertuples(index=False):
+            if event == enter and not inside and node:
+                deltas.append((event_time, node, 1))
+                inside, pod_node = True, node
+            elif event in leave and inside:
+                deltas.append((event_time, pod_node, -1))
+                inside = False
+    if not deltas:
+        return pd.DataFrame()
+    deltas = pd.DataFrame(deltas, columns=['time', 'node', 'delta'])
+    steps = deltas.pivot_table(index='time', columns='node', values='delta', aggfunc='sum', fill_value=0)
+    return steps.cumsum().astype(int)
+
+
+def pods_on_nodes_at(events: pd.DataFrame, times, state: str = 'running') -> pd.DataFrame:
+    """Pods per node at the given times (rows: times, columns: nodes), e.g. the notebooks' evaluation points."""
+    timeline = pods_per_node_timeline(events, state)
+    times = pd.DatetimeIndex(pd.to_datetime(times))
+    if timeline.empty:
+        return pd.DataFrame(index=times)
+    positions = timeline.index.searchsorted(times, side='right') - 1
+    counts = np.where(positions[:, None] >= 0, timeline.to_numpy()[np.maximum(positions, 0)], 0)
+    return pd.DataFrame(counts, index=times, columns=timeline.columns)
+
+
+def migration_durations(events: pd.DataFrame) -> pd.DataFrame:
+    """
+    Every move of a deployment to another node: a pod created while an older pod of the same deployment is
+    alive on a different node (the rolling update a policy's nodeSelector patch triggers).
+
+    Returns:
+        DataFrame: namespace, deployment, pod, from_node, to_node, start (new pod created), scheduled, ready,
+        old_deleted, to_ready_s, total_s (until the last old pod is deleted).
+    """
+    intervals = pod_intervals(events)
+    rows = []
+    for (namespace, deployment), pods in intervals.groupby(['namespace', 'deployment'], sort=False):
+        pods = pods.sort_values('created')
+        for index, new in pods.iterrows():
+            end_of_old = pods['deleted'].fillna(pods['terminating']).fillna(pd.Timestamp.max)
+            alive = pods[(pods['created'] < new['created']) & (end_of_old > new['created'])]
+            moved_from = alive[alive['node'] != new['node']]
+            if moved_from.empty or pd.isna(new['node']):
+                continue
+            old_deleted = moved_from['deleted'].max() if moved_from['deleted'].notna().all() else pd.NaT
+            rows.append({'namespace': namespace, 'deployment': deployment, 'pod': new['pod'],
+                         'from_node': ','.join(sorted(moved_from['node'].dropna().unique())), 'to_node': new['node'],
+                         'start': new['created'], 'scheduled': new['scheduled'], 'ready': new['ready'],
+                         'old_deleted': old_deleted,
+                         'to_ready_s': (new['ready'] - new['created']).total_seconds() if pd.notna(new['ready']) else np.nan,
+                         'total_s': (max(new['ready'], old_deleted) - new['created']).total_seconds()
+                         if pd.notna(new['ready']) and pd.notna(old_deleted) else np.nan})
+    return pd.DataFrame(rows, columns=['namespace', 'deployment', 'pod', 'from_node', 'to_node', 'start', 'scheduled',
+                                       'ready', 'old_deleted', 'to_ready_s', 'total_s'])
+
+# Example usage:
+# with PodEventCollector(['social-network', 'social-network-k8s'], 'data/pod_events'):
+#     run_workload_varing_callGraph(each_wrk2_duration='2m')           # or ExperimentOrchestrator(...).run()
+# events = load_pod_events('data/pod_events', namespace='social-network')
+# print(pods_on_nodes_at(events, ['2025-07-14 20:51:00', '2025-07-14 20:59:00']))   # naive UTC
+# print(migration_durations(events)[['deployment', 'from_node', 'to_node', 'to_ready_s', 'total_s']])
@@ -0,0 +1,242 @@
+'''Streaming parser for wrk2 text output (HdrHistogram latency distribution and percentile spectrum).
+
+Files such as Policy1_demo_data/output_result_*.txt and wrk2_response_data/output_result_*.txt hold one or
+more wrk2 runs each. Every run is parsed into
+    - one row of the runs table: file, run index, URL, threads, connections, duration, rate (-R, if known),
+      script, thread stats, summary percentiles (p50 .. p100, in ms), requests, requests/sec, errors, ...
+    - rows of the spectrum table: the "Detailed Percentile spectrum" (value_ms, percentile, total_count)
+and the tables of many files are written as Parquet, so a whole evaluation campaign can be re-analysed
+with pandas / pyarrow in seconds instead of re-running the notebooks.
+
+Files are read line by line (a run is emitted as soon as the next one starts), and files are parsed in
+parallel worker processes. wrk2 does not print the request rate; it is taken from a "# command: wrk ... -R<rate>"
+marker line (written by the workload scripts) or from the rates argument, in run order.
+Runs written concurrently into one file (Policy4 workloads start several wrk2 processes on the same file)
+are interleaved in chunks: a "Running ... test @" header is recognized anywhere in a line, and runs whose
+output is not intact (no final summary, or a spectrum whose percentiles/counts are not non-decreasing)
+get complete=False, so they can be filtered out instead of silently skewing the percentiles.
+'''
+
+import os
+import re
+import glob
+import concurrent.futures
+
+import pandas as pd
+
+LATENCY_UNITS_MS = {'us': 1e-3, 'ms': 1.0, 's': 1e3, 'm': 60e3, 'h': 3600e3}
+SIZE_UNITS_BYTES = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+DURATION_UNITS_S = {'us': 1e-6, 'ms': 1e-3, 's': 1, 'm': 60, 'h': 3600}
+
+_RUNNING = re.compile(r'Running (\S+) test @ (\S+)')
+_THREADS = re.compile(r'^\s*(\d+) threads and (\d+) connections')
+_COMMAND = re.compile(r'^# command: (.*)$')
+_THREAD_STAT = re.compile(r'^\s*(Latency|Req/Sec)\s+([\d.]+)(\w*)\s+([\d.]+)(\w*)\s+([\d.]+)(\w*)\s+([\d.]+)%')
+_SUMMARY_PERCENTILE = re.compile(r'^\s*([\d.]+)%\s+([\d.]+)(us|ms|s|m|h)\s*$')
+_SPECTRUM_ROW = re.compile(r'^\s*([\d.]+)\s+([\d.]+)\s+(\d+)\s+([\d.]+|inf)')
+_MEAN = re.compile(r'#\[Mean\s*=\s*([\d.]+), StdDeviation\s*=\s*([\d.]+)\]')
+_MAX = re.compile(r'#\[Max\s*=\s*([\d.]+), Total count\s*=\s*(\d+)\]')
+_REQUESTS = re.compile(r'^\s*(\d+) requests in ([\d.]+)(\w+), ([\d.]+)(\w+) read')
+_SOCKET_ERRORS = re.compile(r'Socket errors: connect (\d+), read (\d+), write (\d+), timeout (\d+)')
+_NON_2XX = re.compile(r'Non-2xx or 3xx responses: (\d+)')
+_REQ_PER_SEC = re.compile(r'^Requests/sec:\s+([\d.]+)')
+_TRANSFER_PER_SEC = re.compile(r'^Transfer/sec:\s+([\d.]+)(\w+)')
+
+
+def _percentile_column(percentile: str) -> str:
+    """'99.900' -> 'p99_9', '50.000' -> 'p50', '100.000' -> 'p100'."""
+    return 'p' + f"{float(percentile):g}".replace('.', '_')
+
+
+def _new_run(duration: str, url: str) -> dict:
+    return {'duration': duration, 'url': url, 'duration_s': _duration_s(duration), 'spectrum': []}
+
+
+def _duration_s(text: str) -> float:
+    match = re.fullmatch(r'([\d.]+)(us|ms|s|m|h)', text)
+    return float(match.group(1)) * DURATION_UNITS_S[match.group(2)] if match else None
+
+
+def _command_fields(command: str) -> dict:
+    fields = {}
+    rate = re.search(r'\s-R\s*([\d.]+)', command)
+    script = re.search(r'\s-s\s+(\S+)', command)
+    if rate:
+        fields['rate'] = float(rate.group(1))
+    if script:
+        fields['script'] = os.path.basename(script.group(1))
+    return fields
+
+
+def _parse_line(run: dict, line: str, section: str) -> str:
+    """Update run with one line; returns the section the parser is in afterwards."""
+    if 'Latency Distribution' in line:
+        return 'summary'
+    if 'Detailed Percentile spectrum' in line:
+        return 'spectrum'
+    if section == 'spectrum':
+        match = _SPECTRUM_ROW.match(line)
+        if match:
+            run['spectrum'].append((float(match.group(1)), float(match.group(2)), int(match.group(3))))
+            return section
+    match = _THREADS.match(line)
+    if match:
+        run['threads'], run['connections'] = int(match.group(1)), int(match.group(2))
+        return section
+    match = _THREAD_STAT.match(line)
+    if match:
+        if match.group(1) == 'Latency':
+            run['latency_avg_ms'] = float(match.group(2)) * LATENCY_UNITS_MS.get(match.group(3) or 'ms', 1.0)
+            run['latency_stdev_ms'] = float(match.group(4)) * LATENCY_UNITS_MS.get(match.group(5) or 'ms', 1.0)
+            run['latency_max_ms'] = float(match.group(6)) * LATENCY_UNITS_MS.get(match.group(7) or 'ms', 1.0)
+        else:
+            run['req_per_thread_avg'] = float(match.group(2))
+            run['req_per_thread_stdev'] = float(match.group(4))
+        return section
+    if section == 'summary':
+        match = _SUMMARY_PERCENTILE.match(line)
+        if match:
+            run[_percentile_column(match.group(1))] = float(match.group(2)) * LATENCY_UNITS_MS[match.group(3)]
+            return section
+    match = _MEAN.search(line)
+    if match:
+        run['hdr_mean_ms'], run['hdr_stdev_ms'] = float(match.group(1)), float(match.group(2))
+        return section
+    match = _MAX.search(line)
+    if match:
+        run['hdr_max_ms'], run['hdr_total_count'] = float(match.group(1)), int(match.group(2))
+        return section
+    match = _REQUESTS.match(line)
+    if match:
+        run['requests'] = int(match.group(1))
+        run['bytes_read'] = float(match.group(4)) * SIZE_UNITS_BYTES.get(match.group(5), 1)
+        return 'tail'
+    match = _SOCKET_ERRORS.search(line)
+    if match:
+        run['errors_connect'], run['errors_read'], run['errors_write'], run['errors_timeout'] = map(int, match.groups())
+        return section
+    match = _NON_2XX.search(line)
+    if match:
+        run['non_2xx_3xx'] = int(match.group(1))
+        return section
+    match = _REQ_PER_SEC.match(line)
+    if match:
+        run['requests_per_sec'] = float(match.group(1))
+        return section
+    match = _TRANSFER_PER_SEC.match(line)
+    if match:
+        run['transfer_bytes_per_sec'] = float(match.group(1)) * SIZE_UNITS_BYTES.get(match.group(2), 1)
+    return section
+
+
+def iter_runs(lines):
+    """
+    Parse an iterable of lines (e.g. an open file) into run dicts, yielding each run as soon as the next
+    one starts. A run dict has the summary fields and 'spectrum': [(value_ms, percentile, total_count)].
+    """
+    run, section, pending = None, None, {}
+    for line in lines:
+        line = line.rstrip('\n')
+        match = _COMMAND.match(line)
+        if match:
+            pending = _command_fields(match.group(1))
+            continue
+        header = _RUNNING.search(line)
+        if header:
+            if run is not None:
+                _parse_line(run, line[:header.start()], section)
+                yield run
+            run, section = _new_run(header.group(1), header.group(2)), None
+            run.update(pending)
+            pending = {}
+            continue
+        if run is not None:
+            section = _parse_line(run, line, section)
+    if run is not None:
+        yield run
+
+
+def _is_complete(run: dict, rows: list) -> bool:
+    if 'requests_per_sec' not in run or 'p50' not in run or not rows:
+        return False
+    return all(a[1] <= b[1] and a[2] <= b[2] for a, b in zip(rows, rows[1:]))
+
+
+def parse_file(file_path: str, rates: list = None) -> tuple:
+    """
+    Parse one wrk2 output file.
+
+    Args:
+        file_path: Path of the text file.
+        rates: Request rates (-R) of the runs in order, for files without "# command:" markers.
+
+    Returns:
+        (runs, spectrum): lists of row dicts for the runs and the spectrum tables.
+    """
+    runs, spectrum = [], []
+    with open(file_path, 'r', errors='replace') as f:
+        for run_index, run in enumerate(iter_runs(f)):
+            rows = run.pop('spectrum')
+            run['file'] = file_path
+            run['run_index'] = run_index
+            run['complete'] = _is_complete(run, rows)
+            if 'rate' not in run and rates is not None and run_index < len(rates):
+                run['rate'] = float(rates[run_index])
+            runs.append(run)
+            spectrum += [{'file': file_path, 'run_index': run_index, 'value_ms': value, 'percentile': percentile,
+                          'total_count': count} for value, percentile, count in rows]
+    return runs, spectrum
+
+
+def find_wrk2_outputs(root: str, patterns=('output_result_*.txt', '*wrk_result*.txt')) -> list:
+    """All wrk2 output files below root."""
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(root, '**', pattern), recursive=True))
+    return sorted(paths)
+
+
+def parse_files(file_paths: list, max_workers: int = None) -> tuple:
+    """
+    Parse many files in parallel worker processes.
+
+    Returns:
+        (runs_df, spectrum_df): pandas DataFrames.
+    """
+    runs, spectrum = [], []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for file_runs, file_spectrum in executor.map(parse_file, file_paths, chunksize=8):
+            runs += file_runs
+            spectrum += file_spectrum
+    runs_df = pd.DataFrame(runs)
+    if not runs_df.empty:
+        leading = ['file', 'run_index', 'complete', 'url', 'duration', 'duration_s', 'rate', 'script', 'threads', 'connections']
+        percentiles = sorted((column for column in runs_df.columns if re.fullmatch(r'p[\d_]+', column)),
+                             key=lambda column: float(column[1:].replace('_', '.')))
+        rest = [column for column in runs_df.columns if column not in leading and column not in percentiles]
+        runs_df = runs_df.reindex(columns=[column for column in leading if column in runs_df.columns] + percentiles + rest)
+    spectrum_df = pd.DataFrame(spectrum, columns=['file', 'run_index', 'value_ms', 'percentile', 'total_count'])
+    return runs_df, spectrum_df
+
+
+def export_parquet(file_paths: list, output_dir: str, max_workers: int = None) -> dict:
+    """
+    Parse the files and write <output_dir>/wrk2_runs.parquet and <output_dir>/wrk2_spectrum.parquet.
+
+    Returns:
+        {'runs': path, 'spectrum': path, 'num_runs': ..., 'num_files': ...}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    runs_df, spectrum_df = parse_files(file_paths, max_workers)
+    runs_path = os.path.join(output_dir, 'wrk2_runs.parquet')
+    spectrum_path = os.path.join(output_dir, 'wrk2_spectrum.parquet')
+    runs_df.to_parquet(runs_path, index=False)
+    spectrum_df.to_parquet(spectrum_path, index=False)
+    print(f"Parsed {len(runs_df)} runs from {len(file_paths)} files into {output_dir}")
+    return {'runs': runs_path, 'spectrum': spectrum_path, 'num_runs': len(runs_df), 'num_files': len(file_paths)}
+
+# Example usage:
+# paths = find_wrk2_outputs('iDynamicsPackagesModules/Evaluations')
+# export_parquet(paths, 'iDynamicsPackagesModules/Evaluations/wrk2_parquet')
+# runs = pd.read_parquet('iDynamicsPackagesModules/Evaluations/wrk2_parquet/wrk2_runs.parquet')
+# print(runs[runs['complete']].groupby('url')[['p50', 'p99', 'requests_per_sec']].median())
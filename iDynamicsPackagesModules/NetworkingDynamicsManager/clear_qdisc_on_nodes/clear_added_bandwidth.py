@@ -4,6 +4,8 @@ import paramiko
 import logging
 from multiprocessing import Pool
 
+from iDynamicsPackagesModules.NetworkingDynamicsManager.node_inventory import load_node_inventory
+
 # Configure logging with a timestamped log file
 timestamp = datetime.now().strftime("%Y_%b_%d_%H%M")  # Example: 2024_Oct_20_1930
 logging.basicConfig(
@@ -61,27 +63,14 @@ def automate_qdisc_clearing(params):
 #     'k8s-worker-9': {'ip': '172.26.133.118', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'}
 # }
 
-node_details = {
-    'k8s-worker-1': {'ip': '172.26.128.30', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-2': {'ip': '172.26.132.91', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-3': {'ip': '172.26.133.31', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-4': {'ip': '172.26.132.241', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-5': {'ip': '172.26.132.142', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-6': {'ip': '172.26.133.55', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-7': {'ip': '172.26.130.22', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-8': {'ip': '172.26.130.82', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-9': {'ip': '172.26.133.118', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-10': {'ip': '172.26.134.133', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-11': {'ip': '172.26.128.34', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-12': {'ip': '172.26.132.228', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-13': {'ip': '172.26.133.157', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-14': {'ip': '172.26.128.40', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-15': {'ip': '172.26.131.224', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'}
-}
-
-# Prepare parameters for parallel execution (one entry per node)
-params_list = [(node_name, node_details) for node_name in node_details.keys()]
+def main():
+    # Worker nodes (IPs and SSH credentials) from the Kubernetes API, or $IDYNAMICS_NODE_INVENTORY
+    node_details = load_node_inventory().node_details()
 
-if __name__ == '__main__':
+    # Prepare parameters for parallel execution (one entry per node)
+    params_list = [(node_name, node_details) for node_name in node_details.keys()]
     with Pool(processes=len(node_details)) as pool:
         pool.map(automate_qdisc_clearing, params_list)
+
+if __name__ == '__main__':
+    main()
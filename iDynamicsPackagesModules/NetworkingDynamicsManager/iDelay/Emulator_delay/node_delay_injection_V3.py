@@ -1,27 +1,13 @@
-import random
 import csv
 import paramiko
 from multiprocessing import Pool
 
-# Function to generate a realistic delay matrix
-def generate_delay_matrix(num_nodes, base_latency=5, max_additional_latency=50):
-    delay_matrix = [[0 for _ in range(num_nodes)] for _ in range(num_nodes)]
+from iDynamicsPackagesModules.NetworkingDynamicsManager.network_matrix_generator import generate_delay_matrix
+from iDynamicsPackagesModules.NetworkingDynamicsManager.qdisc_tree import build_qdisc_tree, apply_batch_over_ssh
+from iDynamicsPackagesModules.NetworkingDynamicsManager.node_inventory import load_node_inventory
 
-    for i in range(num_nodes):
-        for j in range(num_nodes):
-            if i == j:
-                delay_matrix[i][j] = 0 # node-to-node its self, latency set to zero
-            else:
-                # additional_latency = random.uniform(0, max_additional_latency)
-                additional_latency = random.uniform(0, max_additional_latency)
-                distance_factor = abs(i - j) / num_nodes
-                simulated_latency = base_latency + additional_latency * distance_factor
-                congestion_factor = random.uniform(0.5, 1.5)
-                delay_matrix[i][j] = int(simulated_latency * congestion_factor) # change the float to integer
-    return delay_matrix
 
-
-def apply_latency_between_nodes(source_node_name, username, key_path, interface, delay_matrix, node_details):
+def apply_latency_between_nodes(source_node_name, username, key_path, interface, delay_matrix, node_details, inventory):
     """Apply latency between source and destination nodes using SSH with a private key."""
     client = paramiko.SSHClient()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -31,43 +17,17 @@ def apply_latency_between_nodes(source_node_name, username, key_path, interface,
         source_node_ip = node_details[source_node_name]['ip']
         client.connect(source_node_ip, username=username, key_filename=key_path)
         
-        # Clear existing rules:
-        client.exec_command(f"sudo tc qdisc del dev {interface} root")
-        
-        # set the default class as 1:1 ("1:" is the root handel, "1" is the class identifier)
-        client.exec_command(f"sudo tc qdisc add dev {interface} root handle 1: htb default 1") 
-        '''
-        Not strictyly necessary to set rate limit for default class qdisc, 
-        but it is a common practice to deifne a class with specific parameters to
-        control the rate and behavior of the traffic that does not match any of the filters
-        '''
-        client.exec_command(f"sudo tc class add dev {interface} parent 1: classid 1:1 htb rate 100mbps")
-        
-        mark_count = 2  # Start from 2 to reserve 1:1 as the default class
-        dst_node_details = exclude_src_node(source_node_name, node_details)
-        source_node_index = list(node_details.keys()).index(source_node_name)
-
-        for dst_node, details in dst_node_details.items():
-            dst_node_index = list(node_details.keys()).index(dst_node)
-            dst_node_ip = details['ip']
-            latency = delay_matrix[source_node_index][dst_node_index]
-            print(dst_node_ip)
-            
-            command_class_add = f"sudo tc class add dev {interface} parent 1: classid 1:{mark_count} htb rate 100mbps" 
-            '''
-            The 0 in handle {mark_count}0 is used to create a unique and structured identifier for the qdisc handle. 
-            This helps ensure that the handle is unique within the traffic control configuration and maintains a clear hierarchy,
-            making the configuration easier to manage and understand.
-            '''
-            command_delay_add = f"sudo tc qdisc add dev {interface} parent 1:{mark_count} handle {mark_count}0: netem delay {latency}ms" # can be easily changed to add loss,jitter, etc
-            command_filter_add = f"sudo tc filter add dev {interface} protocol ip parent 1:0 prio 1 u32 match ip dst {dst_node_ip} flowid 1:{mark_count}"
-            
-            client.exec_command(command_class_add)
-            client.exec_command(command_delay_add)
-            client.exec_command(command_filter_add)
-            
-            print(f'From {source_node_name} to {dst_node}: injected latency {latency} ms ')
-            mark_count += 1
+        # One unified tree (qdisc_tree.py) applied with a single `tc -batch`: the delay classes are no longer
+        # capped at "htb rate 100mbps", and the commands run in order instead of as overlapping exec_command calls
+        batch_lines = build_qdisc_tree(source_node_name, node_details, delay_matrix=delay_matrix, interface=interface)
+        stdout_output, stderr_output = apply_batch_over_ssh(client, batch_lines)
+        if stderr_output:
+            print(f"tc on {source_node_name} reported: {stderr_output}")
+
+        source_node_index = inventory.index_of(source_node_name)
+        for dst_node_index, dst_node in enumerate(node_details):
+            if dst_node != source_node_name:
+                print(f'From {source_node_name} to {dst_node}: injected latency {delay_matrix[source_node_index][dst_node_index]} ms ')
 
     except Exception as e:
         print(f"Failed to apply latency for {source_node_name}: {e}")
@@ -78,11 +38,11 @@ def exclude_src_node(src_node_name, node_details):
     return {name: details for name, details in node_details.items() if name != src_node_name}
 
 def automate_latency_injection(params):
-    source_node_name, delay_matrix, node_details = params
+    source_node_name, delay_matrix, node_details, inventory = params
     username = node_details[source_node_name]['username']
     key_path = node_details[source_node_name]['key_path']
     interface = 'eth0'  # Assuming the interface name is eth0
-    apply_latency_between_nodes(source_node_name, username, key_path, interface, delay_matrix, node_details)
+    apply_latency_between_nodes(source_node_name, username, key_path, interface, delay_matrix, node_details, inventory)
 
 # The above inejction is singel direction;
 # when want ti calculate the bidirectional delay between two nodes,
@@ -105,50 +65,40 @@ def compute_bidirectional_delay_sums(delay_matrix):
 
 
 
-# Assuming correct IP addresses and no duplication in node keys
-node_details = {
-    'k8s-worker-1': {'ip': '172.26.128.30', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-2': {'ip': '172.26.132.91', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-3': {'ip': '172.26.133.31', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-4': {'ip': '172.26.132.241', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-5': {'ip': '172.26.132.142', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-6': {'ip': '172.26.133.55', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-7': {'ip': '172.26.130.22', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-8': {'ip': '172.26.130.82', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'},
-    'k8s-worker-9': {'ip': '172.26.133.118', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'}
-  
-}
+def main():
+    # Worker nodes (IPs and SSH credentials) from the Kubernetes API, or $IDYNAMICS_NODE_INVENTORY (node_inventory.py)
+    inventory = load_node_inventory()
+    node_details = inventory.node_details()
 
+    # Generate delay matrix for all worker nodes
+    '''Injecting no latencies'''
+    # delay_matrix = generate_delay_matrix(num_nodes=9, base_latency=0, max_additional_latency=0)
 
-# Generate delay matrix for 9 worker nodes
-'''Injecting no latencies'''
-# delay_matrix = generate_delay_matrix(num_nodes=9, base_latency=0, max_additional_latency=0)
+    # Generate delay matrix for all worker nodes
+    delay_matrix = generate_delay_matrix(
+        num_nodes=len(node_details), 
+        base_latency= 5, 
+        max_additional_latency= 50,
+        seed=None) # set an integer seed to inject the same matrix again
 
-# Generate delay matrix for 9 worker nodes
-delay_matrix = generate_delay_matrix(
-    num_nodes=len(node_details), 
-    base_latency= 5, 
-    max_additional_latency= 50)
 
+    # Save the directed delay matrix (i -> j) to CSV
+    with open('delay_matrix_directed.csv', mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows(delay_matrix)
 
-# Save the directed delay matrix (i -> j) to CSV
-with open('delay_matrix_directed.csv', mode='w', newline='') as file:
-    writer = csv.writer(file)
-    writer.writerows(delay_matrix)
+    # Compute and save the BIdirectional (i <-> j) summed delays
+    bidirectional_delay_matrix = compute_bidirectional_delay_sums(delay_matrix)
 
-# Compute and save the BIdirectional (i <-> j) summed delays
-bidirectional_delay_matrix = compute_bidirectional_delay_sums(delay_matrix)
+    with open('delay_matrix_bidirectional.csv', mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows(bidirectional_delay_matrix)
 
-with open('delay_matrix_bidirectional.csv', mode='w', newline='') as file:
-    writer = csv.writer(file)
-    writer.writerows(bidirectional_delay_matrix)
-    
-    
-    
-
-# Apply latency injection using the generated delay matrix with multiprocessing
-params_list = [(source_node, delay_matrix, node_details) for source_node in node_details.keys()]
 
-if __name__ == '__main__':
+    # Apply latency injection using the generated delay matrix with multiprocessing
+    params_list = [(source_node, delay_matrix, node_details, inventory) for source_node in node_details.keys()]
     with Pool(processes=len(node_details)) as pool:
         pool.map(automate_latency_injection, params_list)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+'''In-pod all-pairs latency agent (runs in every pod of the latency-agent DaemonSet).
+
+Instead of the collector opening one `kubectl exec curl` stream per node pair and sample,
+every agent probes all of its peers itself on a schedule and serves its latest row:
+
+    GET /row      -> JSON {"node": ..., "timestamp": ..., "latency_ms": {dst_node: {"min", "median", "p80", "samples"}}}
+    GET /metrics  -> Prometheus text format (idynamics_agent_latency_ms{src_node, dst_node, stat})
+    GET /ping     -> the agent's node name (also used by peers to map pod IPs to node names)
+
+Peers are discovered through the headless Service of the DaemonSet (one A record per agent pod); a peer IP
+that drops out of the DNS answer (agent pod replaced) is forgotten with its samples, and if two IPs still map
+to the same node, /row reports the one with the most recent sample.
+Probes are either a TCP connect (handshake = one round trip) or an HTTP GET /ping on a kept-alive
+connection (one request round trip, no process start-up and no handshake per sample).
+
+Only the Python standard library is used, so the agent runs in a plain python image; its source is
+mounted into the pods from a ConfigMap (see deploy_latency_agent_daemonset_if_needed() in
+node_delay_measure_ParallelComp.py).
+
+Environment variables:
+    NODE_NAME       node the pod runs on (downward API)
+    PEER_SERVICE    DNS name of the headless Service, e.g. latency-agent.measure-nodes.svc.cluster.local
+    AGENT_PORT      port of this HTTP server (default 8079)
+    PROBE_MODE      "tcp" (default) or "http"
+    PROBE_INTERVAL  seconds between two probe rounds (default 5)
+    SAMPLES_KEPT    samples kept per peer for the statistics (default 20)
+    PROBE_TIMEOUT   seconds before a probe is given up (default 1)
+'''
+
+import os
+import json
+import time
+import socket
+import threading
+import http.client
+import concurrent.futures
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NODE_NAME = os.environ.get('NODE_NAME', socket.gethostname())
+PEER_SERVICE = os.environ.get('PEER_SERVICE', 'latency-agent.measure-nodes.svc.cluster.local')
+AGENT_PORT = int(os.environ.get('AGENT_PORT', '8079'))
+PROBE_MODE = os.environ.get('PROBE_MODE', 'tcp')
+PROBE_INTERVAL = float(os.environ.get('PROBE_INTERVAL', '5'))
+SAMPLES_KEPT = int(os.environ.get('SAMPLES_KEPT', '20'))
+PROBE_TIMEOUT = float(os.environ.get('PROBE_TIMEOUT', '1'))
+
+
+def _percentile(sorted_values, q):
+    # nearest-rank percentile on an already sorted list
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class LatencyAgent:
+    def __init__(self):
+        self.samples = {}          # peer_ip -> deque of latencies (ms)
+        self.peer_nodes = {}       # peer_ip -> node name
+        self.connections = {}      # peer_ip -> kept-alive HTTPConnection (http mode)
+        self.last_sample = {}      # peer_ip -> time.time() of the latest sample
+        self.last_round = None
+        self.lock = threading.Lock()
+        self.own_ips = set()
+
+    def discover_peers(self):
+        try:
+            infos = socket.getaddrinfo(PEER_SERVICE, AGENT_PORT, socket.AF_INET, socket.SOCK_STREAM)
+        except socket.gaierror:
+            return []
+        if not self.own_ips:
+            self.own_ips = {info[4][0] for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)}
+        peers = sorted({info[4][0] for info in infos} - self.own_ips)
+        self._evict_peers(set(peers))
+        for peer_ip in peers:
+            if peer_ip not in self.peer_nodes:
+                node = self._ask_node_name(peer_ip)
+                if node:
+                    self.peer_nodes[peer_ip] = node
+        return [peer_ip for peer_ip in peers if peer_ip in self.peer_nodes and self.peer_nodes[peer_ip] != NODE_NAME]
+
+    def _evict_peers(self, current_peers):
+        # forget agents that are no longer behind the Service, so their samples cannot shadow the new pod's
+        with self.lock:
+            for peer_ip in set(self.peer_nodes) - current_peers:
+                self.peer_nodes.pop(peer_ip, None)
+                self.samples.pop(peer_ip, None)
+                self.last_sample.pop(peer_ip, None)
+                conn = self.connections.pop(peer_ip, None)
+                if conn is not None:
+                    conn.close()
+
+    def _ask_node_name(self, peer_ip):
+        try:
+            conn = http.client.HTTPConnection(peer_ip, AGENT_PORT, timeout=PROBE_TIMEOUT)
+            conn.request('GET', '/ping')
+            node = conn.getresponse().read().decode().strip()
+            conn.close()
+            return node
+        except (OSError, http.client.HTTPException):
+            return None
+
+    def _probe_tcp(self, peer_ip):
+        start = time.perf_counter()
+        with socket.create_connection((peer_ip, AGENT_PORT), timeout=PROBE_TIMEOUT):
+            return (time.perf_counter() - start) * 1000
+
+    def _probe_http(self, peer_ip):
+        conn = self.connections.get(peer_ip)
+        if conn is None:
+            conn = http.client.HTTPConnection(peer_ip, AGENT_PORT, timeout=PROBE_TIMEOUT)
+            conn.connect()  # the handshake is not part of the measured round trip
+            self.connections[peer_ip] = conn
+        try:
+            start = time.perf_counter()
+            conn.request('GET', '/ping')
+            conn.getresponse().read()
+            return (time.perf_counter() - start) * 1000
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self.connections.pop(peer_ip, None)
+            raise
+
+    def probe(self, peer_ip):
+        try:
+            latency = self._probe_http(peer_ip) if PROBE_MODE == 'http' else self._probe_tcp(peer_ip)
+        except (OSError, http.client.HTTPException):
+            return
+        with self.lock:
+            self.samples.setdefault(peer_ip, deque(maxlen=SAMPLES_KEPT)).append(latency)
+            self.last_sample[peer_ip] = time.time()
+
+    def run_forever(self):
+        # one probe round per interval; deadlines are kept on the monotonic clock so rounds do not drift
+        next_round = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            while True:
+                peers = self.discover_peers()
+                list(executor.map(self.probe, peers))
+                self.last_round = time.time()
+                next_round += PROBE_INTERVAL
+                time.sleep(max(0.0, next_round - time.monotonic()))
+
+    def row(self):
+        with self.lock:
+            row, row_time = {}, {}
+            for peer_ip, values in self.samples.items():
+                node = self.peer_nodes.get(peer_ip)
+                if not values or node is None or row_time.get(node, -1.0) > self.last_sample[peer_ip]:
+                    continue
+                row_time[node] = self.last_sample[peer_ip]
+                ordered = sorted(values)
+                row[node] = {
+                    'min': ordered[0],
+                    'median': _percentile(ordered, 0.5),
+                    'p80': _percentile(ordered, 0.8),
+                    'samples': len(ordered),
+                }
+        return {'node': NODE_NAME, 'timestamp': self.last_round, 'mode': PROBE_MODE, 'latency_ms': row}
+
+    def metrics(self):
+        lines = ['# HELP idynamics_agent_latency_ms Latency from this node to a peer node measured by the in-pod agent.',
+                 '# TYPE idynamics_agent_latency_ms gauge']
+        for dst_node, stats in sorted(self.row()['latency_ms'].items()):
+            for stat in ('min', 'median', 'p80'):
+                lines.append(f'idynamics_agent_latency_ms{{src_node="{NODE_NAME}",dst_node="{dst_node}",stat="{stat}"}} {stats[stat]:.3f}')
+        return '\n'.join(lines) + '\n'
+
+
+AGENT = LatencyAgent()
+
+
+class AgentHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive for the http probes
+
+    def do_GET(self):
+        if self.path == '/ping':
+            body, content_type = NODE_NAME.encode(), 'text/plain'
+        elif self.path == '/row':
+            body, content_type = json.dumps(AGENT.row()).encode(), 'application/json'
+        elif self.path == '/metrics':
+            body, content_type = AGENT.metrics().encode(), 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # probes would flood the pod log
+
+
+if __name__ == '__main__':
+    server = ThreadingHTTPServer(('0.0.0.0', AGENT_PORT), AgentHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    AGENT.run_forever()
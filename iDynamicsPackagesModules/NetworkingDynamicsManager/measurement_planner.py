@@ -0,0 +1,235 @@
+'''Staleness-driven incremental re-measurement of the latency / bandwidth matrices.
+
+Between the "on-time" full measurement (minutes) and the "off-time" stale files of build_nodeinfo_objects(),
+the planner keeps one matrix fresh by re-measuring only the pairs that need it, within a per-cycle probe budget.
+A pair is due when
+(1) its last measurement is older than max_age,
+(2) an emulator change just touched it (mark_touched_nodes() / mark_touched_matrix()), or
+(3) a passive signal flags it as drifting (observe_passive(), e.g. from Istio metrics): the passive
+    estimates of a pair are compared with their own EWMA baseline, not with the active measurements,
+    since they measure something else (e.g. a symmetric round trip vs the directed curl time).
+Due pairs are ranked touched > drifting > stale, and among stale pairs by age weighted by the pair's
+observed variability (EWMA coefficient of variation), so noisy pairs are refreshed first.
+A planned pair that update() does not get a value for (probe failed, node unreachable) backs off: it is not
+planned again for retry_backoff seconds, doubling with every further failure up to max_age, so a pair that
+never measures successfully cannot keep the top of the ranking and starve the others.
+
+Typical cycle:
+    planner = MeasurementPlanner(node_names, 'latency', max_age=600, budget=20)
+    pairs = planner.plan()
+    planner.update(measure_http_latency(namespace='measure-nodes', pairs=pairs))
+    planner.current()  # NetworkMatrix with the freshest value of every pair
+'''
+
+import time
+import logging
+
+import numpy as np
+
+from iDynamicsPackagesModules.NetworkingDynamicsManager.network_matrix_store import NetworkMatrix
+
+
+class MeasurementPlanner:
+    """
+    Tracks age, EWMA mean/variance and touched/drift flags of every ordered node pair.
+
+    Args:
+        node_names: Node names in matrix index order.
+        kind: 'latency' or 'bandwidth' (see network_matrix_store.py).
+        max_age: Seconds after which a measured pair is stale.
+        budget: Maximum number of pairs returned by plan() (probes per cycle).
+        ewma_alpha: Weight of a new measurement in the EWMA mean and variance.
+        drift_sigmas: A passive observation farther than drift_sigmas standard deviations
+            (plus drift_tolerance) from the EWMA of the pair's earlier passive observations flags it as drifting.
+        drift_tolerance: Absolute tolerance in the unit of the passive estimates.
+        retry_backoff: Seconds a pair is held back after its first failed measurement (doubled per failure,
+            capped at max_age).
+    """
+    def __init__(self, node_names: list, kind: str, max_age: float = 600, budget: int = 20,
+                 ewma_alpha: float = 0.3, drift_sigmas: float = 3.0, drift_tolerance: float = 1.0,
+                 retry_backoff: float = 30):
+        self.node_names = list(node_names)
+        self.index = {node_name: i for i, node_name in enumerate(self.node_names)}
+        self.kind = kind
+        self.max_age = max_age
+        self.budget = budget
+        self.ewma_alpha = ewma_alpha
+        self.drift_sigmas = drift_sigmas
+        self.drift_tolerance = drift_tolerance
+        self.retry_backoff = retry_backoff
+
+        num_nodes = len(self.node_names)
+        shape = (num_nodes, num_nodes)
+        self.values = np.full(shape, np.nan)         # latest measured value
+        self.mean = np.full(shape, np.nan)           # EWMA of the measured values
+        self.var = np.zeros(shape)                   # EWMA variance
+        self.last_measured = np.full(shape, -np.inf)
+        self.touched = np.zeros(shape, dtype=bool)
+        self.drifting = np.zeros(shape, dtype=bool)
+        self.passive_mean = np.full(shape, np.nan)   # EWMA baseline of the passive estimates
+        self.passive_var = np.zeros(shape)
+        self.planned = np.zeros(shape, dtype=bool)   # returned by the last plan(), awaiting update()
+        self.failures = np.zeros(shape, dtype=int)   # consecutive planned-but-not-measured cycles
+        self.retry_at = np.full(shape, -np.inf)      # backoff: not planned again before this time
+        self.off_diagonal = ~np.eye(num_nodes, dtype=bool)
+
+    @classmethod
+    def from_matrix(cls, matrix: NetworkMatrix, **kwargs):
+        """Start from an existing matrix (e.g. the latest store snapshot); its pairs count as measured at its timestamp."""
+        planner = cls(matrix.node_names, matrix.kind, **kwargs)
+        measured = matrix.mask & planner.off_diagonal
+        planner.values[measured] = matrix.values[measured]
+        planner.mean[measured] = matrix.values[measured]
+        planner.last_measured[measured] = matrix.timestamp
+        return planner
+
+    def _pair_positions(self, pairs):
+        rows = np.array([self.index[src] for src, _ in pairs], dtype=int)
+        cols = np.array([self.index[dst] for _, dst in pairs], dtype=int)
+        return rows, cols
+
+    def mark_touched_nodes(self, node_names: list) -> None:
+        """The tc tree of these nodes changed: all pairs from (and to) them are due."""
+        positions = [self.index[node_name] for node_name in node_names if node_name in self.index]
+        self.touched[positions, :] = True
+        self.touched[:, positions] = True
+        self.touched &= self.off_diagonal
+
+    def mark_touched_matrix(self, old_matrix, new_matrix) -> None:
+        """An emulator switched from old_matrix to new_matrix (index order = node_names): pairs that changed are due."""
+        changed = np.asarray(old_matrix, dtype=float) != np.asarray(new_matrix, dtype=float)
+        self.touched |= changed & self.off_diagonal
+
+    def mark_touched_pairs(self, pairs: list) -> None:
+        if pairs:
+            rows, cols = self._pair_positions(pairs)
+            self.touched[rows, cols] = True
+
+    def observe_passive(self, src: str, dst: str, value: float) -> bool:
+        """
+        Compare a passive estimate with the pair's passive baseline (EWMA of its earlier passive estimates);
+        flags and returns drift. The first estimate of a pair only sets the baseline, and a drifting estimate
+        restarts it, so a level shift is flagged once.
+        """
+        i, j = self.index[src], self.index[dst]
+        mean, var = self.passive_mean[i, j], self.passive_var[i, j]
+        if np.isnan(mean):
+            self.passive_mean[i, j] = value
+            return False
+        drifting = bool(abs(value - mean) > self.drift_sigmas * np.sqrt(var) + self.drift_tolerance)
+        if drifting:
+            self.drifting[i, j] = True
+            self.passive_mean[i, j], self.passive_var[i, j] = value, 0.0
+        else:
+            diff = value - mean
+            self.passive_mean[i, j] = mean + self.ewma_alpha * diff
+            self.passive_var[i, j] = (1 - self.ewma_alpha) * (var + self.ewma_alpha * diff ** 2)
+        return drifting
+
+    def plan(self, now: float = None, budget: int = None) -> list:
+        """
+        Returns:
+            Up to `budget` (src, dst) pairs to re-measure in this cycle, most urgent first.
+        """
+        now = time.time() if now is None else now
+        budget = self.budget if budget is None else budget
+        age = now - self.last_measured                         # inf for never-measured pairs
+        stale = age >= self.max_age
+        due = (self.touched | self.drifting | stale) & self.off_diagonal & (now >= self.retry_at)
+        if not due.any():
+            return []
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cv = np.nan_to_num(np.sqrt(self.var) / np.abs(self.mean))  # variability of the pair
+        staleness = np.minimum(age / self.max_age, 1e6) * (1 + cv)
+        score = staleness + 1e7 * self.drifting + 2e7 * self.touched
+
+        flat = np.flatnonzero(due)
+        if len(flat) > budget:
+            flat = flat[np.argpartition(-score.ravel()[flat], budget - 1)[:budget]]
+        flat = flat[np.argsort(-score.ravel()[flat], kind='stable')]
+        rows, cols = np.unravel_index(flat, due.shape)
+        self.planned[:] = False
+        self.planned[rows, cols] = True
+        logging.info(f"Planned {len(flat)} of {int(due.sum())} due {self.kind} pairs "
+                     f"({int(self.touched.sum())} touched, {int(self.drifting.sum())} drifting, "
+                     f"{int((self.retry_at > now).sum())} backing off)")
+        return [(self.node_names[i], self.node_names[j]) for i, j in zip(rows, cols)]
+
+    def update(self, results, now: float = None) -> int:
+        """
+        Feed measured values back (a nested result dict of measure_http_latency() / measure_bandwidth(),
+        or a NetworkMatrix). Only successfully measured pairs are updated; returns their number.
+        Pairs of the last plan() without a value count as failed attempts and back off.
+        """
+        now = time.time() if now is None else now
+        if isinstance(results, NetworkMatrix):
+            matrix = results.reindex(self.node_names)
+        else:
+            matrix = NetworkMatrix.from_nested_dict(results, self.kind, timestamp=now, node_names=self.node_names)
+        measured = matrix.mask & self.off_diagonal
+        new = matrix.values
+
+        first = measured & np.isnan(self.mean)
+        again = measured & ~first
+        alpha = self.ewma_alpha
+        diff = np.where(again, new - self.mean, 0.0)
+        # incremental EWMA mean / variance
+        self.mean = np.where(first, new, np.where(again, self.mean + alpha * diff, self.mean))
+        self.var = np.where(again, (1 - alpha) * (self.var + alpha * diff ** 2), self.var)
+        self.values[measured] = new[measured]
+        self.last_measured[measured] = now
+        self.touched &= ~measured
+        self.drifting &= ~measured
+
+        failed = self.planned & ~measured
+        self.failures[failed] += 1
+        backoff = np.minimum(self.retry_backoff * 2.0 ** (self.failures[failed] - 1), self.max_age)
+        self.retry_at[failed] = now + backoff
+        self.failures[measured] = 0
+        self.retry_at[measured] = -np.inf
+        self.planned[:] = False
+        if failed.any():
+            logging.warning(f"{int(failed.sum())} planned {self.kind} pairs were not measured, backing off")
+        return int(measured.sum())
+
+    def current(self, now: float = None) -> NetworkMatrix:
+        """The freshest value of every pair as a NetworkMatrix."""
+        return NetworkMatrix(self.node_names, self.values.copy(), self.kind, time.time() if now is None else now)
+
+    def ages(self, now: float = None) -> np.ndarray:
+        """Seconds since each pair was last measured (inf if never)."""
+        return (time.time() if now is None else now) - self.last_measured
+
+
+def run_measurement_cycle(planner: MeasurementPlanner, measure_function, store=None, exporter=None, **measure_params) -> list:
+    """
+    One planner cycle: plan, measure only the planned pairs, feed the results back and
+    optionally append the refreshed matrix to a NetworkMatrixStore and publish it on a NetworkMatrixExporter.
+
+    Args:
+        measure_function: measure_http_latency or measure_bandwidth (both accept pairs=...).
+
+    Returns:
+        The measured pairs.
+    """
+    pairs = planner.plan()
+    if pairs:
+        results = measure_function(pairs=pairs, **measure_params)
+        updated = planner.update(results)
+        logging.info(f"Re-measured {updated}/{len(pairs)} {planner.kind} pairs")
+        if store is not None or exporter is not None:
+            matrix = planner.current()
+            if store is not None:
+                store.append(matrix)
+            if exporter is not None:
+                exporter.update_measured(matrix)
+    return pairs
+
+# Example usage:
+# first run (no stored matrix yet), in node inventory order:
+# latency_planner = MeasurementPlanner(load_node_inventory().node_names, 'latency', max_age=600, budget=20)
+# latency_planner = MeasurementPlanner.from_matrix(NetworkMatrixStore(store_dir, 'latency').snapshot(), max_age=600, budget=20)
+# latency_planner.mark_touched_nodes(['k8s-worker-3'])  # after the emulator changed worker-3's delays
+# run_measurement_cycle(latency_planner, measure_http_latency, store=NetworkMatrixStore(store_dir, 'latency'),
+#                       namespace='measure-nodes')
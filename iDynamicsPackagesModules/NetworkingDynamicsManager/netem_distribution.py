@@ -0,0 +1,166 @@
+'''Custom netem delay distribution tables built from measured latency samples.
+
+`netem delay <mu>ms <sigma>ms distribution <name>` draws every packet's delay as
+    mu + sigma * table[random index] / 8192
+from the table <name>.dist in tc's library directory (/usr/lib/tc). The tables shipped with iproute2
+(normal, pareto, paretonormal) only give the shape of textbook distributions; here the table is built from
+recorded samples, so the emulated tail (p99) matches the measured one.
+
+Table format (as produced by iproute2's maketable): TABLE_SIZE integers, the inverse CDF of the
+standardized samples ((x - mean) / std) at evenly spaced probabilities, scaled by 8192 and clipped to int16.
+The clipping bounds a table at +-4 standard deviations, so very heavy tails are cut at mu + 4 sigma.
+
+Tables can be built per node pair (from the measurer, see measure_http_latency(..., return_stats=True),
+or from trace files) or per tier pair, installed on the nodes with install_dist_tables(), and referenced in
+the tree through pair_overrides_from_tables() -> qdisc_tree.build_qdisc_tree(pair_overrides=...).
+'''
+
+import re
+import csv
+
+import numpy as np
+
+NETEM_DIST_SCALE = 8192
+TABLE_SIZE = 4096
+INT16_MAX = 32767
+TC_LIB_DIR = '/usr/lib/tc'
+
+
+def build_dist_table(samples, table_size: int = TABLE_SIZE):
+    """
+    Returns:
+        (mu_ms, sigma_ms, table): mean and standard deviation of the samples and the int16 netem table.
+    """
+    samples = np.asarray(samples, dtype=float)
+    samples = samples[~np.isnan(samples)]
+    mu = samples.mean()
+    sigma = samples.std()
+    if sigma == 0:
+        return mu, 0.0, np.zeros(table_size, dtype=np.int16)
+    probabilities = (np.arange(table_size) + 0.5) / table_size
+    standardized = np.quantile((samples - mu) / sigma, probabilities)
+    table = np.clip(np.rint(standardized * NETEM_DIST_SCALE), -INT16_MAX, INT16_MAX).astype(np.int16)
+    return mu, sigma, table
+
+
+def format_dist_table(table, comment: str = '') -> str:
+    """The .dist file content: '#' comment lines, then 8 values per line (the maketable layout)."""
+    lines = [f"# {line}" for line in comment.splitlines()] if comment else []
+    values = [str(int(v)) for v in table]
+    lines += [" ".join(values[k:k + 8]) for k in range(0, len(values), 8)]
+    return "\n".join(lines) + "\n"
+
+
+def table_name(*parts) -> str:
+    """Deterministic table name, e.g. table_name('k8s-worker-1', 'k8s-worker-2') -> 'idyn_k8s_worker_1__k8s_worker_2'."""
+    return "idyn_" + "__".join(re.sub(r'[^A-Za-z0-9]+', '_', str(part)) for part in parts)
+
+
+def build_tables(grouped_samples: dict, min_samples: int = 50, table_size: int = TABLE_SIZE) -> dict:
+    """
+    Build one table per group (a (src_node, dst_node) pair or a (tier_a, tier_b) pair).
+
+    Args:
+        grouped_samples: {key: [latency samples in ms]}.
+        min_samples: Groups with fewer samples are skipped (their tail would be a guess).
+
+    Returns:
+        {key: {'name', 'mu', 'sigma', 'content', 'samples'}}
+    """
+    tables = {}
+    for key, samples in grouped_samples.items():
+        samples = np.asarray(samples, dtype=float)
+        if len(samples) < min_samples:
+            continue
+        mu, sigma, table = build_dist_table(samples, table_size)
+        name = table_name(*key) if isinstance(key, tuple) else table_name(key)
+        comment = (f"netem delay distribution {name}\n{len(samples)} samples, mean {mu:.3f} ms, std {sigma:.3f} ms, "
+                   f"p99 {np.percentile(samples, 99):.3f} ms")
+        tables[key] = {'name': name, 'mu': round(float(mu), 3), 'sigma': round(float(sigma), 3),
+                       'content': format_dist_table(table, comment), 'samples': len(samples)}
+    return tables
+
+
+def load_trace_samples(file_path: str) -> dict:
+    """
+    Read latency samples from a CSV trace with the columns src,dst,latency_ms (one sample per row).
+
+    Returns:
+        {(src, dst): [samples]}
+    """
+    grouped = {}
+    with open(file_path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                grouped.setdefault((row['src'], row['dst']), []).append(float(row['latency_ms']))
+            except (KeyError, ValueError):
+                continue
+    return grouped
+
+
+def samples_from_measurements(latency_results: dict) -> dict:
+    """
+    Pair samples from measure_http_latency(..., return_stats=True), whose per-pair dicts carry the raw samples.
+    """
+    return {(src, dst): stats['raw_ms']
+            for src, row in latency_results.items()
+            for dst, stats in row.items()
+            if isinstance(stats, dict) and stats.get('raw_ms')}
+
+
+def group_by_tier(pair_samples: dict, tiers: dict) -> dict:
+    """Merge pair samples into tier-pair samples; tiers = {node_name: tier}."""
+    grouped = {}
+    for (src, dst), samples in pair_samples.items():
+        key = tuple(sorted((tiers[src], tiers[dst])))
+        grouped.setdefault(key, []).extend(samples)
+    return grouped
+
+
+def install_dist_tables(runner, node_names: list, tables: dict, tc_lib_dir: str = TC_LIB_DIR) -> dict:
+    """
+    Install the .dist files on every node (staged in /tmp, then moved into tc's library directory).
+
+    Returns:
+        {node_name: stderr of the install command} for the nodes where it reported something.
+    """
+    errors = {}
+    for node_name in node_names:
+        commands = []
+        for table in tables.values():
+            staged = f"/tmp/{table['name']}.dist"
+            runner.write_file(node_name, staged, table['content'])
+            commands.append(f"sudo install -m 644 {staged} {tc_lib_dir}/{table['name']}.dist")
+        _, stderr_output = runner.run(node_name, " && ".join(commands))
+        if stderr_output:
+            errors[node_name] = stderr_output
+    return errors
+
+
+def pair_overrides_from_tables(source_node_name: str, node_names: list, tables: dict, tiers: dict = None) -> dict:
+    """
+    Netem settings of one source node for qdisc_tree.build_qdisc_tree(pair_overrides=...):
+    {dst_node: {'delay': mu, 'jitter': sigma, 'distribution': name}}.
+    Pair tables are used where present, otherwise the table of the tier pair (if tiers are given).
+    """
+    overrides = {}
+    for dst_node in node_names:
+        if dst_node == source_node_name:
+            continue
+        table = tables.get((source_node_name, dst_node))
+        if table is None and tiers is not None:
+            table = tables.get(tuple(sorted((tiers[source_node_name], tiers[dst_node]))))
+        if table is None:
+            continue
+        if table['sigma'] > 0:
+            overrides[dst_node] = {'delay': table['mu'], 'jitter': table['sigma'], 'distribution': table['name']}
+        else:
+            overrides[dst_node] = {'delay': table['mu']}
+    return overrides
+
+# Example usage:
+# latency_results = measure_http_latency(namespace='measure-nodes', statistic='p99', max_samples=200, return_stats=True)
+# tables = build_tables(samples_from_measurements(latency_results))
+# install_dist_tables(runner, list(node_details), tables)
+# batches = {node: build_qdisc_tree(node, node_details, pair_overrides=pair_overrides_from_tables(node, list(node_details), tables))
+#            for node in node_details}
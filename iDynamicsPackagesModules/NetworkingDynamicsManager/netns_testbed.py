@@ -0,0 +1,331 @@
+'''Local network-namespace testbed for the emulator and the measurer.
+
+Builds N Linux network namespaces on one machine, each with an `eth0` veth joined to one bridge, and exposes
+them as "nodes" with the same node_details format as the real cluster ({'k8s-worker-1': {'ip': ...}, ...}).
+LocalNetnsRunner has the runner interface of tc_sync_switch.SSHNodeRunner (run / write_file / close) but
+executes through `ip netns exec` instead of SSH, so the emulator code paths (build_delay_batch,
+switch_delay_profile, NetworkDynamicsScheduler, ...) run unchanged against the namespaces.
+
+The checks measure what the injected trees actually do:
+- verify_delays(): RTT per pair (ping, or a TCP connect to a closed port, answered by a RST after one
+  round trip, when ping is not installed) against delay[i][j] + delay[j][i]
+- verify_rates():  throughput per pair (iperf3, or a Python TCP sender/sink) against the injected rate
+- benchmark_switch() / classification_overhead(): profile switch time and the per-packet cost of
+  N-1 u32 filters, e.g. at 50+ virtual nodes.
+
+Needs root (or CAP_NET_ADMIN), iproute2 and tc; ping and iperf3 are optional.
+
+Usage:
+    testbed = NetnsTestbed(num_nodes=50).setup()
+    runner = LocalNetnsRunner(testbed)
+    switch_delay_profile(runner, delay_matrix, testbed.node_details)
+    print(verify_delays(testbed, runner, delay_matrix, pairs=[('k8s-worker-1', 'k8s-worker-2')]))
+    testbed.teardown()
+'''
+
+import os
+import re
+import time
+import shutil
+import tempfile
+import subprocess
+
+import numpy as np
+
+from iDynamicsPackagesModules.NetworkingDynamicsManager.tc_sync_switch import (
+    build_delay_batch, build_rate_batch, prepare_profile, commit_profile, DEFAULT_STAGE_PATH)
+
+
+def _run_host(args, input_text=None):
+    result = subprocess.run(args, input=input_text, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+class NetnsTestbed:
+    """
+    N network namespaces ("virtual nodes") on one bridge.
+
+    Args:
+        num_nodes: Number of virtual nodes.
+        prefix: Prefix of the namespace, veth and bridge names (kept short: interface names are <= 15 chars).
+        node_name_format: Node names, e.g. 'k8s-worker-{}' -> k8s-worker-1 .. k8s-worker-N.
+        subnet_prefix: First two octets of the node addresses; node i gets <prefix>.<i // 250>.<i % 250 + 1>/16.
+        pod_subnet_prefix: If set, node i also gets the "pod CIDR" <pod_subnet_prefix>.<i + 1>.0/24 (a "pod" address
+            .1 on its lo, routed via the node IP from every other node), to check the prefix filters of pod traffic.
+    """
+    def __init__(self, num_nodes: int, prefix: str = 'idyn', node_name_format: str = 'k8s-worker-{}',
+                 subnet_prefix: str = '10.210', pod_subnet_prefix: str = None):
+        self.num_nodes = num_nodes
+        self.prefix = prefix
+        self.bridge = f"{prefix}br0"
+        self.node_names = [node_name_format.format(i + 1) for i in range(num_nodes)]
+        self.namespaces = {node: f"{prefix}{i + 1}" for i, node in enumerate(self.node_names)}
+        self.ips = {node: f"{subnet_prefix}.{i // 250}.{i % 250 + 1}" for i, node in enumerate(self.node_names)}
+        self.pod_cidrs = {node: f"{pod_subnet_prefix}.{i + 1}.0/24" for i, node in enumerate(self.node_names)} \
+            if pod_subnet_prefix else {}
+        self.pod_ips = {node: cidr.replace('.0/24', '.1') for node, cidr in self.pod_cidrs.items()}
+
+    @property
+    def node_details(self) -> dict:
+        """node_details in the format of the injection scripts (no SSH credentials needed)."""
+        node_details = {node: {'ip': self.ips[node], 'username': None, 'key_path': None} for node in self.node_names}
+        for node, cidr in self.pod_cidrs.items():
+            node_details[node]['pod_cidrs'] = [cidr]
+        return node_details
+
+    def setup(self):
+        """Create the bridge, the namespaces and their veth links (one `ip -batch` for the host side)."""
+        host = [f"link add {self.bridge} type bridge", f"link set {self.bridge} up"]
+        for i, node in enumerate(self.node_names):
+            namespace = self.namespaces[node]
+            host += [
+                f"netns add {namespace}",
+                f"link add {self.prefix}v{i + 1} type veth peer name {self.prefix}p{i + 1}",
+                f"link set {self.prefix}v{i + 1} master {self.bridge}",
+                f"link set {self.prefix}v{i + 1} up",
+                f"link set {self.prefix}p{i + 1} netns {namespace}",
+            ]
+        _run_host(['ip', '-batch', '-'], "\n".join(host) + "\n")
+        for i, node in enumerate(self.node_names):
+            inside = [
+                f"link set {self.prefix}p{i + 1} name eth0",
+                f"addr add {self.ips[node]}/16 dev eth0",
+                "link set eth0 up",
+                "link set lo up",
+            ]
+            if self.pod_cidrs:
+                inside.append(f"addr add {self.pod_ips[node]}/32 dev lo")
+                inside += [f"route add {self.pod_cidrs[other]} via {self.ips[other]}"
+                           for other in self.node_names if other != node]
+            _run_host(['ip', '-n', self.namespaces[node], '-batch', '-'], "\n".join(inside) + "\n")
+        print(f"Network namespace testbed with {self.num_nodes} nodes is up")
+        return self
+
+    def teardown(self):
+        """Delete the namespaces (their veth ends go with them) and the bridge."""
+        for namespace in self.namespaces.values():
+            subprocess.run(['ip', 'netns', 'del', namespace], capture_output=True)
+        subprocess.run(['ip', 'link', 'del', self.bridge], capture_output=True)
+
+    def __enter__(self):
+        return self.setup()
+
+    def __exit__(self, *exc):
+        self.teardown()
+
+
+class LocalNetnsRunner:
+    """
+    Runner for the namespaces of a NetnsTestbed with the interface of tc_sync_switch.SSHNodeRunner.
+
+    All namespaces share one filesystem, so files written with write_file() are kept per node
+    (under a private directory) and their paths are rewritten in the commands of that node; `sudo` is
+    provided as a pass-through shim when running as root without sudo installed.
+    """
+    def __init__(self, testbed: NetnsTestbed):
+        self.testbed = testbed
+        self.work_dir = tempfile.mkdtemp(prefix='idyn_netns_')
+        self._files = {}  # node_name -> {remote_path: local_path}
+        self.env = dict(os.environ)
+        if shutil.which('sudo') is None and os.geteuid() == 0:
+            shim = os.path.join(self.work_dir, 'sudo')
+            with open(shim, 'w') as f:
+                f.write('#!/bin/sh\nexec "$@"\n')
+            os.chmod(shim, 0o755)
+            self.env['PATH'] = f"{self.work_dir}:{self.env.get('PATH', '')}"
+
+    def _localize(self, node_name: str, command: str) -> str:
+        for remote_path, local_path in self._files.get(node_name, {}).items():
+            command = command.replace(remote_path, local_path)
+        return command
+
+    def run(self, node_name: str, command: str):
+        """Run a shell command inside the node's namespace; returns (stdout, stderr)."""
+        result = subprocess.run(['ip', 'netns', 'exec', self.testbed.namespaces[node_name], 'sh', '-c',
+                                 self._localize(node_name, command)],
+                                capture_output=True, text=True, env=self.env)
+        return result.stdout.strip(), result.stderr.strip()
+
+    def popen(self, node_name: str, args: list) -> subprocess.Popen:
+        """Start a background process inside the node's namespace."""
+        return subprocess.Popen(['ip', 'netns', 'exec', self.testbed.namespaces[node_name]] + args,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=self.env)
+
+    def write_file(self, node_name: str, path: str, content: str) -> None:
+        node_dir = os.path.join(self.work_dir, node_name)
+        os.makedirs(node_dir, exist_ok=True)
+        local_path = os.path.join(node_dir, os.path.basename(path))
+        with open(local_path, 'w') as f:
+            f.write(content)
+        self._files.setdefault(node_name, {})[path] = local_path
+
+    def close(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+# RTT without ping: a TCP connect to a closed port is answered by a RST, i.e. after one round trip
+_TCP_RTT_PROBE = (
+    "import socket, sys, time\n"
+    "ip, count = sys.argv[1], int(sys.argv[2])\n"
+    "for _ in range(count):\n"
+    "    s = socket.socket(); s.settimeout(5); t = time.perf_counter()\n"
+    "    try: s.connect((ip, 9))\n"
+    "    except OSError: pass\n"
+    "    print((time.perf_counter() - t) * 1000); s.close(); time.sleep(0.05)\n"
+)
+
+
+def measure_rtt(runner: LocalNetnsRunner, src: str, dst_ip: str, count: int = 5) -> float:
+    """Minimum RTT in ms from node src to dst_ip (ping if installed, TCP connect/RST otherwise)."""
+    if shutil.which('ping'):
+        stdout_output, _ = runner.run(src, f"ping -c {count} -i 0.2 -q {dst_ip}")
+        match = re.search(r'= ([\d.]+)/', stdout_output)  # rtt min/avg/max/mdev = a/b/c/d ms
+        return float(match.group(1)) if match else np.nan
+    stdout_output, _ = runner.popen(src, ['python3', '-c', _TCP_RTT_PROBE, dst_ip, str(count)]).communicate()
+    samples = [float(line) for line in stdout_output.split()]
+    return min(samples) if samples else np.nan
+
+
+_TCP_SINK = (
+    "import socket\n"
+    "s = socket.socket(); s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1); s.bind(('0.0.0.0', 5201)); s.listen(1)\n"
+    "c, _ = s.accept()\n"
+    "while c.recv(1 << 16): pass\n"
+)
+_TCP_SENDER = (
+    "import socket, sys, time\n"
+    "s = socket.create_connection((sys.argv[1], 5201), timeout=10); buf = b'x' * (1 << 16)\n"
+    "end = time.time() + float(sys.argv[2]); start = time.time(); sent = 0\n"
+    "while time.time() < end: sent += s.send(buf)\n"
+    "s.shutdown(socket.SHUT_WR); print(sent * 8 / (time.time() - start) / 1e6)\n"
+)
+
+
+def measure_throughput(runner: LocalNetnsRunner, src: str, dst: str, duration: float = 3, dst_ip: str = None) -> float:
+    """
+    Throughput in Mbit/s from src to dst (iperf3 if installed, a Python TCP sender/sink otherwise);
+    dst_ip defaults to the node IP of dst (pass testbed.pod_ips[dst] to measure pod traffic).
+    """
+    dst_ip = dst_ip or runner.testbed.ips[dst]
+    if shutil.which('iperf3'):
+        server = runner.popen(dst, ['iperf3', '-s', '-1'])
+        try:
+            stdout_output, _ = runner.run(src, f"sleep 0.3; iperf3 -c {dst_ip} -t {duration} -f m")
+        finally:
+            server.wait(timeout=duration + 10)
+        match = re.findall(r'([\d.]+) Mbits/sec\s+(?:\d+\s+)?sender', stdout_output)
+        return float(match[-1]) if match else np.nan
+    sink = runner.popen(dst, ['python3', '-c', _TCP_SINK])
+    try:
+        time.sleep(0.3)
+        stdout_output, _ = runner.popen(src, ['python3', '-c', _TCP_SENDER, dst_ip, str(duration)]).communicate()
+    finally:
+        sink.kill()
+    return float(stdout_output) if stdout_output.strip() else np.nan
+
+
+def _pairs(testbed, pairs):
+    if pairs is not None:
+        return pairs
+    return [(src, dst) for src in testbed.node_names for dst in testbed.node_names if src != dst]
+
+
+def verify_delays(testbed: NetnsTestbed, runner: LocalNetnsRunner, delay_matrix, pairs: list = None,
+                  count: int = 5, tolerance_ms: float = 2.0) -> list:
+    """
+    Check that injected delays show up in the RTT: expected RTT(i, j) = delay[i][j] + delay[j][i].
+
+    Returns:
+        [{'src', 'dst', 'expected_ms', 'measured_ms', 'ok'}] per checked pair.
+    """
+    index = {node: i for i, node in enumerate(testbed.node_names)}
+    rows = []
+    for src, dst in _pairs(testbed, pairs):
+        expected = float(delay_matrix[index[src]][index[dst]]) + float(delay_matrix[index[dst]][index[src]])
+        measured = measure_rtt(runner, src, testbed.ips[dst], count)
+        rows.append({'src': src, 'dst': dst, 'expected_ms': expected, 'measured_ms': measured,
+                     'ok': bool(abs(measured - expected) <= tolerance_ms)})
+    return rows
+
+
+def verify_rates(testbed: NetnsTestbed, runner: LocalNetnsRunner, bandwidth_matrix, pairs: list,
+                 duration: float = 3, tolerance: float = 0.15) -> list:
+    """
+    Check that injected rates show up in the measured throughput (within a relative tolerance).
+
+    Returns:
+        [{'src', 'dst', 'expected_mbit', 'measured_mbit', 'ok'}] per checked pair.
+    """
+    index = {node: i for i, node in enumerate(testbed.node_names)}
+    rows = []
+    for src, dst in pairs:
+        expected = float(bandwidth_matrix[index[src]][index[dst]])
+        measured = measure_throughput(runner, src, dst, duration)
+        rows.append({'src': src, 'dst': dst, 'expected_mbit': expected, 'measured_mbit': measured,
+                     'ok': bool(abs(measured - expected) <= tolerance * expected)})
+    return rows
+
+
+def apply_rate_profile(testbed: NetnsTestbed, runner: LocalNetnsRunner, bandwidth_matrix,
+                       stage_path: str = DEFAULT_STAGE_PATH, lead_time: float = 2.0) -> dict:
+    """Install the bandwidth trees of bandwidth_matrix on all virtual nodes (two-phase, as for delays)."""
+    node_details = testbed.node_details
+    node_batches = {node: build_rate_batch(node, bandwidth_matrix, node_details) for node in node_details}
+    return commit_profile(runner, prepare_profile(runner, node_batches, stage_path), stage_path, lead_time=lead_time)
+
+
+def benchmark_switch(testbed: NetnsTestbed, runner: LocalNetnsRunner, delay_matrix, repeats: int = 3,
+                     stage_path: str = DEFAULT_STAGE_PATH, lead_time: float = 2.0) -> list:
+    """
+    Time the delay profile switch on all virtual nodes. All nodes share the CPUs of one machine, so the
+    lead time must cover starting N commit processes at once (otherwise the spread grows with N).
+
+    Returns:
+        [{'build_s', 'prepare_s', 'commit_s', 'spread_ms', 'tc_batch_ms'}] per repeat, where tc_batch_ms is the
+        longest time a node spent in `tc -batch`.
+    """
+    node_details = testbed.node_details
+    results = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        node_batches = {node: build_delay_batch(node, delay_matrix, node_details) for node in node_details}
+        t1 = time.perf_counter()
+        offsets = prepare_profile(runner, node_batches, stage_path)
+        t2 = time.perf_counter()
+        report = commit_profile(runner, offsets, stage_path, lead_time=lead_time)
+        t3 = time.perf_counter()
+        durations = [(end - start) * 1000 for start, end in report['switch_times'].values()]
+        results.append({'build_s': t1 - t0, 'prepare_s': t2 - t1, 'commit_s': t3 - t2,
+                        'spread_ms': report['spread_ms'], 'tc_batch_ms': max(durations) if durations else None})
+    return results
+
+
+def classification_overhead(testbed: NetnsTestbed, runner: LocalNetnsRunner, src: str = None, dst: str = None,
+                            count: int = 50) -> dict:
+    """
+    RTT between two nodes without any tree and with the full tree of N-1 classes / filters at zero delay:
+    the difference is the per-packet cost of the classification.
+    """
+    src = src or testbed.node_names[0]
+    dst = dst or testbed.node_names[-1]
+    zero = np.zeros((testbed.num_nodes, testbed.num_nodes))
+    for node in (src, dst):
+        runner.run(node, "sudo tc qdisc del dev eth0 root")
+    bare = measure_rtt(runner, src, testbed.ips[dst], count)
+    node_details = testbed.node_details
+    for node in (src, dst):
+        runner.write_file(node, DEFAULT_STAGE_PATH, "\n".join(build_delay_batch(node, zero, node_details)) + "\n")
+        runner.run(node, f"sudo tc -force -batch {DEFAULT_STAGE_PATH}")
+    classified = measure_rtt(runner, src, testbed.ips[dst], count)
+    return {'num_filters': testbed.num_nodes - 1, 'bare_rtt_ms': bare, 'classified_rtt_ms': classified,
+            'overhead_ms': classified - bare}
+
+# Example usage:
+# with NetnsTestbed(num_nodes=9) as testbed:
+#     runner = LocalNetnsRunner(testbed)
+#     delay_matrix = generate_delay_matrix(9, base_latency=5, max_additional_latency=30, seed=1)
+#     switch_delay_profile(runner, delay_matrix, testbed.node_details)
+#     print([row for row in verify_delays(testbed, runner, delay_matrix) if not row['ok']])
+#     print(benchmark_switch(testbed, runner, delay_matrix))
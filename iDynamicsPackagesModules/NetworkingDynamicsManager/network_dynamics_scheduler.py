@@ -0,0 +1,234 @@
+'''Trace-driven network dynamics scheduler.
+
+Replays a timeline of (t, profile) entries against the worker nodes. Every entry is applied with the
+two-phase switch of tc_sync_switch.py (prepare ahead of time, commit at the target timestamp), and
+all deadlines are computed from one monotonic start time, so the schedule does not drift the way a
+`while` loop with `time.sleep(interval)` does. The actual apply time of every entry is logged.
+
+A timeline can be
+(1) a JSON file: a list of entries, e.g.
+    [{"t": 0,   "base_latency": 0, "max_additional_latency": 0},
+     {"t": 300, "base_latency": 5, "max_additional_latency": 30, "seed": 7},
+     {"t": 600, "matrix_csv": "delay_matrix_directed.csv"}]
+(2) a CSV file with the columns `t,matrix_csv`
+(3) generated by generate_stochastic_timeline() (Poisson change times, random profiles, seeded).
+'''
+
+import os
+import csv
+import json
+import time
+import random
+import logging
+import threading
+
+from iDynamicsPackagesModules.NetworkingDynamicsManager.tc_sync_switch import (
+    build_delay_batch, prepare_profile, commit_profile, DEFAULT_STAGE_PATH)
+from iDynamicsPackagesModules.NetworkingDynamicsManager.network_matrix_generator import (
+    generate_delay_matrix, tiered_delay_matrix, clustered_delay_matrix)
+
+
+def load_timeline(file_path: str) -> list:
+    """
+    Load a timeline file (.json or .csv) and return its entries sorted by t (seconds from start).
+    """
+    if file_path.endswith('.json'):
+        with open(file_path, 'r') as f:
+            entries = json.load(f)
+    else:
+        with open(file_path, 'r', newline='') as f:
+            entries = [{'t': float(row['t']), 'matrix_csv': row['matrix_csv']} for row in csv.DictReader(f)]
+    # relative matrix paths are relative to the timeline file
+    base_dir = os.path.dirname(os.path.abspath(file_path))
+    for entry in entries:
+        entry['t'] = float(entry['t'])
+        if 'matrix_csv' in entry and not os.path.isabs(entry['matrix_csv']):
+            entry['matrix_csv'] = os.path.join(base_dir, entry['matrix_csv'])
+    return sorted(entries, key=lambda entry: entry['t'])
+
+
+def generate_stochastic_timeline(duration: float, mean_interval: float, profiles: list, seed: int = None,
+                                 min_interval: float = 0.0) -> list:
+    """
+    Generate a timeline whose change times follow a Poisson process (exponential holding times
+    with mean `mean_interval` seconds) and whose profile is drawn at random from `profiles`
+    at every change. Each generated entry gets its own seed, so the whole timeline is reproducible.
+
+    Args:
+        duration: Length of the timeline in seconds.
+        mean_interval: Mean time between two profile changes in seconds.
+        profiles: List of profile dicts, e.g. [{"base_latency": 5, "max_additional_latency": 10}, ...].
+        seed: Seed of the timeline.
+        min_interval: Lower bound on the holding time, so that changes are never closer than
+            the time needed to stage and commit a profile.
+
+    Returns:
+        A list of timeline entries.
+    """
+    rng = random.Random(seed)
+    entries = []
+    t = 0.0
+    while t < duration:
+        entry = dict(rng.choice(profiles))
+        entry['t'] = round(t, 3)
+        entry.setdefault('seed', rng.randrange(2**32))
+        entries.append(entry)
+        t += max(min_interval, rng.expovariate(1.0 / mean_interval))
+    return entries
+
+
+def resolve_delay_matrix(entry: dict, num_nodes: int):
+    """
+    Turn a timeline entry into an N x N delay matrix (milliseconds).
+
+    An entry either points to a matrix file ("matrix_csv") or names a model of
+    network_matrix_generator.py ("model": "distance" (default), "tiered" or "clustered")
+    with its parameters and seed, e.g.
+        {"t": 0, "base_latency": 5, "max_additional_latency": 30, "seed": 7}
+        {"t": 0, "model": "tiered", "tiers": ["cloud", "cloud", "edge", "edge", "edge"], "seed": 7}
+        {"t": 0, "model": "clustered", "num_regions": 3, "congestion": "pareto", "seed": 7}
+    """
+    if 'matrix_csv' in entry:
+        with open(entry['matrix_csv'], 'r', newline='') as f:
+            return [[float(value) for value in row] for row in csv.reader(f) if row]
+
+    model = entry.get('model', 'distance')
+    seed = entry.get('seed')
+    if model == 'distance':
+        return generate_delay_matrix(num_nodes, entry.get('base_latency', 0), entry.get('max_additional_latency', 0),
+                                     seed=seed, symmetric=entry.get('symmetric', False),
+                                     congestion=entry.get('congestion', 'uniform'))
+    if model == 'tiered':
+        return tiered_delay_matrix(entry['tiers'], seed=seed, symmetric=entry.get('symmetric', False),
+                                   congestion=entry.get('congestion')).round(1)
+    if model == 'clustered':
+        matrix, _ = clustered_delay_matrix(num_nodes, entry['num_regions'], seed=seed,
+                                           symmetric=entry.get('symmetric', False), congestion=entry.get('congestion'))
+        return matrix.round(1)
+    raise ValueError(f"Unknown delay model in timeline entry: {model}")
+
+
+def _describe(entry: dict) -> str:
+    return json.dumps({key: value for key, value in entry.items() if key != 't'}, sort_keys=True)
+
+
+class NetworkDynamicsScheduler:
+    """
+    Replays a timeline on the nodes of node_details through a runner (e.g. tc_sync_switch.SSHNodeRunner).
+
+    Args:
+        runner: Object with run() and write_file() for every node in node_details.
+        node_details: {node_name: {'ip': ..., ...}}; its order defines the matrix indices.
+        log_path: CSV file where the actual apply time of every entry is appended.
+        interface: Network interface the tc tree is installed on.
+        prepare_ahead: Seconds before an entry's time at which its trees are staged on the nodes.
+        matrix_dir: If set, every applied matrix is saved there as delay_matrix_<index>.csv.
+        exporter: Optional network_matrix_exporter.NetworkMatrixExporter; every applied matrix is published
+            as idynamics_injected_delay_ms.
+
+    An entry some node fails to prepare is not committed on any node (the old profile stays everywhere);
+    its row lists the failed nodes in failed_nodes and has no switch times.
+    """
+    LOG_FIELDS = ['index', 'scheduled_t', 'target_time', 'first_switch', 'last_switch',
+                  'spread_ms', 'lateness_ms', 'failed_nodes', 'profile']
+
+    def __init__(self, runner, node_details: dict, log_path: str, interface: str = 'eth0',
+                 prepare_ahead: float = 2.0, matrix_dir: str = None, stage_path: str = DEFAULT_STAGE_PATH,
+                 exporter=None):
+        self.runner = runner
+        self.node_details = node_details
+        self.log_path = log_path
+        self.interface = interface
+        self.prepare_ahead = prepare_ahead
+        self.matrix_dir = matrix_dir
+        self.stage_path = stage_path
+        self.exporter = exporter
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Stop the replay before the next entry."""
+        self._stop_event.set()
+
+    def _wait_until(self, deadline_monotonic: float) -> bool:
+        # Event.wait() returns True when stop() was called during the wait
+        remaining = deadline_monotonic - time.monotonic()
+        if remaining > 0:
+            return not self._stop_event.wait(remaining)
+        return not self._stop_event.is_set()
+
+    def _log(self, row: dict):
+        new_file = not os.path.exists(self.log_path)
+        with open(self.log_path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.LOG_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def run(self, entries: list, start_delay: float = None) -> list:
+        """
+        Replay the entries. All deadlines are absolute offsets from one start time, so a late entry
+        does not shift the following ones.
+
+        Args:
+            entries: Timeline entries sorted by t.
+            start_delay: Seconds until t=0; defaults to prepare_ahead, so the first entry can be staged.
+
+        Returns:
+            The list of logged rows.
+        """
+        if start_delay is None:
+            start_delay = self.prepare_ahead
+        num_nodes = len(self.node_details)
+        start_monotonic = time.monotonic() + start_delay
+        start_wall = time.time() + start_delay
+        rows = []
+
+        for index, entry in enumerate(entries):
+            if not self._wait_until(start_monotonic + entry['t'] - self.prepare_ahead):
+                break
+
+            # Phase 1: stage the new trees while the current profile is still active
+            delay_matrix = resolve_delay_matrix(entry, num_nodes)
+            node_batches = {node_name: build_delay_batch(node_name, delay_matrix, self.node_details, self.interface)
+                            for node_name in self.node_details}
+            clock_offsets = prepare_profile(self.runner, node_batches, self.stage_path)
+            if self.matrix_dir:
+                with open(os.path.join(self.matrix_dir, f"delay_matrix_{index}.csv"), 'w', newline='') as f:
+                    csv.writer(f).writerows(delay_matrix)
+
+            # Phase 2: flip all nodes at the entry's target time
+            target_time = start_wall + entry['t']
+            if target_time < time.time():
+                logging.warning(f"Timeline entry {index} (t={entry['t']}s) prepared too late, committing immediately")
+                target_time = None
+            report = commit_profile(self.runner, clock_offsets, self.stage_path, target_time=target_time, lead_time=0.2)
+
+            if not report['committed']:
+                logging.warning(f"Timeline entry {index} skipped: {report['prepare_failed']} failed to prepare")
+            starts = [start for start, _ in report['switch_times'].values()]
+            if self.exporter is not None and starts:
+                self.exporter.update_injected_delay(list(self.node_details.keys()), delay_matrix)
+            row = {
+                'index': index,
+                'scheduled_t': entry['t'],
+                'target_time': f"{report['target_time']:.6f}",
+                'first_switch': f"{min(starts):.6f}" if starts else '',
+                'last_switch': f"{max(starts):.6f}" if starts else '',
+                'spread_ms': f"{report['spread_ms']:.3f}" if starts else '',
+                'lateness_ms': f"{(max(starts) - (start_wall + entry['t'])) * 1000:.3f}" if starts else '',
+                'failed_nodes': ' '.join(report['failed']),
+                'profile': _describe(entry),
+            }
+            self._log(row)
+            rows.append(row)
+            logging.info(f"Applied timeline entry {index} at t={entry['t']}s: spread {row['spread_ms']} ms, lateness {row['lateness_ms']} ms")
+        return rows
+
+# Example usage:
+# runner = SSHNodeRunner(node_details)
+# scheduler = NetworkDynamicsScheduler(runner, node_details, log_path='network_timeline_applied.csv')
+# scheduler.run(load_timeline('timeline.json'))
+# or, with a generated timeline:
+# scheduler.run(generate_stochastic_timeline(duration=40*60, mean_interval=300,
+#                                            profiles=[{'base_latency': 5, 'max_additional_latency': 10},
+#                                                      {'base_latency': 5, 'max_additional_latency': 30}], seed=1))
@@ -0,0 +1,138 @@
+'''Prometheus exporter for the injected and measured network matrices.
+
+Publishes, labeled by src_node and dst_node:
+    idynamics_injected_delay_ms       delay injected by the emulator (tc netem)
+    idynamics_injected_rate_mbit      rate limit injected by the emulator (tc htb)
+    idynamics_measured_latency_ms     latest measured latency
+    idynamics_measured_bandwidth_mbit latest measured bandwidth
+plus idynamics_network_matrix_updated_seconds{matrix=...}, the Unix time of each matrix's last change.
+
+Once Prometheus scrapes the exporter, network state can be correlated in time with the SLO metrics and
+queried with PromQL, instead of being spread over CSVs and text dicts.
+
+The exposition text is pre-rendered: a scrape only writes one bytes buffer, and a family is re-rendered
+only when its matrix actually changed.
+'''
+
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+GAUGES = {
+    'injected_delay': ('idynamics_injected_delay_ms', 'Delay injected between two nodes by the emulator (ms).'),
+    'injected_rate': ('idynamics_injected_rate_mbit', 'Rate limit injected between two nodes by the emulator (Mbit/s).'),
+    'measured_latency': ('idynamics_measured_latency_ms', 'Latest measured latency between two nodes (ms).'),
+    'measured_bandwidth': ('idynamics_measured_bandwidth_mbit', 'Latest measured bandwidth between two nodes (Mbit/s).'),
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _render_family(metric_name: str, help_text: str, node_names: list, values: np.ndarray) -> bytes:
+    lines = [f"# HELP {metric_name} {help_text}", f"# TYPE {metric_name} gauge"]
+    rows, cols = np.nonzero(~np.isnan(values) & ~np.eye(len(node_names), dtype=bool))
+    for i, j in zip(rows, cols):
+        lines.append(f'{metric_name}{{src_node="{node_names[i]}",dst_node="{node_names[j]}"}} {values[i, j]:g}')
+    return ("\n".join(lines) + "\n").encode()
+
+
+class NetworkMatrixExporter:
+    """
+    Holds the latest matrix of every gauge family and serves them on http://<host>:<port>/metrics.
+
+    Args:
+        port: Port of the exporter.
+        host: Address to bind.
+    """
+    def __init__(self, port: int = 9105, host: str = '0.0.0.0'):
+        self.port = port
+        self.host = host
+        self._matrices = {}      # family -> (node_names, values)
+        self._families = {}      # family -> rendered bytes
+        self._updated = {}       # family -> Unix time of the last change
+        self._buffer = b''
+        self._lock = threading.Lock()
+        self._server = None
+
+    def update(self, family: str, node_names: list, matrix) -> bool:
+        """
+        Set the matrix of a gauge family ('injected_delay', 'injected_rate', 'measured_latency',
+        'measured_bandwidth'); values are in the family's unit, NaN for missing entries.
+
+        Returns:
+            True if the matrix changed (and the exposition buffer was re-rendered).
+        """
+        metric_name, help_text = GAUGES[family]
+        node_names = list(node_names)
+        values = np.asarray(matrix, dtype=np.float64)
+        # compare, render and store under one lock: two concurrent updates of a family must not both pass the
+        # check against the same previous matrix and then store in the wrong order
+        with self._lock:
+            previous = self._matrices.get(family)
+            if previous is not None and previous[0] == node_names and np.array_equal(previous[1], values, equal_nan=True):
+                return False
+            self._matrices[family] = (node_names, values.copy())
+            self._families[family] = _render_family(metric_name, help_text, node_names, values)
+            self._updated[family] = time.time()
+            self._rebuild()
+        return True
+
+    def update_injected_delay(self, node_names: list, delay_matrix) -> bool:
+        return self.update('injected_delay', node_names, delay_matrix)
+
+    def update_injected_rate(self, node_names: list, bandwidth_matrix) -> bool:
+        return self.update('injected_rate', node_names, bandwidth_matrix)
+
+    def update_measured(self, network_matrix) -> bool:
+        """Publish a network_matrix_store.NetworkMatrix (latency or bandwidth)."""
+        family = 'measured_latency' if network_matrix.kind == 'latency' else 'measured_bandwidth'
+        return self.update(family, network_matrix.node_names, network_matrix.values)
+
+    def _rebuild(self):
+        updated = ['# HELP idynamics_network_matrix_updated_seconds Unix time of the last change of each matrix.',
+                   '# TYPE idynamics_network_matrix_updated_seconds gauge']
+        updated += [f'idynamics_network_matrix_updated_seconds{{matrix="{family}"}} {timestamp:.3f}'
+                    for family, timestamp in sorted(self._updated.items())]
+        self._buffer = b''.join(self._families[family] for family in GAUGES if family in self._families) \
+            + ("\n".join(updated) + "\n").encode()
+
+    def render(self) -> bytes:
+        """The current exposition buffer."""
+        return self._buffer
+
+    def start(self):
+        """Serve /metrics in a background thread."""
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.render()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Network matrix exporter serving on port {self.port}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# Example usage:
+# exporter = NetworkMatrixExporter(port=9105).start()
+# exporter.update_injected_delay(list(node_details.keys()), delay_matrix)
+# exporter.update_measured(NetworkMatrix.from_nested_dict(measure_http_latency(namespace='measure-nodes'), 'latency'))
+# PromQL: idynamics_measured_latency_ms - on(src_node, dst_node) idynamics_injected_delay_ms
@@ -0,0 +1,229 @@
+'''Seeded, vectorized generators of cross-node delay and bandwidth matrices.
+
+Shared by the emulator scripts (iDelay / iBandwidth), the network dynamics scheduler and the evaluation
+workloads, so that every script draws its matrices from the same models. All generators take an
+explicit `seed` (same seed -> same matrix) and are NumPy-vectorized (1,000-node matrices in milliseconds).
+
+Delay models (milliseconds, diagonal is always 0):
+- generate_delay_matrix():   the original "|i-j|/N distance x uniform congestion" model
+- geo_delay_matrix():        great-circle distance between node coordinates at the speed of light in fiber
+- tiered_delay_matrix():     cloud / edge (or any) tiers with a latency range per tier pair
+- clustered_delay_matrix():  nodes grouped in regions, low intra-region and high inter-region latency
+Every delay model can be combined with a congestion model ('uniform', 'lognormal' or 'pareto'),
+and returns a directed matrix unless symmetric=True.
+
+Bandwidth models (Mbit/s, diagonal is always 0):
+- generate_bandwidth_matrix(): uniform random bandwidths (the original model)
+- tiered_bandwidth_matrix():   a bandwidth range per tier pair
+'''
+
+import numpy as np
+
+FIBER_KM_PER_MS = 200.0  # light travels ~200 km per millisecond in optical fiber (~2/3 c)
+EARTH_RADIUS_KM = 6371.0
+
+
+def _rng(seed):
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def _symmetrize(matrix):
+    # keep the upper triangle and mirror it, so that matrix[i][j] == matrix[j][i]
+    upper = np.triu(matrix, 1)
+    return upper + upper.T
+
+
+def _finish(matrix, symmetric):
+    if symmetric:
+        matrix = _symmetrize(matrix)
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+def congestion_factors(shape, rng, model='uniform', low=0.5, high=1.5, sigma=0.5, alpha=2.5):
+    """
+    Multiplicative congestion factors.
+
+    Args:
+        shape: Shape of the factor array.
+        rng: numpy Generator.
+        model: 'uniform' -> U(low, high) (the original model);
+               'lognormal' -> lognormal with median 1 and shape sigma (moderate tail);
+               'pareto' -> 1 + Pareto(alpha) (heavy tail, a few links get much slower).
+    """
+    if model == 'uniform':
+        return rng.uniform(low, high, size=shape)
+    if model == 'lognormal':
+        return rng.lognormal(mean=0.0, sigma=sigma, size=shape)
+    if model == 'pareto':
+        return 1.0 + rng.pareto(alpha, size=shape)
+    if model is None or model == 'none':
+        return np.ones(shape)
+    raise ValueError(f"Unknown congestion model: {model}")
+
+
+def generate_delay_matrix(num_nodes, base_latency=5, max_additional_latency=50, seed=None,
+                          symmetric=False, congestion='uniform', as_int=True):
+    """
+    The original delay model of the injection scripts, vectorized and seeded:
+        delay[i][j] = (base_latency + U(0, max_additional_latency) * |i - j| / N) * congestion
+
+    Args:
+        num_nodes: N.
+        base_latency: Base latency in ms.
+        max_additional_latency: Maximum additional latency in ms (scaled by the index distance).
+        seed: Seed (or numpy Generator).
+        symmetric: Return a symmetric matrix instead of a directed one.
+        congestion: Congestion model, see congestion_factors().
+        as_int: Truncate to integer milliseconds, as the original generator did.
+
+    Returns:
+        An N x N numpy array.
+    """
+    rng = _rng(seed)
+    index = np.arange(num_nodes)
+    distance_factor = np.abs(index[:, None] - index[None, :]) / num_nodes
+    additional_latency = rng.uniform(0, max_additional_latency, size=(num_nodes, num_nodes))
+    matrix = (base_latency + additional_latency * distance_factor) * congestion_factors((num_nodes, num_nodes), rng, congestion)
+    matrix = _finish(matrix, symmetric)
+    return matrix.astype(int) if as_int else matrix
+
+
+def random_coordinates(num_nodes, seed=None, lat_range=(-40.0, 60.0), lon_range=(-120.0, 150.0)):
+    """Random (latitude, longitude) pairs in degrees, e.g. for geo_delay_matrix()."""
+    rng = _rng(seed)
+    return np.column_stack([rng.uniform(*lat_range, size=num_nodes), rng.uniform(*lon_range, size=num_nodes)])
+
+
+def geo_delay_matrix(coordinates, base_latency=0.5, route_factor=1.5, seed=None,
+                     symmetric=False, congestion='lognormal', **congestion_params):
+    """
+    Propagation delay from node coordinates: great-circle distance / speed of light in fiber,
+    stretched by route_factor (fiber paths are longer than great circles), plus a base latency.
+
+    Args:
+        coordinates: N x 2 array of (latitude, longitude) in degrees.
+        base_latency: Per-link latency in ms (switching, last mile, etc.).
+        route_factor: Fiber route length / great-circle distance.
+        seed: Seed (or numpy Generator) of the congestion factors.
+        symmetric: Return a symmetric matrix instead of a directed one.
+        congestion: Congestion model, see congestion_factors().
+
+    Returns:
+        An N x N float array (ms).
+    """
+    rng = _rng(seed)
+    lat, lon = np.radians(np.asarray(coordinates, dtype=float)).T
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    # haversine
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    propagation = distance_km * route_factor / FIBER_KM_PER_MS
+    num_nodes = len(lat)
+    matrix = (base_latency + propagation) * congestion_factors((num_nodes, num_nodes), rng, congestion, **congestion_params)
+    return _finish(matrix, symmetric)
+
+
+# Default cloud-edge latency ranges (ms) per tier pair
+DEFAULT_TIER_LATENCY = {
+    ('cloud', 'cloud'): (1, 5),
+    ('cloud', 'edge'): (20, 60),
+    ('edge', 'edge'): (5, 30),
+}
+
+
+def _tier_pair_ranges(tiers, tier_ranges):
+    tiers = np.asarray(tiers)
+    names = sorted(set(tiers.tolist()))
+    codes = np.searchsorted(names, tiers)
+    low_table = np.zeros((len(names), len(names)))
+    high_table = np.zeros((len(names), len(names)))
+    for a, name_a in enumerate(names):
+        for b, name_b in enumerate(names):
+            low, high = tier_ranges.get((name_a, name_b), tier_ranges.get((name_b, name_a), (None, None)))
+            if low is None:
+                raise ValueError(f"No range defined for tier pair ({name_a}, {name_b})")
+            low_table[a, b], high_table[a, b] = low, high
+    return low_table[codes[:, None], codes[None, :]], high_table[codes[:, None], codes[None, :]]
+
+
+def tiered_delay_matrix(tiers, tier_latency=None, seed=None, symmetric=False, congestion=None, **congestion_params):
+    """
+    Delay drawn uniformly from a range that depends on the tiers of the two nodes.
+
+    Args:
+        tiers: Tier name per node, e.g. ['cloud', 'cloud', 'edge', 'edge', 'edge'].
+        tier_latency: {(tier_a, tier_b): (low_ms, high_ms)}; defaults to DEFAULT_TIER_LATENCY.
+            A pair only needs to be given in one order.
+        seed: Seed (or numpy Generator).
+        symmetric: Return a symmetric matrix instead of a directed one.
+        congestion: Optional congestion model on top, see congestion_factors().
+
+    Returns:
+        An N x N float array (ms).
+    """
+    rng = _rng(seed)
+    low, high = _tier_pair_ranges(tiers, tier_latency or DEFAULT_TIER_LATENCY)
+    matrix = rng.uniform(low, high)
+    if congestion:
+        matrix = matrix * congestion_factors(matrix.shape, rng, congestion, **congestion_params)
+    return _finish(matrix, symmetric)
+
+
+def clustered_delay_matrix(num_nodes, num_regions, intra_region=(0.5, 5), inter_region=(20, 80), seed=None,
+                           symmetric=False, congestion=None, **congestion_params):
+    """
+    Nodes are assigned round-robin to regions; every pair of regions gets one inter-region latency
+    (so all links between two regions are alike) and links inside a region are fast.
+
+    Returns:
+        (matrix, regions): an N x N float array (ms) and the region index of every node.
+    """
+    rng = _rng(seed)
+    regions = np.arange(num_nodes) % num_regions
+    region_latency = rng.uniform(*inter_region, size=(num_regions, num_regions))
+    region_latency = _symmetrize(region_latency)
+    matrix = region_latency[regions[:, None], regions[None, :]]
+    same_region = regions[:, None] == regions[None, :]
+    matrix = np.where(same_region, rng.uniform(*intra_region, size=(num_nodes, num_nodes)), matrix)
+    if congestion:
+        matrix = matrix * congestion_factors(matrix.shape, rng, congestion, **congestion_params)
+    return _finish(matrix, symmetric), regions
+
+
+def generate_bandwidth_matrix(num_nodes, min_bandwidth=200, max_bandwidth=600, seed=None, symmetric=False):
+    """
+    Uniform random integer bandwidths in [min_bandwidth, max_bandwidth] Mbit/s (the original model).
+    """
+    rng = _rng(seed)
+    matrix = rng.integers(min_bandwidth, max_bandwidth, size=(num_nodes, num_nodes), endpoint=True)
+    return _finish(matrix, symmetric)
+
+
+DEFAULT_TIER_BANDWIDTH = {
+    ('cloud', 'cloud'): (800, 1000),
+    ('cloud', 'edge'): (50, 200),
+    ('edge', 'edge'): (100, 400),
+}
+
+
+def tiered_bandwidth_matrix(tiers, tier_bandwidth=None, seed=None, symmetric=False):
+    """
+    Bandwidth (Mbit/s) drawn uniformly from a range that depends on the tiers of the two nodes.
+    """
+    rng = _rng(seed)
+    low, high = _tier_pair_ranges(tiers, tier_bandwidth or DEFAULT_TIER_BANDWIDTH)
+    return _finish(np.floor(rng.uniform(low, high)), symmetric)
+
+
+def bidirectional_delay_sums(delay_matrix):
+    """delay[i][j] + delay[j][i]: the round-trip delay injected between every node pair."""
+    delay_matrix = np.asarray(delay_matrix)
+    return delay_matrix + delay_matrix.T
+
+# Example usage:
+# delay_matrix = generate_delay_matrix(num_nodes=9, base_latency=5, max_additional_latency=50, seed=42)
+# delay_matrix = tiered_delay_matrix(['cloud'] * 3 + ['edge'] * 6, seed=42, symmetric=True)
+# delay_matrix = geo_delay_matrix(random_coordinates(1000, seed=1), seed=1, congestion='pareto')
+# bandwidth_matrix = generate_bandwidth_matrix(num_nodes=9, min_bandwidth=200, max_bandwidth=800, seed=42)
@@ -0,0 +1,235 @@
+'''Typed, timestamped store of measured network matrices.
+
+The measurement functions return nested dicts of mixed values, e.g.
+    {'k8s-worker-3': {'k8s-worker-1': '1.22 Gbits/sec', 'k8s-worker-8': '359 Mbits/sec', ...}, ...}
+    {'k8s-worker-3': {'k8s-worker-3': None, 'k8s-worker-9': 3.647, ...}, ...}
+with None / "Error" / "Server Busy Error" for missing values. Here such a result becomes a NetworkMatrix:
+a float64 N x N array in canonical units (latency in ms, bandwidth in Mbit/s) with NaN for missing
+values, a node name <-> index map and a timestamp.
+
+NetworkMatrixStore keeps the history of one kind of matrix in a directory:
+    <kind>.nodes.json   node names (the matrix index order) and unit
+    <kind>.bin          append-only float64 records [timestamp, N*N values], one per snapshot
+The .bin file is opened with np.memmap, so reading the latest (or any) snapshot is O(1) and does not
+parse or load the rest of the history.
+'''
+
+import os
+import re
+import ast
+import json
+import time
+
+import numpy as np
+
+CANONICAL_UNITS = {'latency': 'ms', 'bandwidth': 'Mbit/s'}
+
+# factor to the canonical unit of each kind
+LATENCY_UNITS = {'us': 1e-3, 'ms': 1.0, 's': 1e3}
+BANDWIDTH_UNITS = {'': 1e-6, 'k': 1e-3, 'm': 1.0, 'g': 1e3, 't': 1e6}  # prefix of bits/sec (iperf3 style)
+
+_QUANTITY = re.compile(r'^\s*([-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*([A-Za-z/]*)\s*$')
+
+
+def parse_quantity(value, kind: str) -> float:
+    """
+    Convert one measured value to the canonical unit of `kind` ('latency' -> ms, 'bandwidth' -> Mbit/s).
+
+    Numbers are taken as already canonical; strings may carry a unit, e.g. "359 Mbits/sec",
+    "1.22 Gbits/sec", "850 Kbits/sec", "3.6 ms", "0.004 s". None and error strings give NaN.
+    """
+    if value is None:
+        return np.nan
+    if isinstance(value, dict):  # return_stats=True results of measure_http_latency()
+        return parse_quantity(value.get('value'), kind)
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    match = _QUANTITY.match(str(value))
+    if not match:
+        return np.nan  # "Error", "Parsing Error", "Server Busy Error", ...
+    number, unit = float(match.group(1)), match.group(2).lower()
+    if not unit:
+        return number
+    if kind == 'latency':
+        factor = LATENCY_UNITS.get(unit)
+    else:
+        # "Mbits/sec", "Mbit/s", "Mbps", "Mbits" -> prefix "m"
+        prefix = re.sub(r'(bits?(/sec|/s)?|bps)$', '', unit)
+        factor = BANDWIDTH_UNITS.get(prefix)
+    if factor is None:
+        raise ValueError(f"Unknown {kind} unit in {value!r}")
+    return number * factor
+
+
+class NetworkMatrix:
+    """
+    One measured matrix: values[i][j] is the latency / bandwidth from node_names[i] to node_names[j].
+
+    Args:
+        node_names: Node names in matrix index order.
+        values: N x N array in the canonical unit of `kind`; NaN = not measured / failed.
+        kind: 'latency' or 'bandwidth'.
+        timestamp: Unix time of the measurement.
+    """
+    def __init__(self, node_names: list, values, kind: str, timestamp: float = None):
+        if kind not in CANONICAL_UNITS:
+            raise ValueError(f"Unknown matrix kind: {kind}")
+        self.node_names = list(node_names)
+        self.index = {node_name: i for i, node_name in enumerate(self.node_names)}
+        self.values = np.asarray(values, dtype=np.float64)
+        self.kind = kind
+        self.unit = CANONICAL_UNITS[kind]
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @property
+    def mask(self) -> np.ndarray:
+        """True where a value was measured."""
+        return ~np.isnan(self.values)
+
+    @classmethod
+    def from_nested_dict(cls, results: dict, kind: str, timestamp: float = None, node_names: list = None):
+        """
+        Build a matrix from the output of measure_http_latency() / measure_bandwidth() (or their saved files).
+        Node order is node_names if given, else the sorted union of all source and destination nodes.
+        """
+        if node_names is None:
+            names = set(results)
+            for row in results.values():
+                names.update(row)
+            node_names = sorted(names)
+        index = {node_name: i for i, node_name in enumerate(node_names)}
+        values = np.full((len(node_names), len(node_names)), np.nan)
+        for src, row in results.items():
+            if src not in index:
+                continue
+            for dst, value in row.items():
+                if dst in index and dst != src:
+                    values[index[src], index[dst]] = parse_quantity(value, kind)
+        return cls(node_names, values, kind, timestamp)
+
+    @classmethod
+    def from_text_file(cls, file_path: str, kind: str, node_names: list = None):
+        """Parse a legacy latency_dict.txt / bandwidth_dict.txt once (the timestamp is the file's mtime)."""
+        with open(file_path, 'r') as f:
+            results = ast.literal_eval(f.read())
+        return cls.from_nested_dict(results, kind, timestamp=os.path.getmtime(file_path), node_names=node_names)
+
+    def get(self, src: str, dst: str) -> float:
+        return self.values[self.index[src], self.index[dst]]
+
+    def row(self, src: str) -> dict:
+        """{dst: value} of the measured values from src to the other nodes (the NodeInfo format)."""
+        if src not in self.index:
+            return {}
+        row = self.values[self.index[src]]
+        return {dst: float(row[j]) for j, dst in enumerate(self.node_names) if dst != src and not np.isnan(row[j])}
+
+    def to_nested_dict(self) -> dict:
+        return {src: self.row(src) for src in self.node_names}
+
+    def reindex(self, node_names: list):
+        """The same matrix in another node order (nodes missing here become NaN rows/columns)."""
+        positions = np.array([self.index.get(node_name, -1) for node_name in node_names])
+        known = positions >= 0
+        values = np.full((len(node_names), len(node_names)), np.nan)
+        values[np.ix_(known, known)] = self.values[np.ix_(positions[known], positions[known])]
+        return NetworkMatrix(node_names, values, self.kind, self.timestamp)
+
+
+class NetworkMatrixStore:
+    """
+    Append-only history of one kind of matrix for a fixed node set.
+
+    Args:
+        directory: Directory of the store (created if needed).
+        kind: 'latency' or 'bandwidth'.
+    """
+    def __init__(self, directory: str, kind: str):
+        self.directory = directory
+        self.kind = kind
+        self.header_path = os.path.join(directory, f"{kind}.nodes.json")
+        self.data_path = os.path.join(directory, f"{kind}.bin")
+        self.node_names = None
+        if os.path.exists(self.header_path):
+            with open(self.header_path, 'r') as f:
+                self.node_names = json.load(f)['node_names']
+
+    @property
+    def _record_size(self) -> int:
+        return 1 + len(self.node_names) ** 2
+
+    def append(self, matrix: NetworkMatrix) -> None:
+        """Append a snapshot; the first one fixes the node set, later ones are reindexed to it."""
+        if matrix.kind != self.kind:
+            raise ValueError(f"Cannot store a {matrix.kind} matrix in a {self.kind} store")
+        if self.node_names is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.node_names = list(matrix.node_names)
+            with open(self.header_path, 'w') as f:
+                json.dump({'node_names': self.node_names, 'unit': CANONICAL_UNITS[self.kind]}, f)
+        elif matrix.node_names != self.node_names:
+            if set(matrix.node_names) - set(self.node_names):
+                raise ValueError(f"New nodes {sorted(set(matrix.node_names) - set(self.node_names))} "
+                                 f"are not in the store's node set; start a new store directory")
+            matrix = matrix.reindex(self.node_names)
+        record = np.concatenate(([matrix.timestamp], matrix.values.ravel()))
+        with open(self.data_path, 'ab') as f:
+            f.write(record.astype(np.float64).tobytes())
+
+    def history(self) -> tuple:
+        """
+        Returns:
+            (timestamps, values): a (T,) array and a read-only (T, N, N) memmap of all snapshots.
+        """
+        if self.node_names is None or not os.path.exists(self.data_path):
+            return np.empty(0), np.empty((0, 0, 0))
+        record_size = self._record_size
+        count = os.path.getsize(self.data_path) // (8 * record_size)  # ignores a partially written last record
+        if count == 0:
+            return np.empty(0), np.empty((0, len(self.node_names), len(self.node_names)))
+        records = np.memmap(self.data_path, dtype=np.float64, mode='r', shape=(count, record_size))
+        num_nodes = len(self.node_names)
+        return records[:, 0], records[:, 1:].reshape(count, num_nodes, num_nodes)
+
+    def __len__(self) -> int:
+        return len(self.history()[0])
+
+    def snapshot(self, position: int = -1) -> NetworkMatrix:
+        """The snapshot at `position` (default: the latest one), or None if the store is empty."""
+        timestamps, values = self.history()
+        if len(timestamps) == 0:
+            return None
+        return NetworkMatrix(self.node_names, np.array(values[position]), self.kind, float(timestamps[position]))
+
+    def at(self, timestamp: float) -> NetworkMatrix:
+        """The latest snapshot taken at or before `timestamp`."""
+        timestamps, _ = self.history()
+        position = int(np.searchsorted(timestamps, timestamp, side='right')) - 1
+        return self.snapshot(position) if position >= 0 else None
+
+
+def load_network_matrix(path: str, kind: str) -> NetworkMatrix:
+    """
+    Load the latest matrix of `kind` from either a store directory or a legacy *_dict.txt file.
+
+    A store without snapshots yet gives an all-NaN matrix (timestamp NaN) over its nodes, so row() returns {}
+    like for a node that was never measured.
+    """
+    if os.path.isdir(path):
+        store = NetworkMatrixStore(path, kind)
+        matrix = store.snapshot()
+        if matrix is None:
+            print(f"No {kind} snapshot in {path} yet, using an empty matrix")
+            node_names = store.node_names or []
+            num_nodes = len(node_names)
+            matrix = NetworkMatrix(node_names, np.full((num_nodes, num_nodes), np.nan), kind, timestamp=np.nan)
+        return matrix
+    return NetworkMatrix.from_text_file(path, kind)
+
+# Example usage:
+# latency_matrix = NetworkMatrix.from_nested_dict(measure_http_latency(namespace='measure-nodes'), 'latency')
+# bandwidth_matrix = NetworkMatrix.from_nested_dict(measure_bandwidth(namespace='measure-nodes-bd'), 'bandwidth')
+# NetworkMatrixStore('networking_measured_data/store', 'latency').append(latency_matrix)
+# NetworkMatrixStore('networking_measured_data/store', 'bandwidth').append(bandwidth_matrix)
+# latest = NetworkMatrixStore('networking_measured_data/store', 'bandwidth').snapshot()
+# print(latest.row('k8s-worker-3'))  # {'k8s-worker-1': 1220.0, 'k8s-worker-8': 359.0, ...} in Mbit/s
@@ -125,26 +125,106 @@ def measure_bandwidth_from_source_to_target(v1, namespace, source_pod, target_po
 
     return result
 
-def measure_bandwidth(namespace='measure-nodes-bd', max_concurrent_tasks=3, test_duration=5):
+'''Conflict-free scheduling of the iperf3 tests:
+Each iperf3 server serves one client at a time, so submitting all N*(N-1) pairs to a pool makes tests
+collide on the same server ("the server is busy") and sleep-retry. Instead, the ordered pairs are
+partitioned into rounds in which no node is client twice or server twice, and each round runs fully in
+parallel. With the cyclic schedule (round k: i -> (i+k) mod N) a full matrix takes N-1 rounds,
+i.e. about (N-1)*test_duration.
+'''
+
+def cyclic_rounds(num_nodes):
+    """
+    Round k (k = 1 .. N-1) holds the ordered pairs (i, (i+k) mod N): every node is the client of exactly
+    one test and the server of exactly one test, and every ordered pair appears in exactly one round.
+    """
+    return [[(i, (i + k) % num_nodes) for i in range(num_nodes)] for k in range(1, num_nodes)]
+
+def exclusive_rounds(num_nodes):
+    """
+    Rounds in which every node takes part in at most one test (as client or server), for NICs that
+    should not send and receive test traffic at the same time. Uses the circle method of round-robin
+    tournaments (a proper edge coloring of the complete graph) for the unordered pairs, then runs
+    each matching once per direction: 2*(N-1) rounds for even N, 2*N for odd N.
+    """
+    nodes = list(range(num_nodes))
+    if num_nodes % 2:
+        nodes.append(None)  # bye
+    size = len(nodes)
+    rounds = []
+    for _ in range(size - 1):
+        matching = [(nodes[i], nodes[size - 1 - i]) for i in range(size // 2)
+                    if nodes[i] is not None and nodes[size - 1 - i] is not None]
+        rounds.append(matching)
+        rounds.append([(b, a) for a, b in matching])
+        nodes = [nodes[0], nodes[-1]] + nodes[1:-1]  # keep the first node fixed, rotate the others
+    return rounds
+
+def pack_rounds(pairs):
+    """
+    Greedily pack a subset of ordered pairs into rounds where no node is client twice or server twice
+    (used when only some pairs are re-measured; the cyclic rounds would leave most slots empty).
+    """
+    rounds = []  # [(pairs, clients, servers)]
+    for client_index, server_index in pairs:
+        for round_pairs, clients, servers in rounds:
+            if client_index not in clients and server_index not in servers:
+                round_pairs.append((client_index, server_index))
+                clients.add(client_index)
+                servers.add(server_index)
+                break
+        else:
+            rounds.append(([(client_index, server_index)], {client_index}, {server_index}))
+    return [round_pairs for round_pairs, _, _ in rounds]
+
+def measure_bandwidth(namespace='measure-nodes-bd', max_concurrent_tasks=3, test_duration=5, schedule='cyclic', pairs=None):
+    """
+    Measure the bandwidth between all pod pairs of the iperf3 DaemonSet.
+
+    Args:
+        namespace: Namespace of the iperf3 DaemonSet.
+        max_concurrent_tasks: Pool size, only used by schedule='pool'.
+        test_duration: Duration of each iperf3 test in seconds.
+        schedule: 'cyclic' (N-1 conflict-free rounds), 'exclusive' (one test per node per round),
+                  or 'pool' (the previous behaviour: all pairs on a pool with busy retries).
+        pairs: Optional list of (src_node, dst_node) to measure instead of all pairs
+               (e.g. from measurement_planner.py); packed with pack_rounds().
+
+    Returns:
+        {src_node: {dst_node: bandwidth}}
+    """
     v1 = client.CoreV1Api()
     pods = v1.list_namespaced_pod(namespace, label_selector="app=bandwidth-measurement").items
     bandwidth_results = {}
 
-    # Use ThreadPoolExecutor for controlled concurrent execution
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_tasks) as executor:
-        futures = []
-        for source_pod in pods:
-            for target_pod in pods:
-                if source_pod.metadata.name != target_pod.metadata.name:  # Skip self-tests
-                    futures.append(executor.submit(measure_bandwidth_from_source_to_target,
-                                                   v1, namespace, source_pod, target_pod, test_duration))
-
-        # Collect the completed results
-        for future in concurrent.futures.as_completed(futures):
-            source_pod_node_name, target_pod_node_name, bandwidth = future.result()
-            if source_pod_node_name not in bandwidth_results:
-                bandwidth_results[source_pod_node_name] = {}
-            bandwidth_results[source_pod_node_name][target_pod_node_name] = bandwidth
+    if pairs is not None:
+        position = {pod.spec.node_name: i for i, pod in enumerate(pods)}
+        rounds = pack_rounds([(position[src], position[dst]) for src, dst in pairs
+                              if src in position and dst in position and src != dst])
+    elif schedule == 'pool':
+        rounds = [[(i, j) for i in range(len(pods)) for j in range(len(pods)) if i != j]]
+    elif schedule == 'exclusive':
+        rounds = exclusive_rounds(len(pods))
+    else:
+        rounds = cyclic_rounds(len(pods))
+
+    for round_index, round_pairs in enumerate(rounds):
+        workers = max_concurrent_tasks if schedule == 'pool' else max(1, len(round_pairs))
+        start_time = time.time()
+        # Use ThreadPoolExecutor for controlled concurrent execution
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(measure_bandwidth_from_source_to_target,
+                                       v1, namespace, pods[i], pods[j], test_duration)
+                       for i, j in round_pairs]
+
+            # Collect the completed results
+            for future in concurrent.futures.as_completed(futures):
+                source_pod_node_name, target_pod_node_name, bandwidth = future.result()
+                if source_pod_node_name not in bandwidth_results:
+                    bandwidth_results[source_pod_node_name] = {}
+                bandwidth_results[source_pod_node_name][target_pod_node_name] = bandwidth
+        if schedule != 'pool':
+            print(f"Bandwidth round {round_index + 1}/{len(rounds)} ({len(round_pairs)} tests) took {time.time() - start_time:.1f}s")
 
     return bandwidth_results
 
@@ -75,9 +75,95 @@ the latency.
 
 from kubernetes import client, config, stream
 import concurrent.futures
+import math
+
+'''Adaptive sampling:
+Instead of always taking 5 samples, each pair is sampled in batches (one exec runs several curls) until
+the chosen statistic has converged or max_samples is reached:
+- 'median', 'p80', 'p99': a distribution-free confidence interval of the quantile (from order statistics
+  and the binomial distribution) is narrower than max(abs_tol_ms, rel_tol * estimate).
+- 'min': the three lowest samples agree within the same tolerance (the floor has been reached).
+Stable pairs stop after min_samples, noisy pairs get up to max_samples. Note that the upper bound of a
+p99 interval only exists from ~300 samples on, so 'p99' usually stops at max_samples (converged=False).
+'''
+
+STATISTIC_QUANTILES = {'median': 0.5, 'p80': 0.8, 'p99': 0.99}
+
+def _binomial_cdf(k, n, q):
+    return sum(math.comb(n, i) * q ** i * (1 - q) ** (n - i) for i in range(k + 1))
+
+def quantile_confidence_interval(sorted_samples, q, confidence=0.95):
+    """
+    Distribution-free confidence interval (x_(l), x_(u)) of the q-quantile from sorted samples:
+    P(x_(l) <= x_q <= x_(u)) >= confidence. Returns None if there are too few samples for the bounds.
+    """
+    n = len(sorted_samples)
+    alpha = (1 - confidence) / 2
+    lower = None
+    for rank in range(1, n + 1):  # largest rank l with P(Bin(n, q) <= l - 1) <= alpha
+        if _binomial_cdf(rank - 1, n, q) <= alpha:
+            lower = rank
+        else:
+            break
+    upper = None
+    for rank in range(n, 0, -1):  # smallest rank u with P(Bin(n, q) >= u) <= alpha
+        if 1 - _binomial_cdf(rank - 1, n, q) <= alpha:
+            upper = rank
+        else:
+            break
+    if lower is None or upper is None:
+        return None
+    return sorted_samples[lower - 1], sorted_samples[upper - 1]
+
+def estimate_statistic(samples, statistic='min', rel_tol=0.1, abs_tol_ms=0.5, confidence=0.95):
+    """
+    Returns:
+        (value, spread, converged): the statistic, the width of its interval in ms (None if not
+        available yet) and whether the width is within max(abs_tol_ms, rel_tol * value).
+    """
+    ordered = sorted(samples)
+    if statistic == 'min':
+        value = ordered[0]
+        spread = ordered[2] - ordered[0] if len(ordered) >= 3 else None
+    else:
+        q = STATISTIC_QUANTILES[statistic]
+        value = ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]  # nearest rank
+        interval = quantile_confidence_interval(ordered, q, confidence)
+        spread = interval[1] - interval[0] if interval else None
+    converged = spread is not None and spread <= max(abs_tol_ms, rel_tol * value)
+    return value, spread, converged
+
+def _curl_samples(v1, namespace, source_pod_name, target_pod_ip, count):
+    # one exec stream runs `count` curls, one time_total per line
+    exec_command = ['sh', '-c',
+                    f"for i in $(seq {count}); do curl -o /dev/null -s -w '%{{time_total}}\\n' http://{target_pod_ip}; done"]
+    resp = stream.stream(v1.connect_get_namespaced_pod_exec,
+                         source_pod_name,
+                         namespace,
+                         command=exec_command,
+                         stderr=True,
+                         stdin=False,
+                         stdout=True,
+                         tty=False)
+    return [float(line) * 1000 for line in resp.split() if line]  # Convert the measured seconds into milliseconds
 
 # Handle individual latency measurements between source and target pods.
-def measure_latency_from_source_to_target(v1, namespace, source_pod, target_pod):
+def measure_latency_from_source_to_target(v1, namespace, source_pod, target_pod, statistic='min',
+                                          min_samples=5, max_samples=30, batch_size=5,
+                                          rel_tol=0.1, abs_tol_ms=0.5, confidence=0.95, return_stats=False):
+    """
+    Sample the latency of one pair adaptively (see the note above).
+
+    Args:
+        statistic: 'min' (the previous behaviour), 'median', 'p80' or 'p99'.
+        min_samples / max_samples: Bounds on the number of curl samples.
+        batch_size: Samples taken per exec stream.
+        return_stats: Return a dict {'value', 'statistic', 'samples', 'spread', 'converged', 'raw_ms'}
+            instead of only the value (raw_ms: all samples, e.g. for netem_distribution.py).
+
+    Returns:
+        (source_node_name, target_node_name, latency) as before.
+    """
     source_pod_name = source_pod.metadata.name
     source_pod_node_name = source_pod.spec.node_name
     target_pod_ip = target_pod.status.pod_ip
@@ -86,33 +172,40 @@ def measure_latency_from_source_to_target(v1, namespace, source_pod, target_pod)
     result = (source_pod_node_name, target_pod_node_name, None)
 
     if source_pod_name != target_pod_name:
-        exec_command = ['curl', '-o', '/dev/null', '-s', '-w', '%{time_total}', f'http://{target_pod_ip}']
         latencies = []
-        for _ in range(5):
+        value, spread, converged = None, None, False
+        failures = 0
+        while len(latencies) < max_samples and failures < 3:
+            count = min(batch_size if latencies else min_samples, max_samples - len(latencies))
             try:
-                resp = stream.stream(v1.connect_get_namespaced_pod_exec,
-                                     source_pod_name,
-                                     namespace,
-                                     command=exec_command,
-                                     stderr=True,
-                                     stdin=False,
-                                     stdout=True,
-                                     tty=False)
-                latency = float(resp) * 1000  # Convert the measured seconds into milliseconds
-                latencies.append(latency)
+                latencies.extend(_curl_samples(v1, namespace, source_pod_name, target_pod_ip, count))
             except Exception as e:
+                failures += 1
                 print(f"Error executing command in pod {source_pod_name}: {e}")
-        
+                continue
+            if len(latencies) >= min_samples:
+                value, spread, converged = estimate_statistic(latencies, statistic, rel_tol, abs_tol_ms, confidence)
+                if converged:
+                    break
+
         if latencies:
-            min_latency = min(latencies) #choose the lowest measured vaule to represent the latency
-            result = (source_pod_node_name, target_pod_node_name, min_latency)
-            # print(f"Latency from source node {source_pod_node_name} to target node {target_pod_node_name}: {min_latency} milliseconds")
+            if value is None:
+                value, spread, converged = estimate_statistic(latencies, statistic, rel_tol, abs_tol_ms, confidence)
+            if return_stats:
+                value = {'value': value, 'statistic': statistic, 'samples': len(latencies),
+                         'spread': spread, 'converged': converged, 'raw_ms': latencies}
+            result = (source_pod_node_name, target_pod_node_name, value)
         else:
             result = (source_pod_node_name, target_pod_node_name, "Error")
 
     return result
 
-def measure_http_latency(namespace='measure-nodes'):
+def measure_http_latency(namespace='measure-nodes', statistic='min', return_stats=False, pairs=None, **estimator_params):
+    """
+    Measure the latency between all pod pairs of the measurement DaemonSet.
+    statistic, return_stats and estimator_params are passed to measure_latency_from_source_to_target().
+    If pairs (a list of (src_node, dst_node)) is given, e.g. by measurement_planner.py, only these pairs are measured.
+    """
     v1 = client.CoreV1Api()
     pods = v1.list_namespaced_pod(namespace, label_selector="app=latency-measurement").items
     latency_results = {}
@@ -120,9 +213,13 @@ def measure_http_latency(namespace='measure-nodes'):
     # Run the latency measurement tasks concurrently
     with concurrent.futures.ThreadPoolExecutor() as executor:
         futures = []
+        wanted = set(pairs) if pairs is not None else None
         for source_pod in pods:
             for target_pod in pods:
-                futures.append(executor.submit(measure_latency_from_source_to_target, v1, namespace, source_pod, target_pod))
+                if wanted is not None and (source_pod.spec.node_name, target_pod.spec.node_name) not in wanted:
+                    continue
+                futures.append(executor.submit(measure_latency_from_source_to_target, v1, namespace, source_pod, target_pod,
+                                               statistic=statistic, return_stats=return_stats, **estimator_params))
         
         # Aggregate the completed results into the latency_results dictionary
         for future in concurrent.futures.as_completed(futures):
@@ -133,6 +230,142 @@ def measure_http_latency(namespace='measure-nodes'):
 
     return latency_results
 
+'''In-pod latency agents (latency_probe_agent.py):
+measure_http_latency() opens 5 exec streams (each starting a curl process) per ordered node pair,
+i.e. 5*N*(N-1) API-server-proxied sessions per matrix. With the agent DaemonSet below, every pod probes
+all of its peers itself (TCP connect or HTTP keep-alive) and serves its latest row, so the collector
+only reads N rows over HTTP.
+'''
+
+import os
+import json
+import urllib.request
+
+AGENT_APP_LABEL = 'latency-agent'
+AGENT_PORT = 8079
+
+def deploy_latency_agent_daemonset_if_needed(namespace='measure-nodes', probe_mode='tcp', probe_interval=5, samples_kept=20):
+    """
+    Deploy the latency agent: a ConfigMap with the agent script, a headless Service used by the agents
+    to discover each other, and a DaemonSet running the script in a plain python image.
+    """
+    config.load_kube_config()
+    core_v1 = client.CoreV1Api()
+    apps_v1 = client.AppsV1Api()
+
+    pods = core_v1.list_namespaced_pod(namespace, label_selector=f"app={AGENT_APP_LABEL}").items
+    if pods:
+        print("Latency agent pods already exist in the namespace. Skipping DaemonSet deployment.")
+        return
+
+    agent_script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'latency_probe_agent.py')
+    with open(agent_script_path, 'r') as f:
+        agent_script = f.read()
+
+    config_map = client.V1ConfigMap(
+        metadata=client.V1ObjectMeta(name=f"{AGENT_APP_LABEL}-script"),
+        data={'latency_probe_agent.py': agent_script}
+    )
+    # Headless service: one DNS A record per agent pod, ready or not
+    service = client.V1Service(
+        metadata=client.V1ObjectMeta(name=AGENT_APP_LABEL),
+        spec=client.V1ServiceSpec(
+            cluster_ip="None",
+            publish_not_ready_addresses=True,
+            selector={"app": AGENT_APP_LABEL},
+            ports=[client.V1ServicePort(name="http", port=AGENT_PORT, target_port=AGENT_PORT)]
+        )
+    )
+    env = [
+        client.V1EnvVar(name="NODE_NAME", value_from=client.V1EnvVarSource(
+            field_ref=client.V1ObjectFieldSelector(field_path="spec.nodeName"))),
+        client.V1EnvVar(name="PEER_SERVICE", value=f"{AGENT_APP_LABEL}.{namespace}.svc.cluster.local"),
+        client.V1EnvVar(name="AGENT_PORT", value=str(AGENT_PORT)),
+        client.V1EnvVar(name="PROBE_MODE", value=probe_mode),
+        client.V1EnvVar(name="PROBE_INTERVAL", value=str(probe_interval)),
+        client.V1EnvVar(name="SAMPLES_KEPT", value=str(samples_kept)),
+    ]
+    ds_body = client.V1DaemonSet(
+        api_version="apps/v1",
+        kind="DaemonSet",
+        metadata=client.V1ObjectMeta(name=f"{AGENT_APP_LABEL}-ds"),
+        spec=client.V1DaemonSetSpec(
+            selector=client.V1LabelSelector(match_labels={"app": AGENT_APP_LABEL}),
+            template=client.V1PodTemplateSpec(
+                metadata=client.V1ObjectMeta(labels={"app": AGENT_APP_LABEL},
+                                             annotations={"prometheus.io/scrape": "true",
+                                                          "prometheus.io/port": str(AGENT_PORT)}),
+                spec=client.V1PodSpec(
+                    containers=[client.V1Container(
+                        name="latency-agent",
+                        image="python:3.11-slim",
+                        command=["python", "-u", "/agent/latency_probe_agent.py"],
+                        env=env,
+                        ports=[client.V1ContainerPort(container_port=AGENT_PORT)],
+                        volume_mounts=[client.V1VolumeMount(name="agent-script", mount_path="/agent")]
+                    )],
+                    volumes=[client.V1Volume(name="agent-script", config_map=client.V1ConfigMapVolumeSource(
+                        name=f"{AGENT_APP_LABEL}-script"))],
+                    restart_policy="Always"
+                )
+            )
+        )
+    )
+
+    try:
+        core_v1.create_namespaced_config_map(namespace=namespace, body=config_map)
+        core_v1.create_namespaced_service(namespace=namespace, body=service)
+        apps_v1.create_namespaced_daemon_set(namespace=namespace, body=ds_body)
+        print(f"Deployed latency agent DaemonSet in namespace {namespace}")
+    except client.rest.ApiException as e:
+        print(f"Exception when deploying the latency agent: {e}")
+
+def fetch_agent_row(pod_ip, port=AGENT_PORT, timeout=5):
+    with urllib.request.urlopen(f"http://{pod_ip}:{port}/row", timeout=timeout) as resp:
+        return json.loads(resp.read().decode())
+
+def collect_agent_latency(namespace='measure-nodes', statistic='min', port=AGENT_PORT, timeout=5):
+    """
+    Read the latest row of every latency agent (N HTTP requests instead of N^2 exec streams).
+
+    Args:
+        namespace: Namespace of the agent DaemonSet.
+        statistic: 'min' (same choice as measure_http_latency()), 'median' or 'p80'.
+
+    Returns:
+        {src_node: {dst_node: latency_ms}} in the same format as measure_http_latency();
+        the entry of a node to itself is None and unreachable agents give "Error" rows.
+    """
+    v1 = client.CoreV1Api()
+    pods = v1.list_namespaced_pod(namespace, label_selector=f"app={AGENT_APP_LABEL}").items
+    node_names = [pod.spec.node_name for pod in pods]
+    latency_results = {}
+
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = {executor.submit(fetch_agent_row, pod.status.pod_ip, port, timeout): pod.spec.node_name
+                   for pod in pods if pod.status.pod_ip}
+        for future in concurrent.futures.as_completed(futures):
+            source_node_name = futures[future]
+            try:
+                row = future.result()['latency_ms']
+            except Exception as e:
+                print(f"Error reading the latency agent row of {source_node_name}: {e}")
+                row = None
+            latency_results[source_node_name] = {}
+            for target_node_name in node_names:
+                if target_node_name == source_node_name:
+                    latency_results[source_node_name][target_node_name] = None
+                elif row is None or target_node_name not in row:
+                    latency_results[source_node_name][target_node_name] = "Error"
+                else:
+                    latency_results[source_node_name][target_node_name] = row[target_node_name][statistic]
+
+    return latency_results
+
+# deploy_latency_agent_daemonset_if_needed(namespace='measure-nodes')
+# # After the agent pods are ready and have run a few probe rounds
+# latency_results = collect_agent_latency(namespace='measure-nodes')
+
 # Call the function to measure latency after deploying the DaemonSet
 # namespace = 'measure-nodes'
 # # After the DaemonSet is ready, and the related pods are ready
@@ -0,0 +1,227 @@
+'''Node inventory shared by the emulators, measurers and policies.
+
+The injection and clear scripts used to hard-code node_details (IP, SSH user, key path) and node_names for
+9 or 15 workers, and looked up matrix indices with list(node_details.keys()).index(...) in every loop.
+NodeInventory discovers the worker nodes and their InternalIPs from the Kubernetes API (or reads a static
+JSON file), caches the result on disk, and keeps stable mappings
+
+    index <-> node name <-> IP
+
+as dicts, so every lookup is O(1). The index order is the natural order of the node names
+(k8s-worker-2 before k8s-worker-10), which is the order the matrices of network_matrix_generator.py are
+indexed in. node_details() returns the dict format all existing scripts take.
+
+Each node also carries its pod CIDRs (the Calico IPAM blocks affine to the node, or node.spec.podCIDRs),
+which qdisc_tree.build_qdisc_tree() turns into one prefix filter each, so pod-to-pod traffic is classified
+into the emulated link of its destination node.
+
+Sources, in the order load_node_inventory() tries them:
+    1. an explicit file (argument or $IDYNAMICS_NODE_INVENTORY)
+    2. the cache file, if younger than max_age seconds
+    3. the Kubernetes API (the result is written to the cache)
+    4. the cache file, however old (API not reachable)
+'''
+
+import os
+import re
+import json
+import time
+import logging
+import ipaddress
+
+from kubernetes import client, config
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.idynamics/node_inventory.json")
+DEFAULT_USERNAME = 'ubuntu'
+DEFAULT_KEY_PATH = '/home/ubuntu/.ssh/id_rsa'
+WORKER_SELECTOR = '!node-role.kubernetes.io/control-plane,!node-role.kubernetes.io/master'
+
+
+def natural_key(node_name: str):
+    """Sort key that orders 'k8s-worker-2' before 'k8s-worker-10'."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', node_name)]
+
+
+def collapse_cidrs(cidrs) -> list:
+    """Merge adjacent/overlapping CIDRs (e.g. Calico /26 blocks) into as few prefixes as possible, per IP version."""
+    networks = [ipaddress.ip_network(cidr, strict=False) for cidr in cidrs]
+    collapsed = []
+    for version in (4, 6):
+        collapsed += ipaddress.collapse_addresses(network for network in networks if network.version == version)
+    return [str(network) for network in collapsed]
+
+
+def calico_block_cidrs() -> dict:
+    """
+    {node_name: [CIDRs]} from Calico's IPAM block affinities (crd.projectcalico.org/v1 BlockAffinity).
+    Calico assigns pod IPs from these blocks and ignores node.spec.podCIDR by default.
+    """
+    affinities = client.CustomObjectsApi().list_cluster_custom_object('crd.projectcalico.org', 'v1', 'blockaffinities')
+    blocks = {}
+    for item in affinities.get('items', []):
+        spec = item.get('spec', {})
+        if spec.get('state', 'confirmed') == 'confirmed' and spec.get('node') and spec.get('cidr'):
+            blocks.setdefault(spec['node'], []).append(spec['cidr'])
+    return {node_name: collapse_cidrs(cidrs) for node_name, cidrs in blocks.items()}
+
+
+def spec_pod_cidrs(node) -> list:
+    """Pod CIDRs of a V1Node from its spec (podCIDRs, or the older single podCIDR)."""
+    return list(node.spec.pod_cidrs or ([node.spec.pod_cidr] if node.spec.pod_cidr else []))
+
+
+class NodeInventory:
+    """
+    Args:
+        nodes: {node_name: {'ip': ..., 'username': ..., 'key_path': ..., 'labels': {...}, 'pod_cidrs': [...]}};
+            username and key_path default to DEFAULT_USERNAME / DEFAULT_KEY_PATH.
+    """
+    def __init__(self, nodes: dict):
+        self.node_names = sorted(nodes, key=natural_key)
+        self.nodes = {}
+        for node_name in self.node_names:
+            details = dict(nodes[node_name])
+            details.setdefault('username', DEFAULT_USERNAME)
+            details.setdefault('key_path', DEFAULT_KEY_PATH)
+            details.setdefault('labels', {})
+            details.setdefault('pod_cidrs', [])
+            self.nodes[node_name] = details
+        self._index = {node_name: i for i, node_name in enumerate(self.node_names)}
+        self._by_ip = {details['ip']: node_name for node_name, details in self.nodes.items()}
+
+    @classmethod
+    def from_kubernetes(cls, label_selector: str = WORKER_SELECTOR, name_pattern: str = None,
+                        username: str = DEFAULT_USERNAME, key_path: str = DEFAULT_KEY_PATH, pod_cidr_source: str = 'auto'):
+        """
+        Discover the nodes from the Kubernetes API.
+
+        Args:
+            label_selector: Node label selector (default: every node without a control-plane role).
+            name_pattern: Optional regex the node names must match (e.g. r'k8s-worker-\\d+').
+            username, key_path: SSH credentials of the nodes.
+            pod_cidr_source: 'calico' (IPAM block affinities), 'spec' (node.spec.podCIDRs), 'auto' (Calico blocks
+                if the CRD exists, else the node spec) or None (node IPs only).
+        """
+        try:
+            config.load_kube_config()
+        except config.ConfigException:
+            config.load_incluster_config()
+        calico_blocks = None
+        if pod_cidr_source in ('calico', 'auto'):
+            try:
+                calico_blocks = calico_block_cidrs()
+            except client.exceptions.ApiException as e:
+                if pod_cidr_source == 'calico':
+                    raise
+                logging.info(f"No Calico block affinities ({e.status}), using node.spec.podCIDRs")
+        nodes = {}
+        for node in client.CoreV1Api().list_node(label_selector=label_selector).items:
+            node_name = node.metadata.name
+            if name_pattern and not re.fullmatch(name_pattern, node_name):
+                continue
+            addresses = {address.type: address.address for address in (node.status.addresses or [])}
+            if 'InternalIP' not in addresses:
+                logging.warning(f"Node {node_name} has no InternalIP, skipped")
+                continue
+            if calico_blocks is not None:
+                pod_cidrs = calico_blocks.get(node_name, [])
+            elif pod_cidr_source is not None:
+                pod_cidrs = spec_pod_cidrs(node)
+            else:
+                pod_cidrs = []
+            nodes[node_name] = {'ip': addresses['InternalIP'], 'username': username, 'key_path': key_path,
+                                'labels': dict(node.metadata.labels or {}), 'pod_cidrs': pod_cidrs}
+        return cls(nodes)
+
+    @classmethod
+    def from_file(cls, file_path: str):
+        """Read a JSON file in node_details format ({node_name: {'ip': ..., 'username': ..., 'key_path': ...}})."""
+        with open(file_path, 'r') as f:
+            return cls(json.load(f))
+
+    def save(self, file_path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.nodes, f, indent=2)
+        os.replace(tmp_path, file_path)
+
+    def __len__(self):
+        return len(self.node_names)
+
+    def __iter__(self):
+        return iter(self.node_names)
+
+    def __contains__(self, node_name):
+        return node_name in self._index
+
+    def index_of(self, node_name: str) -> int:
+        """Matrix index of a node."""
+        return self._index[node_name]
+
+    def name_at(self, index: int) -> str:
+        return self.node_names[index]
+
+    def ip_of(self, node_name: str) -> str:
+        return self.nodes[node_name]['ip']
+
+    def name_of_ip(self, ip: str) -> str:
+        """Node name of an InternalIP (None if unknown)."""
+        return self._by_ip.get(ip)
+
+    def pod_cidrs_of(self, node_name: str) -> list:
+        return self.nodes[node_name]['pod_cidrs']
+
+    def subset(self, node_names: list) -> 'NodeInventory':
+        """Inventory of only these nodes (indices are renumbered in natural name order)."""
+        return NodeInventory({node_name: self.nodes[node_name] for node_name in node_names})
+
+    def node_details(self) -> dict:
+        """
+        {node_name: {'ip', 'username', 'key_path'}} in index order, as taken by the injection scripts;
+        'pod_cidrs' is added for nodes that have any, so build_qdisc_tree() installs their prefix filters.
+        """
+        node_details = {}
+        for node_name, details in self.nodes.items():
+            node_details[node_name] = {key: details[key] for key in ('ip', 'username', 'key_path')}
+            if details['pod_cidrs']:
+                node_details[node_name]['pod_cidrs'] = list(details['pod_cidrs'])
+        return node_details
+
+    def tiers(self, label_key: str = 'topology.kubernetes.io/zone', default: str = 'default') -> dict:
+        """{node_name: value of a node label}, e.g. for netem_distribution.group_by_tier()."""
+        return {node_name: details['labels'].get(label_key, default) for node_name, details in self.nodes.items()}
+
+
+def load_node_inventory(file_path: str = None, cache_path: str = DEFAULT_CACHE_PATH, max_age: float = 300,
+                        **kubernetes_params) -> NodeInventory:
+    """
+    Load the inventory from a file, the cache or the Kubernetes API (see the module docstring for the order).
+
+    Args:
+        file_path: Static node_details JSON file; defaults to $IDYNAMICS_NODE_INVENTORY.
+        cache_path: Cache file of the discovered inventory.
+        max_age: Seconds a cached inventory is used without asking the API.
+        kubernetes_params: Passed to NodeInventory.from_kubernetes() (label_selector, name_pattern, username, key_path,
+            pod_cidr_source).
+    """
+    file_path = file_path or os.environ.get('IDYNAMICS_NODE_INVENTORY')
+    if file_path:
+        return NodeInventory.from_file(file_path)
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < max_age:
+        return NodeInventory.from_file(cache_path)
+    try:
+        inventory = NodeInventory.from_kubernetes(**kubernetes_params)
+    except Exception as e:
+        if os.path.exists(cache_path):
+            logging.warning(f"Kubernetes API not reachable ({e}), using the cached node inventory {cache_path}")
+            return NodeInventory.from_file(cache_path)
+        raise
+    inventory.save(cache_path)
+    return inventory
+
+# Example usage:
+# inventory = load_node_inventory(name_pattern=r'k8s-worker-\d+')
+# node_details = inventory.node_details()
+# delay_matrix = generate_delay_matrix(num_nodes=len(inventory), base_latency=5, max_additional_latency=50)
+# print(delay_matrix[inventory.index_of('k8s-worker-3')][inventory.index_of('k8s-worker-7')])
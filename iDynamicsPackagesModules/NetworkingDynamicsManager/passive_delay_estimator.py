@@ -0,0 +1,202 @@
+'''Passive cross-node delay estimation from Istio telemetry (no probes).
+
+For every workload pair (A -> B), Istio reports istio_request_duration_milliseconds twice:
+- reporter="source":      measured by A's sidecar, i.e. network round trip + B's processing time
+- reporter="destination": measured by B's sidecar, i.e. B's processing time only
+so  gap(A -> B) = mean_source - mean_destination  is (mostly) the network round trip between the nodes
+of A and B, plus a roughly constant sidecar overhead.
+
+A workload may have pods on several nodes. With load spread evenly over the pods, the gap is the mixture
+    gap(A -> B) = overhead + sum_{a, b} share_A(a) * share_B(b) * RTT(a, b)
+which is linear in the unknown per-node-pair round trips. One row per workload pair, one column per
+unordered node pair (+ one overhead column): the RTT matrix is fitted by weighted least squares
+(weight = request rate). Only node pairs the equations determine are reported: a pair no workload pair
+covers, or one whose round trip trades off against other unknowns (e.g. a single pair next to the overhead
+column), lies partly in the null space of the design matrix and stays NaN.
+
+The whole estimate takes two PromQL queries, so it can run continuously; the result is a
+network_matrix_store.NetworkMatrix (kind 'latency', round-trip ms) and can feed
+MeasurementPlanner.observe_passive() to flag drifting pairs for active re-measurement. The estimate is a
+symmetric round trip plus sidecar effects, not the planner's directed curl time, so drift is judged against
+the pair's earlier passive estimates only.
+'''
+
+import logging
+
+import numpy as np
+from kubernetes import client, config
+from prometheus_api_client import PrometheusConnect
+
+from iDynamicsPackagesModules.NetworkingDynamicsManager.network_matrix_store import NetworkMatrix
+
+
+def query_reporter_durations(prom: PrometheusConnect, namespace: str, reporter: str, window: str = '5m') -> dict:
+    """
+    Mean request duration and request rate per workload pair, as seen by one reporter.
+
+    Returns:
+        {(source_workload, destination_workload): (mean_duration_ms, requests_per_second)}
+    """
+    selector = f'reporter="{reporter}", destination_workload_namespace="{namespace}"'
+    by = 'source_workload, destination_workload'
+    duration_sum = prom.custom_query(
+        query=f'sum by ({by}) (rate(istio_request_duration_milliseconds_sum{{{selector}}}[{window}]))')
+    duration_count = prom.custom_query(
+        query=f'sum by ({by}) (rate(istio_request_duration_milliseconds_count{{{selector}}}[{window}]))')
+
+    sums = {(r['metric'].get('source_workload'), r['metric'].get('destination_workload')): float(r['value'][1])
+            for r in duration_sum}
+    durations = {}
+    for r in duration_count:
+        key = (r['metric'].get('source_workload'), r['metric'].get('destination_workload'))
+        rate = float(r['value'][1])
+        if rate > 0 and key in sums:
+            durations[key] = (sums[key] / rate, rate)
+    return durations
+
+
+def _workload_of_pod(pod) -> str:
+    # Istio's workload name of a Deployment pod is the Deployment name: strip the ReplicaSet hash
+    for owner in pod.metadata.owner_references or []:
+        if owner.kind == 'ReplicaSet':
+            return owner.name.rsplit('-', 1)[0]
+        return owner.name
+    return pod.metadata.name
+
+
+def workload_node_shares(namespace: str) -> dict:
+    """
+    Share of each workload's running pods on each node, from the cluster state.
+
+    Returns:
+        {workload: {node_name: share}}, shares of a workload sum to 1.
+    """
+    try:
+        config.load_incluster_config()
+    except:
+        config.load_kube_config()
+    v1 = client.CoreV1Api()
+    counts = {}
+    for pod in v1.list_namespaced_pod(namespace).items:
+        if pod.status.phase != 'Running' or not pod.spec.node_name:
+            continue
+        workload_counts = counts.setdefault(_workload_of_pod(pod), {})
+        workload_counts[pod.spec.node_name] = workload_counts.get(pod.spec.node_name, 0) + 1
+    return {workload: {node: n / sum(nodes.values()) for node, n in nodes.items()}
+            for workload, nodes in counts.items()}
+
+
+def fit_pair_delays(gaps: dict, shares: dict, node_names: list, fit_overhead: bool = True, min_rate: float = 0.01):
+    """
+    Least-squares fit of the per-node-pair round trips from workload-pair duration gaps.
+
+    Args:
+        gaps: {(source_workload, destination_workload): (gap_ms, requests_per_second)}.
+        shares: Output of workload_node_shares().
+        node_names: Node names in matrix index order.
+        fit_overhead: Fit a constant sidecar overhead column.
+        min_rate: Workload pairs with a lower request rate are ignored (too noisy).
+
+    Returns:
+        (rtt_matrix, info): an N x N symmetric array of round trips in ms (NaN where the equations do not
+        determine the node pair, 0 on the diagonal), and {'overhead_ms', 'rows', 'covered_pairs',
+        'determined_pairs', 'residual_ms'}; covered_pairs counts the node pairs any workload pair touches,
+        overhead_ms is NaN when the overhead is not determined either.
+    """
+    index = {node_name: i for i, node_name in enumerate(node_names)}
+    num_nodes = len(node_names)
+    upper_i, upper_j = np.triu_indices(num_nodes, 1)
+    column_of = np.full((num_nodes, num_nodes), -1)
+    column_of[upper_i, upper_j] = np.arange(len(upper_i))
+    column_of[upper_j, upper_i] = np.arange(len(upper_i))
+    num_columns = len(upper_i) + (1 if fit_overhead else 0)
+
+    rows, targets, weights = [], [], []
+    for (src_workload, dst_workload), (gap, rate) in gaps.items():
+        if rate < min_rate or src_workload not in shares or dst_workload not in shares:
+            continue
+        src_share = np.zeros(num_nodes)
+        dst_share = np.zeros(num_nodes)
+        for node, share in shares[src_workload].items():
+            if node in index:
+                src_share[index[node]] = share
+        for node, share in shares[dst_workload].items():
+            if node in index:
+                dst_share[index[node]] = share
+        mix = np.outer(src_share, dst_share)
+        np.fill_diagonal(mix, 0.0)  # same-node calls have no network delay
+        row = np.zeros(num_columns)
+        np.add.at(row, column_of[mix > 0], mix[mix > 0])
+        if fit_overhead:
+            row[-1] = 1.0
+        rows.append(row)
+        targets.append(gap)
+        weights.append(np.sqrt(rate))
+
+    rtt = np.full((num_nodes, num_nodes), np.nan)
+    np.fill_diagonal(rtt, 0.0)
+    info = {'overhead_ms': 0.0, 'rows': len(rows), 'covered_pairs': 0, 'determined_pairs': 0, 'residual_ms': None}
+    if not rows:
+        return rtt, info
+
+    design = np.array(rows) * np.array(weights)[:, None]
+    target = np.array(targets) * np.array(weights)
+    solution, _, _, _ = np.linalg.lstsq(design, target, rcond=None)
+    covered = np.array(rows)[:, :len(upper_i)].any(axis=0)
+    # a column is determined iff no null-space direction of the design moves it
+    _, singular, vt = np.linalg.svd(design)
+    tolerance = max(design.shape) * np.finfo(float).eps * (singular[0] if len(singular) else 0.0)
+    rank = int((singular > tolerance).sum())
+    null_space = vt[rank:]
+    determined = np.all(np.abs(null_space) < 1e-9, axis=0) if len(null_space) else np.ones(num_columns, bool)
+
+    pair_rtt = np.where(determined[:len(upper_i)], np.clip(solution[:len(upper_i)], 0.0, None), np.nan)
+    rtt[upper_i, upper_j] = pair_rtt
+    rtt[upper_j, upper_i] = pair_rtt
+    residual = np.array(rows) @ solution - np.array(targets)
+    info.update(overhead_ms=(float(solution[-1]) if determined[-1] else np.nan) if fit_overhead else 0.0,
+                covered_pairs=int(covered.sum()), determined_pairs=int(determined[:len(upper_i)].sum()),
+                residual_ms=float(np.sqrt(np.mean(residual ** 2))))
+    return rtt, info
+
+
+def estimate_passive_delay(prom_url: str, namespace: str, node_names: list = None, window: str = '5m',
+                           fit_overhead: bool = True) -> tuple:
+    """
+    Estimate the node-pair round-trip matrix of the nodes hosting `namespace` from Istio metrics.
+
+    Returns:
+        (NetworkMatrix of kind 'latency' in round-trip ms, fit info dict)
+    """
+    prom = PrometheusConnect(url=prom_url, disable_ssl=True)
+    source = query_reporter_durations(prom, namespace, 'source', window)
+    destination = query_reporter_durations(prom, namespace, 'destination', window)
+    gaps = {key: (source[key][0] - destination[key][0], min(source[key][1], destination[key][1]))
+            for key in source.keys() & destination.keys()}
+
+    shares = workload_node_shares(namespace)
+    if node_names is None:
+        node_names = sorted({node for nodes in shares.values() for node in nodes})
+    rtt, info = fit_pair_delays(gaps, shares, node_names, fit_overhead=fit_overhead)
+    logging.info(f"Passive delay fit: {info['rows']} workload pairs, {info['covered_pairs']} node pairs covered, "
+                 f"{info['determined_pairs']} determined, "
+                 f"overhead {info['overhead_ms']:.2f} ms, residual {info['residual_ms']} ms")
+    return NetworkMatrix(node_names, rtt, 'latency'), info
+
+
+def flag_drifting_pairs(planner, passive_matrix: NetworkMatrix) -> list:
+    """
+    Feed every determined pair of a passive estimate to MeasurementPlanner.observe_passive(), which compares it
+    with the pair's passive baseline; a round-trip change flags both directions. Returns the drifting pairs.
+    """
+    drifting = []
+    for src in passive_matrix.node_names:
+        for dst, value in passive_matrix.row(src).items():
+            if src in planner.index and dst in planner.index and planner.observe_passive(src, dst, value):
+                drifting.append((src, dst))
+    return drifting
+
+# Example usage:
+# passive_matrix, info = estimate_passive_delay("http://10.105.116.175:9090", namespace="social-network")
+# print(passive_matrix.row('k8s-worker-3'))
+# flag_drifting_pairs(latency_planner, passive_matrix)  # then run_measurement_cycle(latency_planner, ...)
@@ -0,0 +1,159 @@
+'''One composable tc tree for all network impairments between a source node and its destinations.
+
+node_delay_injection_V3.py built "HTB class (rate 100mbps) + netem delay" per destination, which silently
+capped every delayed link at 100 MB/s, and node_bandwdith_injection_V3.py built a different HTB tree without
+netem, so delay and bandwidth could not be applied together. build_qdisc_tree() builds a single tree:
+
+    root 1: htb default 1
+    ├── class 1:1     default class at link rate (traffic to non-emulated destinations is not capped)
+    ├── class 1:<id>  htb rate <rate> ceil <ceil>       one per destination node
+    │   └── qdisc <id>: netem delay <d> <jitter> distribution <dist> loss <p>% reorder <r>%
+    └── filter u32 match ip dst <dst_ip>/32 flowid 1:<id>       node (host network) traffic
+        filter u32 match ip dst <pod_cidr> flowid 1:<id>       one masked prefix per pod CIDR of the node
+
+Class ids are deterministic: <id> = hex(destination index + 2), so the tree of a node only depends on the
+node order and hundreds of destinations never collide (tc reads class minors and handles as hex; up to
+65533 destinations). netem is only attached where an impairment is set.
+
+Pod-to-pod traffic is addressed to pod IPs, not node IPs. When node_details carries the destination's
+'pod_cidrs' (see node_inventory.py), every pod CIDR gets one prefix filter, so the rule count stays at
+O(N) per node however many pods run. With an overlay (Calico IPIP/VXLAN, Flannel VXLAN) the outer header
+carries the node IP and the /32 filter already matches; the prefix filters cover native routing
+(Calico BGP without encapsulation, Flannel host-gw).
+
+Every impairment is given either as an N x N matrix (indexed like node_details) or as one scalar for
+all pairs; per-pair specs can override single pairs.
+'''
+
+import numpy as np
+
+DEFAULT_LINK_RATE = '10gbit'
+
+
+def class_minor(dst_node_index: int) -> str:
+    """Deterministic class minor / netem handle major of a destination (hex, 1 is the default class)."""
+    return f"{dst_node_index + 2:x}"
+
+
+def prefix_matches(node_info: dict) -> list:
+    """u32 matches of one destination: its node IP and each IPv4 pod CIDR in node_info.get('pod_cidrs')."""
+    matches = [f"ip dst {node_info['ip']}/32"]
+    matches += [f"ip dst {cidr}" for cidr in node_info.get('pod_cidrs') or [] if ':' not in cidr]
+    return matches
+
+
+def _value(spec, i, j):
+    if spec is None:
+        return None
+    if np.isscalar(spec):
+        return spec
+    value = spec[i][j]
+    return None if value is None or (isinstance(value, float) and np.isnan(value)) else value
+
+
+def _netem_options(delay=None, jitter=None, distribution=None, loss=None, reorder=None, correlation=None) -> str:
+    options = []
+    if delay or jitter or reorder:
+        options.append(f"delay {delay or 0}ms")
+        if jitter:
+            options.append(f"{jitter}ms")
+            if correlation:
+                options.append(f"{correlation}%")
+            if distribution:
+                options.append(f"distribution {distribution}")
+    if loss:
+        options.append(f"loss {loss}%")
+    if reorder:
+        options.append(f"reorder {reorder}%")  # netem reorders by sending some packets without the delay
+    return " ".join(options)
+
+
+def build_qdisc_tree(source_node_name, node_details, delay_matrix=None, rate_matrix=None, ceil_matrix=None,
+                     jitter_matrix=None, loss_matrix=None, reorder_matrix=None, distribution=None,
+                     jitter_correlation=None, pair_overrides=None, link_rate=DEFAULT_LINK_RATE, interface='eth0',
+                     destination_matches=None):
+    """
+    Build the tc tree of one source node as `tc -batch` lines (without the leading "tc").
+
+    Args:
+        source_node_name: Node the tree is installed on.
+        node_details: {node_name: {'ip': ..., 'pod_cidrs': [...] (optional)}}; its order defines the matrix indices.
+        delay_matrix: Delay in ms.
+        rate_matrix: Rate in Mbit/s (None = link rate, i.e. no bandwidth limit).
+        ceil_matrix: Ceil in Mbit/s (None = rate, i.e. a hard limit).
+        jitter_matrix: Jitter in ms (netem delay <d> <jitter>).
+        loss_matrix: Packet loss in percent.
+        reorder_matrix: Percentage of packets sent without delay (requires a delay).
+        distribution: Jitter distribution ('normal', 'pareto', 'paretonormal' or a custom table name).
+        jitter_correlation: Correlation of consecutive jitter values in percent.
+        pair_overrides: {dst_node: {'delay': .., 'rate': .., 'ceil': .., 'jitter': .., 'loss': .., 'reorder': ..,
+                         'distribution': ..}} for single pairs of this source.
+        link_rate: Rate of the default class and of classes without a rate limit.
+        destination_matches: {dst_node: [u32 match expressions]} to classify by other fields
+            (default: prefix_matches(), i.e. the node IP and its pod CIDRs).
+
+    Returns:
+        A list of batch lines.
+    """
+    node_names = list(node_details.keys())
+    i = node_names.index(source_node_name)
+    pair_overrides = pair_overrides or {}
+
+    lines = [
+        # "replace" always succeeds (no tree yet, or any old tree), so the "del" cannot fail and
+        # a non-zero return code of the batch means a real error
+        f"qdisc replace dev {interface} root pfifo",
+        f"qdisc del dev {interface} root",
+        f"qdisc add dev {interface} root handle 1: htb default 1",
+        f"class add dev {interface} parent 1: classid 1:1 htb rate {link_rate}",
+    ]
+    for j, dst_node in enumerate(node_names):
+        if dst_node == source_node_name:
+            continue
+        override = pair_overrides.get(dst_node, {})
+        rate = override.get('rate', _value(rate_matrix, i, j))
+        ceil = override.get('ceil', _value(ceil_matrix, i, j))
+        netem = _netem_options(delay=override.get('delay', _value(delay_matrix, i, j)),
+                               jitter=override.get('jitter', _value(jitter_matrix, i, j)),
+                               distribution=override.get('distribution', distribution),
+                               loss=override.get('loss', _value(loss_matrix, i, j)),
+                               reorder=override.get('reorder', _value(reorder_matrix, i, j)),
+                               correlation=jitter_correlation)
+
+        minor = class_minor(j)
+        rate_text = f"{rate}mbit" if rate is not None else link_rate
+        ceil_text = f"{ceil}mbit" if ceil is not None else rate_text
+        lines.append(f"class add dev {interface} parent 1: classid 1:{minor} htb rate {rate_text} ceil {ceil_text}")
+        if netem:
+            lines.append(f"qdisc add dev {interface} parent 1:{minor} handle {minor}: netem {netem}")
+        matches = (destination_matches or {}).get(dst_node) or prefix_matches(node_details[dst_node])
+        for match in matches:
+            lines.append(f"filter add dev {interface} protocol ip parent 1: prio 1 u32 match {match} flowid 1:{minor}")
+    return lines
+
+
+def apply_qdisc_tree(runner, node_name, batch_lines) -> tuple:
+    """
+    Apply a tree right away with one `tc -force -batch` (no staging / synchronized commit);
+    runner is any object with run() and write_file() (SSHNodeRunner, LocalNetnsRunner).
+    Returns (stdout, stderr) of tc.
+    """
+    path = "/tmp/idynamics_qdisc_tree.batch"
+    runner.write_file(node_name, path, "\n".join(batch_lines) + "\n")
+    return runner.run(node_name, f"sudo tc -force -batch {path}")
+
+def apply_batch_over_ssh(client, batch_lines) -> tuple:
+    """
+    Apply batch lines through an open paramiko SSHClient by piping them into `sudo tc -force -batch -`
+    (one exec instead of one exec_command per tc command). Returns (stdout, stderr) of tc.
+    """
+    stdin, stdout, stderr = client.exec_command("sudo tc -force -batch -")
+    stdin.write("\n".join(batch_lines) + "\n")
+    stdin.channel.shutdown_write()
+    return stdout.read().decode().strip(), stderr.read().decode().strip()
+
+# Example usage:
+# delay + bandwidth + jitter in one tree:
+# lines = build_qdisc_tree('k8s-worker-1', node_details, delay_matrix=delay_matrix, rate_matrix=bandwidth_matrix,
+#                          jitter_matrix=2, distribution='normal', loss_matrix=0.1)
+# apply_qdisc_tree(SSHNodeRunner(node_details), 'k8s-worker-1', lines)
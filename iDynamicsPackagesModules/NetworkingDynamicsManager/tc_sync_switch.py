@@ -0,0 +1,245 @@
+'''Two-phase (prepare / commit) switching of delay profiles across all worker nodes.
+
+Applying a new delay matrix with `Pool.map` over SSH makes every node rebuild its tc tree
+command-by-command, so nodes switch seconds apart and the cluster runs a mixed profile meanwhile.
+Here the switch is split into two phases:
+
+(1) prepare: build each node's complete tc tree as a `tc -batch` file and stage it on the node
+    (nothing changes on the data path yet). The node's clock offset to the controller is estimated
+    at the same time.
+(2) commit: every node waits until a common target timestamp (corrected by its clock offset) and
+    flips to the new tree with a single `tc -force -batch` call, which takes milliseconds.
+    The actual switch times are reported back, so the caller knows how far apart the nodes switched.
+If any node failed to prepare, the commit is aborted on all nodes (unless allow_partial=True), so the
+cluster keeps the old profile everywhere instead of running a mixed one; the failed nodes are reported.
+'''
+
+import time
+import logging
+import threading
+import concurrent.futures
+
+import paramiko
+
+from iDynamicsPackagesModules.NetworkingDynamicsManager.qdisc_tree import build_qdisc_tree
+
+DEFAULT_STAGE_PATH = "/tmp/idynamics_tc_profile.batch"
+
+
+class SSHNodeRunner:
+    """
+    Keeps one SSH connection per worker node open, so that consecutive profile switches
+    do not pay the SSH handshake again.
+
+    node_details has the same format as in the injection scripts:
+        {'k8s-worker-1': {'ip': '172.26.128.30', 'username': 'ubuntu', 'key_path': '/home/ubuntu/.ssh/id_rsa'}, ...}
+    """
+    def __init__(self, node_details: dict):
+        self.node_details = node_details
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, node_name: str) -> paramiko.SSHClient:
+        with self._lock:
+            client = self._clients.get(node_name)
+            if client is None or client.get_transport() is None or not client.get_transport().is_active():
+                details = self.node_details[node_name]
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.load_system_host_keys()
+                client.connect(details['ip'], username=details['username'], key_filename=details['key_path'])
+                self._clients[node_name] = client
+            return client
+
+    def run(self, node_name: str, command: str):
+        """Run a shell command on the node and wait for it; returns (stdout, stderr)."""
+        stdin, stdout, stderr = self._client(node_name).exec_command(command)
+        stdout_output = stdout.read().decode().strip()
+        stderr_output = stderr.read().decode().strip()
+        return stdout_output, stderr_output
+
+    def write_file(self, node_name: str, path: str, content: str) -> None:
+        """Write a text file on the node (via SFTP)."""
+        sftp = self._client(node_name).open_sftp()
+        try:
+            with sftp.open(path, 'w') as f:
+                f.write(content)
+        finally:
+            sftp.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+
+
+def build_delay_batch(source_node_name, delay_matrix, node_details, interface='eth0', **impairments):
+    """
+    Build the tc tree of one source node as `tc -batch` lines (without the leading "tc"):
+    the unified tree of qdisc_tree.build_qdisc_tree() with the delays of delay_matrix.
+    Further impairments (rate_matrix, jitter_matrix, loss_matrix, ...) can be passed through.
+
+    Returns:
+        A list of batch lines.
+    """
+    return build_qdisc_tree(source_node_name, node_details, delay_matrix=delay_matrix, interface=interface, **impairments)
+
+
+def build_rate_batch(source_node_name, bandwidth_matrix, node_details, interface='eth0', **impairments):
+    """
+    Build the bandwidth tree of one source node as `tc -batch` lines:
+    the unified tree of qdisc_tree.build_qdisc_tree() with the rates (Mbit/s) of bandwidth_matrix.
+    """
+    return build_qdisc_tree(source_node_name, node_details, rate_matrix=bandwidth_matrix, interface=interface, **impairments)
+
+
+def estimate_clock_offset(runner, node_name: str) -> float:
+    """
+    Estimate (node clock - controller clock) in seconds, NTP style:
+    offset = remote_time - (t_send + t_receive) / 2.
+    """
+    t_send = time.time()
+    stdout_output, _ = runner.run(node_name, "python3 -c 'import time; print(repr(time.time()))'")
+    t_receive = time.time()
+    return float(stdout_output) - (t_send + t_receive) / 2
+
+
+def _prepare_node(runner, node_name, batch_lines, stage_path):
+    runner.write_file(node_name, stage_path, "\n".join(batch_lines) + "\n")
+    return estimate_clock_offset(runner, node_name)
+
+
+def prepare_profile(runner, node_batches: dict, stage_path: str = DEFAULT_STAGE_PATH) -> dict:
+    """
+    Phase 1: stage the batch file of every node and estimate its clock offset.
+
+    Args:
+        runner: An SSHNodeRunner (or any object with run() and write_file()).
+        node_batches: {node_name: [batch lines]}.
+        stage_path: Where to stage the batch file on each node.
+
+    Returns:
+        {node_name: clock_offset_seconds}, None for nodes that failed to prepare (also logged).
+    """
+    offsets = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(node_batches))) as executor:
+        futures = {executor.submit(_prepare_node, runner, node_name, lines, stage_path): node_name
+                   for node_name, lines in node_batches.items()}
+        for future in concurrent.futures.as_completed(futures):
+            node_name = futures[future]
+            try:
+                offsets[node_name] = future.result()
+            except Exception as e:
+                logging.error(f"Failed to prepare profile on {node_name}: {e}")
+                offsets[node_name] = None
+    return offsets
+
+
+def _commit_command(node_target_time: float, stage_path: str) -> str:
+    # Sleep coarsely until ~2 ms before the target, then spin, so the flip happens at the target
+    # with sub-millisecond precision; print the actual start/end time of the tc batch.
+    script = (
+        "import subprocess, time\n"
+        f"t = {node_target_time!r}\n"
+        "d = t - time.time() - 0.002\n"
+        "if d > 0: time.sleep(d)\n"
+        "while time.time() < t: pass\n"
+        "s = time.time()\n"
+        f"r = subprocess.run(['sudo', 'tc', '-force', '-batch', {stage_path!r}])\n"
+        "print(repr(s), repr(time.time()), r.returncode)\n"
+    )
+    return f"python3 -c \"{script}\""
+
+
+def _commit_node(runner, node_name, node_target_time, stage_path):
+    stdout_output, stderr_output = runner.run(node_name, _commit_command(node_target_time, stage_path))
+    start, end, returncode = stdout_output.split()[-3:]
+    if stderr_output:
+        logging.info(f"tc batch on {node_name} reported: {stderr_output}")
+    return float(start), float(end), int(returncode)
+
+
+def commit_profile(runner, clock_offsets: dict, stage_path: str = DEFAULT_STAGE_PATH,
+                   target_time: float = None, lead_time: float = 1.0, allow_partial: bool = False) -> dict:
+    """
+    Phase 2: flip every prepared node to its staged tree at a common target timestamp.
+
+    Args:
+        runner: The runner used for prepare_profile().
+        clock_offsets: Output of prepare_profile(); the nodes with an offset are committed.
+            If some node failed to prepare (offset None), nothing is committed unless allow_partial.
+        stage_path: The staged batch file path.
+        target_time: Controller wall-clock time (time.time()) to switch at.
+            Defaults to now + lead_time.
+        lead_time: Seconds left for dispatching the commit to all nodes.
+        allow_partial: Commit the prepared nodes even if others failed to prepare (mixed profile).
+
+    Returns:
+        A report dict:
+        {
+            'target_time': ...,
+            'switch_times': {node_name: (start, end)},   # in controller clock
+            'failed': [node_name, ...],                  # failed to prepare or to commit
+            'prepare_failed': [node_name, ...],
+            'committed': False if the commit was aborted because of prepare failures,
+            'spread_ms': max(start) - min(start) in milliseconds,
+            'max_lateness_ms': max(start - target_time) in milliseconds,
+        }
+    """
+    if target_time is None:
+        target_time = time.time() + lead_time
+
+    switch_times = {}
+    prepare_failed = sorted(node_name for node_name, offset in clock_offsets.items() if offset is None)
+    failed = list(prepare_failed)
+    committed = not prepare_failed or allow_partial
+    if not committed:
+        logging.error(f"Profile not committed: {prepare_failed} failed to prepare, all nodes keep the old profile")
+    prepared = {node_name: offset for node_name, offset in clock_offsets.items() if offset is not None} if committed else {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(prepared))) as executor:
+        futures = {executor.submit(_commit_node, runner, node_name, target_time + offset, stage_path): node_name
+                   for node_name, offset in prepared.items()}
+        for future in concurrent.futures.as_completed(futures):
+            node_name = futures[future]
+            try:
+                start, end, returncode = future.result()
+                offset = prepared[node_name]
+                switch_times[node_name] = (start - offset, end - offset)  # back to controller clock
+                if returncode != 0:
+                    failed.append(node_name)
+            except Exception as e:
+                logging.error(f"Failed to commit profile on {node_name}: {e}")
+                failed.append(node_name)
+
+    starts = [start for start, _ in switch_times.values()]
+    report = {
+        'target_time': target_time,
+        'switch_times': switch_times,
+        'failed': failed,
+        'prepare_failed': prepare_failed,
+        'committed': committed,
+        'spread_ms': (max(starts) - min(starts)) * 1000 if starts else None,
+        'max_lateness_ms': (max(starts) - target_time) * 1000 if starts else None,
+    }
+    logging.info(f"Profile committed on {len(switch_times)} nodes, spread {report['spread_ms']} ms, failed: {failed}")
+    return report
+
+
+def switch_delay_profile(runner, delay_matrix, node_details, interface='eth0',
+                         stage_path: str = DEFAULT_STAGE_PATH, target_time: float = None, lead_time: float = 1.0,
+                         allow_partial: bool = False, **impairments) -> dict:
+    """
+    Prepare and commit a delay matrix on all nodes in node_details; returns the commit report.
+    impairments (rate_matrix, jitter_matrix, loss_matrix, ...) are added to the same trees, see build_qdisc_tree().
+    """
+    node_batches = {node_name: build_delay_batch(node_name, delay_matrix, node_details, interface, **impairments)
+                    for node_name in node_details}
+    clock_offsets = prepare_profile(runner, node_batches, stage_path)
+    return commit_profile(runner, clock_offsets, stage_path, target_time, lead_time, allow_partial)
+
+# Example usage:
+# runner = SSHNodeRunner(node_details)
+# report = switch_delay_profile(runner, delay_matrix, node_details)
+# print(f"Nodes switched within {report['spread_ms']:.2f} ms")
+# runner.close()
@@ -9,6 +9,7 @@ from typing import List
 from iDynamicsPackagesModules.SchedulingPolicyExtender.my_policy_interface import NodeInfo, PodInfo
 from iDynamicsPackagesModules.NetworkingDynamicsManager.node_delay_measure_ParallelComp import measure_http_latency
 from iDynamicsPackagesModules.NetworkingDynamicsManager.node_bandwidth_measure_ParallelComp import measure_bandwidth
+from iDynamicsPackagesModules.NetworkingDynamicsManager.network_matrix_store import load_network_matrix, parse_quantity
 
 class NodeInfo:
     """
@@ -112,6 +113,13 @@ def build_nodeinfo_objects(raw_nodes: List[client.V1Node]) -> List[NodeInfo]:
     """
     nodeinfo_list = []
 
+    # Off-time network data (see (2) below) is loaded once for all nodes instead of re-reading and
+    # re-parsing the files per node. The paths can be legacy *_dict.txt files or NetworkMatrixStore directories.
+    latency_dict_path= "/home/ubuntu/iDynamics/iDynamicsPackagesModules/NetworkingDynamicsManager/networking_measured_data/latency_dict.txt"
+    bandwidth_dict_path= "/home/ubuntu/iDynamics/iDynamicsPackagesModules/NetworkingDynamicsManager/networking_measured_data/bandwidth_dict.txt"
+    latency_matrix = load_network_matrix(latency_dict_path, 'latency')        # ms
+    bandwidth_matrix = load_network_matrix(bandwidth_dict_path, 'bandwidth')  # Mbit/s
+
     # If you have a metrics server running, you could fetch live usage.
     # For simplicity, let's just read capacities from node.status.capacity
     # and set usage to 0 or some approximate value.
@@ -153,11 +161,8 @@ def build_nodeinfo_objects(raw_nodes: List[client.V1Node]) -> List[NodeInfo]:
         # the latency and bandwidyh data can be updated from periodcally running the above On-time methods,
         # or the update data when detecting major changes in network conditions 
         # (e.g., via metrics, alerts, or cluster events), trigger a new measurement pass 
-        latency_dict_path= "/home/ubuntu/iDynamics/iDynamicsPackagesModules/NetworkingDynamicsManager/networking_measured_data/latency_dict.txt"
-        bandwidth_dict_path= "/home/ubuntu/iDynamics/iDynamicsPackagesModules/NetworkingDynamicsManager/networking_measured_data/bandwidth_dict.txt"
-        _network_latency_ = get_networking_conditions_for_node(node_name, latency_dict_path)
-        _network_bandwidth_raw = get_networking_conditions_for_node(node_name, bandwidth_dict_path)
-        _network_bandwidth_ = remove_units(_network_bandwidth_raw) # remove "Mbits/sec"
+        _network_latency_ = latency_matrix.row(node_name)      # {dst_node: ms}, failed measurements left out
+        _network_bandwidth_ = bandwidth_matrix.row(node_name)  # {dst_node: Mbit/s}, Gbits/sec etc. converted
 
         # Build the NodeInfo object
         node_info = NodeInfo(
@@ -175,24 +180,21 @@ def build_nodeinfo_objects(raw_nodes: List[client.V1Node]) -> List[NodeInfo]:
 
 def remove_units(data): # use this function to remove units for _network_bandwidth_ data
     """
-    Recursively removes units from string values in a dictionary.
-    For example, "291 Mbits/sec" becomes "291".
+    Recursively converts bandwidth strings in a dictionary to floats in Mbit/s.
+    For example, "291 Mbits/sec" becomes 291.0 and "1.22 Gbits/sec" becomes 1220.0
+    (just dropping the unit would mix Mbit and Gbit values).
     
     Parameters:
         data (dict or str): The input dictionary or string.
     
     Returns:
-        A new dictionary or string with units removed.
+        A new dictionary or value with units removed; error strings become NaN.
     """
-    # modify to accodmdate different units , like "Mbits/sec", "Kbits/sec", "Gbits/sec", "Mbits", "Kbits", "Gbits"
-    
-    
     if isinstance(data, dict):
         # Recursively apply to each value in the dictionary.
         return {key: remove_units(value) for key, value in data.items()}
     elif isinstance(data, str):
-        # Split the string by space and take the first part.
-        return data.split()[0]
+        return parse_quantity(data, 'bandwidth')
     else:
         # For any other data type, return it unchanged.
         return data